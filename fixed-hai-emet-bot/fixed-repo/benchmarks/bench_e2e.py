@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - End-to-End Load Test
+בדיקת עומס מקצה לקצה - הבוט האמיתי מול שרת Bot API מקומי
+
+Starts the fake Bot API server, runs the unmodified bot (bot.py, or
+sharding.py with --shards) as a child process pointed at it through
+HAI_EMET_BOT_API_URL, lets the virtual users drive it for the given time
+and prints throughput and reply latency. The bot goes through its normal
+startup (Application.builder().token(...), getMe, deleteWebhook,
+getUpdates long polling) and sends every reply over HTTP. Data files are
+kept in a temporary directory.
+
+    python benchmarks/bench_e2e.py --users 200 --duration 30
+    python benchmarks/bench_e2e.py --users 500 --error-rate 0.02 --slow-rate 0.05
+    python benchmarks/bench_e2e.py --shards 4 --send-rate 1000000 --chat-send-rate 1000000
+"""
+
+import os
+import sys
+import json
+import signal
+import asyncio
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_bot_api import FakeBotApi, add_arguments, print_report  # noqa: E402
+
+# Any well-formed token; only the fake server sees it
+FAKE_TOKEN = '123456:hai-emet-load-test'
+
+
+def bot_environment(directory: str, args) -> dict:
+    """סביבת הבוט - שרת מקומי וקבצים בתיקייה זמנית"""
+    env = dict(os.environ)
+    env.update({
+        'TELEGRAM_BOT_TOKEN': FAKE_TOKEN,
+        'HAI_EMET_BOT_API_URL': f"http://{args.host}:{args.port}",
+        'HAI_EMET_MODE': 'polling',
+        'HAI_EMET_METRICS_PORT': '0',
+        'HAI_EMET_STORE': args.store,
+        'HAI_EMET_USERS_FILE': os.path.join(directory, 'users.json'),
+        'HAI_EMET_SQLITE_FILE': os.path.join(directory, 'users.db'),
+        'HAI_EMET_HISTORY_FILE': os.path.join(directory, 'history.log'),
+        'HAI_EMET_BROADCAST_FILE': os.path.join(directory, 'broadcast.json'),
+        'HAI_EMET_COUNTERS_FILE': os.path.join(directory, 'counters.json'),
+        'HAI_EMET_PROFILE_DIR': os.path.join(directory, 'profiles')
+    })
+    if args.send_rate is not None:
+        env['HAI_EMET_SEND_RATE'] = str(args.send_rate)
+    if args.chat_send_rate is not None:
+        env['HAI_EMET_CHAT_SEND_RATE'] = str(args.chat_send_rate)
+    return env
+
+
+async def run(args) -> dict:
+    api = FakeBotApi(
+        users=args.users,
+        think=args.think,
+        error_rate=args.error_rate,
+        slow_rate=args.slow_rate,
+        slow_seconds=args.slow_seconds,
+        host=args.host,
+        port=args.port
+    )
+    await api.start()
+    with tempfile.TemporaryDirectory() as directory:
+        command = [sys.executable, os.path.join(ROOT, 'bot.py')]
+        if args.shards:
+            command = [sys.executable, os.path.join(ROOT, 'sharding.py'), '--shards', str(args.shards)]
+        log_path = os.path.join(directory, 'bot.log')
+        with open(log_path, 'wb') as log:
+            process = await asyncio.create_subprocess_exec(
+                *command, cwd=directory, env=bot_environment(directory, args),
+                stdout=log, stderr=asyncio.subprocess.STDOUT
+            )
+            try:
+                # The bot is up once it starts polling
+                waiter = asyncio.ensure_future(api.polling.wait())
+                exited = asyncio.ensure_future(process.wait())
+                await asyncio.wait((waiter, exited), timeout=args.startup_timeout, return_when=asyncio.FIRST_COMPLETED)
+                exited.cancel()
+                if not api.polling.is_set():
+                    waiter.cancel()
+                    raise RuntimeError("The bot did not start polling")
+
+                api.begin()
+                await asyncio.sleep(args.duration)
+                api.finish()
+            finally:
+                if process.returncode is None:
+                    process.send_signal(signal.SIGINT)
+                    try:
+                        await asyncio.wait_for(process.wait(), 60)
+                    except asyncio.TimeoutError:
+                        process.kill()
+                        await process.wait()
+                await api.stop()
+                if process.returncode not in (0, -signal.SIGINT):
+                    with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+                        print(''.join(f.readlines()[-30:]), file=sys.stderr)
+    report = api.report()
+    report['shards'] = args.shards
+    report['store'] = args.store
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument('--shards', type=int, default=0, help='run sharding.py with N workers instead of bot.py')
+    parser.add_argument('--store', default='json', choices=('json', 'journal', 'binary', 'sqlite', 'tiered'))
+    parser.add_argument('--send-rate', type=float, help='override HAI_EMET_SEND_RATE for the bot')
+    parser.add_argument('--chat-send-rate', type=float, help='override HAI_EMET_CHAT_SEND_RATE for the bot')
+    parser.add_argument('--startup-timeout', type=float, default=60.0)
+    parser.add_argument('--output', default='bench_e2e.json')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'meta': {
+                'date': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'args': vars(args)
+            },
+            'report': report
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
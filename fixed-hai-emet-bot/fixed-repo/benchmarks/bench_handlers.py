@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Handler Benchmark
+מדידת המסלולים החמים של הבוט ללא חיבור לטלגרם
+
+Drives start_command, status_command, handle_text and handle_callback with
+synthetic Update / CallbackQuery objects against a stub Bot that records
+calls instead of sending them. The user store is pre-populated with N users
+and persisted through the normal write-behind writer, so the bytes written
+per action include coalescing. Results are printed and saved as JSON:
+
+    python benchmarks/bench_handlers.py --users 1000 100000 1000000
+    python benchmarks/bench_handlers.py --backend sqlite --output sqlite.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+from typing import Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+# Keep the benchmark away from the real users file
+os.environ.setdefault('HAI_EMET_USERS_FILE', os.path.join(tempfile.mkdtemp(), 'users.json'))
+
+import logging  # noqa: E402
+logging.disable(logging.INFO)
+
+import bot  # noqa: E402
+from bench_memory import synthetic_user  # noqa: E402
+from outbound import SendScheduler  # noqa: E402
+from storage import create_user_store  # noqa: E402
+from telegram import CallbackQuery, Chat, Message, Update, User  # noqa: E402
+
+hai_emet = bot.hai_emet
+BASE_DATE = datetime(2026, 1, 10)
+
+
+# ═══════════════════════════════════════════════════════════════════
+#                         STUB BOT & UPDATES
+# ═══════════════════════════════════════════════════════════════════
+
+class StubBot:
+    """בוט מדומה - רושם קריאות במקום לשלוח"""
+
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+        self.text_bytes = 0
+
+    def _record(self, method: str, text: str = ''):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        self.text_bytes += len(text.encode('utf-8'))
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self._record('send_message', text)
+        return True
+
+    async def edit_message_text(self, text, **kwargs):
+        self._record('edit_message_text', text)
+        return True
+
+    async def answer_callback_query(self, callback_query_id, **kwargs):
+        self._record('answer_callback_query')
+        return True
+
+
+def make_message(stub: StubBot, update_id: int, user: User, text: str) -> Message:
+    message = Message(
+        message_id=update_id,
+        date=BASE_DATE,
+        chat=Chat(id=user.id, type=Chat.PRIVATE),
+        from_user=user,
+        text=text
+    )
+    message.set_bot(stub)
+    return message
+
+
+def make_text_update(stub: StubBot, update_id: int, user_id: int, text: str) -> Update:
+    """עדכון הודעת טקסט סינתטי"""
+    user = User(id=user_id, is_bot=False, first_name=f'Name{user_id % 5000}', username=f'user_{user_id}')
+    return Update(update_id=update_id, message=make_message(stub, update_id, user, text))
+
+
+def make_callback_update(stub: StubBot, update_id: int, user_id: int, data: str) -> Update:
+    """עדכון callback סינתטי"""
+    user = User(id=user_id, is_bot=False, first_name=f'Name{user_id % 5000}', username=f'user_{user_id}')
+    query = CallbackQuery(
+        id=str(update_id),
+        from_user=user,
+        chat_instance='bench',
+        data=data,
+        message=make_message(stub, update_id, user, bot.EMOTION_PROMPT_TEXT)
+    )
+    query.set_bot(stub)
+    return Update(update_id=update_id, callback_query=query)
+
+
+# Action name -> (handler, update factory, payload)
+ACTIONS = {
+    'start': (bot.start_command, make_text_update, '/start'),
+    'status': (bot.status_command, make_text_update, '/status'),
+    'stats': (bot.stats_command, make_text_update, '/stats'),
+    'text_button': (bot.handle_text, make_text_update, '📊 הסטטיסטיקות שלי'),
+    'text_free': (bot.handle_text, make_text_update, 'שלום חי-אמת'),
+    'text_emotion': (bot.handle_text, make_text_update, 'היום אני ממש שמח ולא עייף בכלל'),
+    'callback_emotion': (bot.handle_callback, make_callback_update, 'emotion:happy'),
+}
+
+
+# ═══════════════════════════════════════════════════════════════════
+#                            RUNNER
+# ═══════════════════════════════════════════════════════════════════
+
+def populate(directory: str, users: int, backend: str):
+    """יצירת מאגר עם N משתמשים והחלפת המאגר של הבוט"""
+    json_path = os.path.join(directory, 'users.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({str(i): synthetic_user(i) for i in range(1, users + 1)}, f, ensure_ascii=False)
+
+    store = create_user_store(backend, json_path, os.path.join(directory, 'users.db'), hot_users=bot.HOT_USERS)
+    hai_emet.store = store
+    bot.broadcaster.store = store
+    hai_emet.load_users()
+
+
+def percentile(samples: List[float], p: float) -> float:
+    return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+
+async def run_action(name: str, users: int, iterations: int, rng: random.Random) -> Dict:
+    """הרצת פעולה אחת ומדידה"""
+    handler, factory, payload = ACTIONS[name]
+    stub = StubBot()
+    updates = [factory(stub, i, rng.randint(1, users), payload) for i in range(iterations)]
+
+    store = hai_emet.store
+    bytes_before = store.writer.bytes_written
+    await store.start()
+
+    latencies = []
+    started = time.perf_counter()
+    for update in updates:
+        t0 = time.perf_counter()
+        await handler(update, None)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    # The final flush is part of the cost of the batch
+    await store.stop()
+    latencies.sort()
+    return {
+        'users': users,
+        'action': name,
+        'iterations': iterations,
+        'ops_per_sec': round(iterations / elapsed, 1),
+        'p50_us': round(percentile(latencies, 0.50) * 1e6, 1),
+        'p99_us': round(percentile(latencies, 0.99) * 1e6, 1),
+        'max_us': round(latencies[-1] * 1e6, 1),
+        'bytes_written_per_action': round((store.writer.bytes_written - bytes_before) / iterations, 1),
+        'api_calls_per_action': round(sum(stub.calls.values()) / iterations, 2),
+        'reply_bytes_per_action': round(stub.text_bytes / iterations, 1)
+    }
+
+
+async def run(args) -> List[Dict]:
+    # Measure the handlers, not Telegram's rate limits
+    bot.outbox = SendScheduler(rate=1e9, per_chat_rate=1e9, per_chat_burst=1e9)
+    rng = random.Random(args.seed)
+    results = []
+    for users in args.users:
+        with tempfile.TemporaryDirectory() as directory:
+            populate(directory, users, args.backend)
+            for name in args.actions:
+                r = await run_action(name, users, args.iterations, rng)
+                results.append(r)
+                print(
+                    f"{users:>9} | {name:<17} | {r['ops_per_sec']:>10.0f} | {r['p50_us']:>9.1f} | "
+                    f"{r['p99_us']:>9.1f} | {r['bytes_written_per_action']:>11.1f}"
+                )
+            hai_emet.store.close()
+    await bot.outbox.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--backend', choices=('json', 'journal', 'binary', 'sqlite', 'tiered'), default=bot.USER_STORE_BACKEND)
+    parser.add_argument('--actions', nargs='+', choices=tuple(ACTIONS), default=list(ACTIONS))
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', default='bench_handlers.json')
+    args = parser.parse_args()
+
+    print(f"backend: {args.backend}, iterations per action: {args.iterations}")
+    print(f"{'users':>9} | {'action':<17} | {'ops/sec':>10} | {'p50 µs':>9} | {'p99 µs':>9} | {'disk B/op':>11}")
+    print('-' * 80)
+    results = asyncio.run(run(args))
+
+    report = {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': args.backend,
+            'iterations': args.iterations,
+            'seed': args.seed
+        },
+        'results': results
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
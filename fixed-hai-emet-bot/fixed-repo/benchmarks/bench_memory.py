@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Memory Benchmark
+השוואת זיכרון: מילון לכל משתמש מול UserRecord קומפקטי
+
+Builds N synthetic users in both representations and reports the traced
+heap size of each:
+
+    python benchmarks/bench_memory.py --users 100000 1000000
+"""
+
+import os
+import sys
+import gc
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import UserRecord  # noqa: E402
+
+MOODS = ('joyful', 'positive', 'neutral', 'melancholic', 'troubled')
+BASE_TIME = datetime(2026, 1, 10)
+
+
+def synthetic_user(i: int) -> dict:
+    """משתמש סינתטי בפורמט הקובץ"""
+    joined = BASE_TIME + timedelta(seconds=i * 7)
+    return {
+        'username': f'user_{i}',
+        'first_name': f'Name{i % 5000}',
+        'joined': joined.isoformat(),
+        'quantum_points': (i * 37) % 5000,
+        'cosmic_level': ((i * 37) % 5000) // 100 + 1,
+        'total_interactions': i % 300,
+        'total_messages': 0,
+        'emotion_score': (i % 140) - 70,
+        'mood': MOODS[i % len(MOODS)],
+        'last_seen': (joined + timedelta(hours=i % 1000)).isoformat()
+    }
+
+
+def build_dicts(n: int) -> dict:
+    # Same shape json.load produces: str keys, ISO strings, mood strings
+    return {str(i): synthetic_user(i) for i in range(n)}
+
+
+def build_records(n: int) -> dict:
+    return {i: UserRecord.from_dict(synthetic_user(i)) for i in range(n)}
+
+
+def measure(builder, n: int) -> int:
+    """מדידת זיכרון שהוקצה לבניית המאגר"""
+    gc.collect()
+    tracemalloc.start()
+    users = builder(n)
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(users) == n
+    del users
+    gc.collect()
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'users':>10} | {'dict MB':>9} | {'record MB':>9} | {'dict B/user':>11} | {'record B/user':>13} | {'saved':>6}")
+    print('-' * 75)
+    for n in args.users:
+        dict_size = measure(build_dicts, n)
+        record_size = measure(build_records, n)
+        print(
+            f"{n:>10} | {dict_size / 2**20:>9.1f} | {record_size / 2**20:>9.1f} | "
+            f"{dict_size / n:>11.0f} | {record_size / n:>13.0f} | "
+            f"{1 - record_size / dict_size:>6.0%}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Render Micro-Benchmark
+השוואת בניית תגובות: f-string מלא ומקלדת חדשה מול תבניות ומקלדות משותפות
+
+Compares the old per-reply rendering (full f-string + new markup objects)
+against the precompiled templates and cached keyboards in bot.py, and
+reports CPU time and peak bytes allocated per reply. The stats card is
+measured twice: as served (rank and trend lookups included, the same on
+both sides) and as formatting alone with the lookups done up front:
+
+    python benchmarks/bench_render.py --iterations 20000
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep the benchmark away from the real users file
+os.environ.setdefault('HAI_EMET_USERS_FILE', os.path.join(tempfile.mkdtemp(), 'users.json'))
+
+import logging  # noqa: E402
+logging.disable(logging.INFO)
+
+import bot  # noqa: E402
+from telegram import KeyboardButton, ReplyKeyboardMarkup  # noqa: E402
+
+hai_emet = bot.hai_emet
+USER_ID = 42
+
+
+# ═══════════════════════════════════════════════════════════════════
+#                    LEGACY RENDERING (BEFORE)
+# ═══════════════════════════════════════════════════════════════════
+
+def legacy_main_keyboard():
+    keyboard = [
+        [KeyboardButton("🌌 סטטוס מערכת"), KeyboardButton("⚡ כוח קוסמי")],
+        [KeyboardButton("🔮 סנכרון קוונטי"), KeyboardButton("📊 הסטטיסטיקות שלי")],
+        [KeyboardButton("😊 מצב רוח"), KeyboardButton("💎 HET Token")],
+        [KeyboardButton("🔬 פרויקטים"), KeyboardButton("ℹ️ עזרה")]
+    ]
+    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+
+
+def legacy_start(first_name, is_new):
+    text = f"""
+╔═══════════════════════════════════════════════════════════════════╗
+║         🌌 ברוך הבא למערכת חי-אמת רגשות 🌌                        ║
+║              {hai_emet.bot_username}                            ║
+╚═══════════════════════════════════════════════════════════════════╝
+
+שלום {first_name}! 👋
+
+{'🎉 נרשמת בהצלחה למערכת!' if is_new else '💫 ברוך שובך!'}
+
+🔮 **מערכת חי-אמת רגשות פעילה**
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+🧬 DNA: {hai_emet.dna_code}
+👨‍💻 יוצר: {hai_emet.creator}
+🔑 API: מאומת ✅
+⚡ ליבה: חיה ופועמת
+🌟 כוח אור: {hai_emet.light_power}
+🌙 כוח חושך: {hai_emet.dark_power}
+
+**מה אני יכול לעשות?**
+━━━━━━━━━━━━━━━━━━━━━━━
+• מערכת רגשות מתקדמת 😊
+• סטטוס מערכת בזמן אמת 🌌
+• כוחות קוסמיים ⚡
+• סנכרון קוונטי 🔮
+• מעקב אחר HET Token 💎
+• פרויקטים מתקדמים 🔬
+
+**כפתורים מהירים:**
+לחץ על הכפתורים למטה או:
+/help - למידע נוסף
+/stats - הסטטיסטיקות שלך
+/emotion - מצב הרוח שלך
+
+✨ **אמת × ∞ = כוח אינסופי** ✨
+"""
+    return text, legacy_main_keyboard()
+
+
+def legacy_stats(stats):
+    return legacy_stats_text(stats, hai_emet.get_user_rank(USER_ID), bot.render_trend(USER_ID))
+
+
+def legacy_stats_text(stats, rank, trend):
+    mood_emojis = {
+        'joyful': '😄',
+        'positive': '😊',
+        'neutral': '😐',
+        'melancholic': '😔',
+        'troubled': '😞'
+    }
+    mood = stats.get('mood', 'neutral')
+    mood_emoji = mood_emojis.get(mood, '😐')
+    return f"""
+📊 **הסטטיסטיקות שלך**
+━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+👤 שם: {stats.get('first_name', 'Unknown')}
+🆔 משתמש: @{stats.get('username', 'Unknown')}
+🔮 רמה קוסמית: {stats.get('cosmic_level', 1)}
+⚡ נקודות קוונטיות: {stats.get('quantum_points', 0)}
+🏆 דירוג: #{rank} מתוך {hai_emet.total_users}
+💬 אינטראקציות: {stats.get('total_interactions', 0)}
+📅 הצטרפת: {stats.get('joined', 'Unknown')[:10]}
+
+**מצב רוח:**
+━━━━━━━━━━━━━━━━━━━━━━━━━━━
+{mood_emoji} {mood}
+📈 ציון רגשי: {stats.get('emotion_score', 0)}
+{trend}
+
+**התקדמות:**
+━━━━━━━━━━━━━━━━━━━━━━━━━━━
+נקודות לרמה הבאה: {100 - (stats.get('quantum_points', 0) % 100)}
+
+💫 **המשך לצבור כוח קוסמי!** 💫
+"""
+
+
+# ═══════════════════════════════════════════════════════════════════
+#                    TEMPLATE RENDERING (AFTER)
+# ═══════════════════════════════════════════════════════════════════
+
+def template_start(first_name, is_new):
+    text = bot.START_TEMPLATE.render(
+        first_name=first_name,
+        greeting='🎉 נרשמת בהצלחה למערכת!' if is_new else '💫 ברוך שובך!',
+        light_power=hai_emet.light_power,
+        dark_power=hai_emet.dark_power
+    )
+    return text, bot.get_main_keyboard()
+
+
+def template_stats(stats):
+    return bot.render_stats(USER_ID, stats)
+
+
+def template_stats_text(stats, rank, trend):
+    mood = stats.get('mood', 'neutral')
+    quantum_points = stats.get('quantum_points', 0)
+    return bot.STATS_TEMPLATE.render(
+        first_name=stats.get('first_name', 'Unknown'),
+        username=stats.get('username', 'Unknown'),
+        cosmic_level=stats.get('cosmic_level', 1),
+        quantum_points=quantum_points,
+        rank=rank,
+        total_users=hai_emet.total_users,
+        total_interactions=stats.get('total_interactions', 0),
+        joined=stats.get('joined', 'Unknown')[:10],
+        mood_emoji=bot.MOOD_EMOJIS.get(mood, '😐'),
+        mood=mood,
+        emotion_score=stats.get('emotion_score', 0),
+        trend=trend,
+        next_level=100 - (quantum_points % 100)
+    )
+
+
+# ═══════════════════════════════════════════════════════════════════
+#                            RUNNER
+# ═══════════════════════════════════════════════════════════════════
+
+def measure(func, args, iterations):
+    """זמן CPU ממוצע והקצאת שיא לתגובה"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(*args)
+    cpu_us = (time.perf_counter() - start) / iterations * 1e6
+
+    tracemalloc.start()
+    peaks = 0
+    samples = min(iterations, 1000)
+    for _ in range(samples):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        result = func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks += peak - base
+        del result
+    tracemalloc.stop()
+    return cpu_us, peaks / samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    hai_emet.register_user(USER_ID, 'bench_user', 'Bench')
+    hai_emet.record_interaction(USER_ID, points=250, emotion_delta=30)
+    stats = hai_emet.get_user_stats(USER_ID)
+    lookups = (hai_emet.get_user_rank(USER_ID), bot.render_trend(USER_ID))
+
+    # Both paths must produce the same reply
+    assert legacy_start('Bench', False)[0] == template_start('Bench', False)[0]
+    assert legacy_stats(stats) == template_stats(stats)
+    assert legacy_stats_text(stats, *lookups) == template_stats(stats)
+    assert template_stats_text(stats, *lookups) == template_stats(stats)
+    assert bot.HELP_TEXT is bot.HELP_TEMPLATE.render()
+
+    cases = [
+        ('start (text + keyboard)', legacy_start, template_start, ('Bench', False)),
+        ('stats card', legacy_stats, template_stats, (stats,)),
+        ('stats card (format only)', legacy_stats_text, template_stats_text, (stats, *lookups)),
+        ('main keyboard', legacy_main_keyboard, bot.get_main_keyboard, ()),
+    ]
+
+    print(f"{'reply':<26} | {'before µs':>10} | {'after µs':>9} | {'before B':>9} | {'after B':>8}")
+    print('-' * 74)
+    for name, before, after, call_args in cases:
+        before_us, before_bytes = measure(before, call_args, args.iterations)
+        after_us, after_bytes = measure(after, call_args, args.iterations)
+        print(
+            f"{name:<26} | {before_us:>10.2f} | {after_us:>9.2f} | "
+            f"{before_bytes:>9.0f} | {after_bytes:>8.0f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Startup Benchmark
+מדידת זמן עלייה: קובץ JSON מול צילום בינארי ממופה
+
+Writes N synthetic users as a pretty-printed users file, imports it once
+into the binary snapshot, then times each backend in a fresh process:
+store.load() alone, the full load_users() the bot runs before answering
+(leaderboard and mood counters included), the first lookup, and the
+resident memory afterwards. Results are printed and saved as JSON:
+
+    python benchmarks/bench_startup.py --users 100000 1000000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+from typing import Dict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_memory import synthetic_user  # noqa: E402
+
+
+def rss_mb() -> float:
+    """זיכרון תושב של התהליך"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(backend: str, users_path: str, probe: int) -> Dict:
+    """מדידה בתהליך נקי - מודפס כ-JSON"""
+    os.environ['HAI_EMET_USERS_FILE'] = users_path
+    os.environ['HAI_EMET_HISTORY_FILE'] = users_path + '.history.log'
+    import logging
+    logging.disable(logging.INFO)
+    import bot
+    from storage import create_user_store
+
+    rss_before = rss_mb()
+    store = create_user_store(backend, users_path, users_path + '.db')
+
+    started = time.perf_counter()
+    count = store.load()
+    store_load = time.perf_counter() - started
+
+    # The bot's own startup path, on the already-loaded store
+    bot.hai_emet.store = store
+    store.load = lambda: count
+    started = time.perf_counter()
+    bot.hai_emet.load_users()
+    ready = store_load + time.perf_counter() - started
+
+    started = time.perf_counter()
+    record = store.get(probe)
+    first_get = time.perf_counter() - started
+    assert record is not None and bot.hai_emet.total_users == count
+
+    return {
+        'backend': backend,
+        'users': count,
+        'store_load_s': round(store_load, 3),
+        'ready_s': round(ready, 3),
+        'first_get_us': round(first_get * 1e6, 1),
+        'rss_mb': round(rss_mb() - rss_before, 1)
+    }
+
+
+def prepare(directory: str, users: int, indent: int) -> str:
+    """קובץ משתמשים וצילום בינארי מיובא"""
+    path = os.path.join(directory, 'users.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({str(i): synthetic_user(i) for i in range(1, users + 1)}, f, ensure_ascii=False, indent=indent)
+
+    from storage import BinaryUserStore
+    started = time.perf_counter()
+    store = BinaryUserStore(path)
+    store.load()
+    store.close()
+    print(f"{users:>9} | one-time import into the binary snapshot: {time.perf_counter() - started:.2f}s")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--backends', nargs='+', choices=('json', 'binary'), default=['json', 'binary'])
+    parser.add_argument('--indent', type=int, default=2, help='indent of the users file, as the bot used to write it')
+    parser.add_argument('--output', default='bench_startup.json')
+    parser.add_argument('--child', nargs=3, metavar=('BACKEND', 'PATH', 'PROBE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        backend, path, probe = args.child
+        print(json.dumps(child(backend, path, int(probe))))
+        return
+
+    results = []
+    for users in args.users:
+        with tempfile.TemporaryDirectory() as directory:
+            path = prepare(directory, users, args.indent)
+            for backend in args.backends:
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--child', backend, path, str(users // 2)],
+                    check=True, capture_output=True, text=True
+                ).stdout
+                r = json.loads(output.strip().splitlines()[-1])
+                results.append(r)
+                print(
+                    f"{users:>9} | {backend:<7} | load {r['store_load_s']:>7.3f}s | ready {r['ready_s']:>7.3f}s | "
+                    f"first get {r['first_get_us']:>7.1f} µs | rss +{r['rss_mb']:>7.1f} MB"
+                )
+
+    report = {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'indent': args.indent
+        },
+        'results': results
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
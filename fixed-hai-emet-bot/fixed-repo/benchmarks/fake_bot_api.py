@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Fake Bot API Server
+שרת Bot API מקומי לבדיקות עומס - משתמשים וירטואליים, 429 ותשובות איטיות
+
+A stand-in for api.telegram.org built on aiohttp. It answers getMe,
+getUpdates (long polling), sendMessage, editMessageText and
+answerCallbackQuery the way Telegram does, and generates the updates
+itself: N virtual users walk a script of main-keyboard buttons, commands
+and inline callbacks. Each user sends its next action only once the bot
+has replied to the previous one, and the time from the update being
+handed out by getUpdates to that reply is recorded. Send methods can be
+made to fail with 429 Too Many Requests or answer slowly, at given rates.
+
+Point the bot at it with the base-URL override:
+
+    HAI_EMET_BOT_API_URL=http://127.0.0.1:8081 TELEGRAM_BOT_TOKEN=1:fake python bot.py
+
+    python benchmarks/fake_bot_api.py --users 200 --error-rate 0.02
+
+benchmarks/bench_e2e.py does both and prints the report.
+"""
+
+import time
+import random
+import asyncio
+import argparse
+import itertools
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+BOT_USER = {
+    'id': 1,
+    'is_bot': True,
+    'first_name': 'Hai-Emet',
+    'username': 'HaiEmetEmotionBot',
+    'can_join_groups': False,
+    'can_read_all_group_messages': False,
+    'supports_inline_queries': False
+}
+
+# Methods that can be made to fail or answer slowly
+SEND_METHODS = frozenset(('sendMessage', 'editMessageText', 'answerCallbackQuery'))
+
+# Methods that complete a virtual user's action
+REPLY_METHODS = frozenset(('sendMessage', 'editMessageText'))
+
+MOODS = ('happy', 'sad', 'angry', 'calm', 'thoughtful', 'tired')
+
+# (kind, payload) - a virtual user starts at the top, then loops from the second step
+SCRIPT = (
+    ('text', '/start'),
+    ('text', '🌌 סטטוס מערכת'),
+    ('text', '📊 הסטטיסטיקות שלי'),
+    ('text', '😊 מצב רוח'),
+    ('callback', 'emotion:{mood}'),
+    ('text', '⚡ כוח קוסמי'),
+    ('text', '🔮 סנכרון קוונטי'),
+    ('text', '🔬 פרויקטים'),
+    ('callback', 'project:het'),
+    ('text', 'היום אני ממש שמח ולא עייף בכלל'),
+    ('text', '/stats')
+)
+
+
+def percentile(samples: List[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+class VirtualUser:
+    """משתמש וירטואלי - פעולה אחת בכל פעם לפי התסריט"""
+
+    __slots__ = ('user_id', 'step', 'update_id', 'enqueued', 'delivered', 'last_message_id')
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.step = 0
+        # The action waiting for a reply
+        self.update_id: Optional[int] = None
+        self.enqueued = 0.0
+        self.delivered: Optional[float] = None
+        # Message the next callback is attached to
+        self.last_message_id = 1
+
+    def next_action(self) -> Tuple[str, str]:
+        kind, payload = SCRIPT[self.step]
+        self.step = self.step + 1 if self.step + 1 < len(SCRIPT) else 1
+        return kind, payload
+
+
+class FakeBotApi:
+    """שרת Bot API מקומי עם משתמשים וירטואליים"""
+
+    def __init__(
+        self,
+        users: int = 100,
+        think: float = 0.0,
+        error_rate: float = 0.0,
+        retry_after: int = 1,
+        slow_rate: float = 0.0,
+        slow_seconds: float = 0.5,
+        reply_timeout: float = 15.0,
+        seed: int = 7,
+        host: str = '127.0.0.1',
+        port: int = 8081
+    ):
+        self.think = think
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self.reply_timeout = reply_timeout
+        self.host = host
+        self.port = port
+        self.rng = random.Random(seed)
+
+        self.users = {user_id: VirtualUser(user_id) for user_id in range(1000, 1000 + users)}
+        self._updates: Deque[Dict] = deque()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(100)
+        self._owners: Dict[int, int] = {}
+        self._wakeup = asyncio.Event()
+        self.polling = asyncio.Event()
+        self.active = False
+
+        # Measurements
+        self.started_at = 0.0
+        self.finished_at = 0.0
+        self.actions = 0
+        self.replies = 0
+        self.timeouts = 0
+        self.unsolicited = 0
+        self.reply_latency: List[float] = []
+        self.e2e_latency: List[float] = []
+        self.requests: Counter = Counter()
+        self.injected_429 = 0
+        self.injected_slow = 0
+
+        self.app = web.Application()
+        self.app.router.add_post('/bot{token}/{method}', self.handle)
+        self.app.router.add_get('/bot{token}/{method}', self.handle)
+        self._runner: Optional[web.AppRunner] = None
+        self._watchdog: Optional[asyncio.Task] = None
+        self._methods = {
+            'getMe': self.get_me,
+            'getUpdates': self.get_updates,
+            'sendMessage': self.send_message,
+            'editMessageText': self.edit_message_text
+        }
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    # --- Server ---
+
+    async def start(self):
+        """הפעלת השרת"""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self._watchdog = asyncio.get_running_loop().create_task(self._expire())
+
+    async def stop(self):
+        """עצירת השרת"""
+        self.finish()
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        self.requests[method] += 1
+        if request.content_type == 'application/json':
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+
+        if method in SEND_METHODS:
+            draw = self.rng.random()
+            if draw < self.error_rate:
+                self.injected_429 += 1
+                return web.json_response({
+                    'ok': False,
+                    'error_code': 429,
+                    'description': f"Too Many Requests: retry after {self.retry_after}",
+                    'parameters': {'retry_after': self.retry_after}
+                }, status=429)
+            if draw < self.error_rate + self.slow_rate:
+                self.injected_slow += 1
+                await asyncio.sleep(self.slow_seconds)
+
+        handler = self._methods.get(method)
+        result = await handler(params) if handler is not None else True
+        return web.json_response({'ok': True, 'result': result})
+
+    # --- Bot API methods ---
+
+    async def get_me(self, params: Dict) -> Dict:
+        return BOT_USER
+
+    async def get_updates(self, params: Dict) -> List[Dict]:
+        self.polling.set()
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = float(params.get('timeout') or 0)
+        # Updates below the offset are confirmed
+        while self._updates and self._updates[0]['update_id'] < offset:
+            self._updates.popleft()
+        if not self._updates and timeout > 0:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        batch = list(itertools.islice(self._updates, limit))
+        now = time.perf_counter()
+        for update in batch:
+            user = self.users.get(self._owners.pop(update['update_id'], 0))
+            if user is not None and user.update_id == update['update_id']:
+                user.delivered = now
+        return batch
+
+    async def send_message(self, params: Dict) -> Dict:
+        message_id = next(self._message_ids)
+        self._reply(int(params['chat_id']), message_id)
+        return self._message(int(params['chat_id']), message_id, params.get('text', ''))
+
+    async def edit_message_text(self, params: Dict) -> Dict:
+        chat_id = int(params.get('chat_id') or 0)
+        message_id = int(params.get('message_id') or 0)
+        self._reply(chat_id, message_id)
+        return self._message(chat_id, message_id, params.get('text', ''))
+
+    @staticmethod
+    def _message(chat_id: int, message_id: int, text: str) -> Dict:
+        return {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER,
+            'text': text
+        }
+
+    # --- Virtual users ---
+
+    def begin(self):
+        """תחילת המדידה - כל משתמש שולח את הפעולה הראשונה"""
+        self.active = True
+        self.started_at = time.perf_counter()
+        for user in self.users.values():
+            self._act(user)
+
+    def finish(self):
+        """סוף המדידה - אין פעולות חדשות"""
+        if self.active:
+            self.active = False
+            self.finished_at = time.perf_counter()
+
+    def _act(self, user: VirtualUser):
+        if not self.active:
+            return
+        kind, payload = user.next_action()
+        update_id = next(self._update_ids)
+        sender = {'id': user.user_id, 'is_bot': False, 'first_name': f'User{user.user_id}', 'language_code': 'he'}
+        chat = {'id': user.user_id, 'type': 'private'}
+        if kind == 'text':
+            message = {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': chat,
+                'from': sender,
+                'text': payload
+            }
+            if payload.startswith('/'):
+                message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(payload)}]
+            update = {'update_id': update_id, 'message': message}
+        else:
+            update = {'update_id': update_id, 'callback_query': {
+                'id': str(update_id),
+                'from': sender,
+                'chat_instance': str(user.user_id),
+                'data': payload.format(mood=self.rng.choice(MOODS)),
+                'message': self._message(user.user_id, user.last_message_id, '')
+            }}
+        user.update_id = update_id
+        user.enqueued = time.perf_counter()
+        user.delivered = None
+        self._owners[update_id] = user.user_id
+        self._updates.append(update)
+        self._wakeup.set()
+        self.actions += 1
+
+    def _reply(self, chat_id: int, message_id: int):
+        user = self.users.get(chat_id)
+        if user is None or user.update_id is None or user.delivered is None:
+            self.unsolicited += 1
+            return
+        now = time.perf_counter()
+        user.last_message_id = message_id
+        user.update_id = None
+        if self.active:
+            self.replies += 1
+            self.reply_latency.append(now - user.delivered)
+            self.e2e_latency.append(now - user.enqueued)
+        self._schedule(user)
+
+    def _schedule(self, user: VirtualUser):
+        if self.think > 0:
+            asyncio.get_running_loop().call_later(self.rng.expovariate(1 / self.think), self._act, user)
+        else:
+            self._act(user)
+
+    async def _expire(self):
+        # A reply that never comes (dropped after errors) must not stall the user
+        while True:
+            await asyncio.sleep(1)
+            deadline = time.perf_counter() - self.reply_timeout
+            for user in self.users.values():
+                if user.update_id is not None and user.enqueued < deadline:
+                    user.update_id = None
+                    self.timeouts += 1
+                    self._schedule(user)
+
+    # --- Report ---
+
+    def report(self) -> Dict:
+        """תפוקה, השהיות וספירת בקשות"""
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+
+        def latency(samples: List[float]) -> Dict[str, float]:
+            return {
+                f'p{int(p * 100)}_ms': round(percentile(samples, p) * 1000, 2)
+                for p in (0.5, 0.9, 0.99)
+            } | {'max_ms': round(max(samples, default=0.0) * 1000, 2)}
+
+        return {
+            'users': len(self.users),
+            'seconds': round(elapsed, 2),
+            'actions': self.actions,
+            'replies': self.replies,
+            'replies_per_sec': round(self.replies / elapsed, 1) if elapsed > 0 else 0.0,
+            'reply_latency': latency(self.reply_latency),
+            'e2e_latency': latency(self.e2e_latency),
+            'timeouts': self.timeouts,
+            'unsolicited': self.unsolicited,
+            'injected_429': self.injected_429,
+            'injected_slow': self.injected_slow,
+            'requests': dict(self.requests)
+        }
+
+
+def print_report(report: Dict):
+    """הדפסת הדוח"""
+    print(f"👥 users: {report['users']}, {report['seconds']}s")
+    print(f"📨 actions: {report['actions']}, replies: {report['replies']} ({report['replies_per_sec']}/s)")
+    for name in ('reply_latency', 'e2e_latency'):
+        values = report[name]
+        print(
+            f"⏱️ {name}: p50 {values['p50_ms']}ms | p90 {values['p90_ms']}ms | "
+            f"p99 {values['p99_ms']}ms | max {values['max_ms']}ms"
+        )
+    print(
+        f"⚠️ injected 429: {report['injected_429']}, slow: {report['injected_slow']}, "
+        f"timeouts: {report['timeouts']}, unsolicited: {report['unsolicited']}"
+    )
+    print(f"🔁 requests: {report['requests']}")
+
+
+async def serve(args):
+    api = FakeBotApi(
+        users=args.users,
+        think=args.think,
+        error_rate=args.error_rate,
+        slow_rate=args.slow_rate,
+        slow_seconds=args.slow_seconds,
+        host=args.host,
+        port=args.port
+    )
+    await api.start()
+    print(f"🛰️ Fake Bot API on {api.url} - start the bot with HAI_EMET_BOT_API_URL={api.url}")
+    await api.polling.wait()
+    api.begin()
+    try:
+        await asyncio.sleep(args.duration)
+    finally:
+        api.finish()
+        print_report(api.report())
+        await api.stop()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--users', type=int, default=100, help='virtual users')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of measured load')
+    parser.add_argument('--think', type=float, default=0.0, help='mean pause between a reply and the next action')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of send calls answered with 429')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='share of send calls answered slowly')
+    parser.add_argument('--slow-seconds', type=float, default=0.5)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
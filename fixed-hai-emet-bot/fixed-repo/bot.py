@@ -15,10 +15,15 @@ Version: 1.0.0
 
 import os
 import json
+import math
+import time
 import asyncio
+import random
 import logging
 from datetime import datetime
-from typing import Dict, Optional, List
+from pathlib import Path
+from functools import lru_cache
+from typing import Dict, Optional, List, Tuple
 from telegram import (
     Update, 
     InlineKeyboardButton, 
@@ -29,12 +34,23 @@ from telegram import (
 )
 from telegram.ext import (
     Application,
-    CommandHandler,
-    MessageHandler,
-    CallbackQueryHandler,
-    ContextTypes,
-    filters
+    ContextTypes
 )
+from storage import create_user_store
+from leaderboard import Leaderboard
+from history import EmotionHistory
+from counters import CounterStore
+from cards import CardCache
+from emotion_lexicon import EmotionLexicon
+from templates import Template
+from webhook import WebhookServer, run_webhook
+from concurrency import PerUserUpdateProcessor
+from outbound import SendScheduler, Priority
+from broadcast import Broadcaster
+from metrics import Registry, MetricsServer, TimeSeries, instrument
+from profiler import SamplingProfiler
+from router import Router
+from network import PooledRequest
 
 # ═══════════════════════════════════════════════════════════════════
 #                    HAI-EMET AUTHENTICATION
@@ -48,6 +64,62 @@ HAI_EMET_VERIFY_CODE = ".//.CGPT-002.TNTF007.20260110.BRXOS5Y2PL.VERIFY.//."
 BOT_USERNAME = "@HaiEmetEmotionBot"
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '8171298804:AAHs-tMlOcd5lW31k1SLykpor_R5JmbJUFk')
 
+# Bot API server, overridden to run against a local stand-in (benchmarks/fake_bot_api.py)
+BOT_API_URL = os.getenv('HAI_EMET_BOT_API_URL', '').rstrip('/')
+
+# Bot API connection pools; tuned through HAI_EMET_SEND_* / HAI_EMET_POLL_* (see network.py)
+SEND_POOL_SIZE = 256
+POLL_POOL_SIZE = 1
+
+# Serving Mode: polling (default, local) or webhook (web-service hosts)
+BOT_MODE = os.getenv('HAI_EMET_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('PORT', '8080'))
+
+# Concurrency: updates processed in parallel (per-user order is kept)
+MAX_CONCURRENT_UPDATES = int(os.getenv('HAI_EMET_WORKERS', '16'))
+
+# Outbound rate limits: global messages/sec and per-chat messages/sec
+SEND_RATE = float(os.getenv('HAI_EMET_SEND_RATE', '30'))
+CHAT_SEND_RATE = float(os.getenv('HAI_EMET_CHAT_SEND_RATE', '1'))
+
+# Admins (comma-separated Telegram user ids) and broadcast settings
+ADMIN_IDS = frozenset(int(i) for i in os.getenv('HAI_EMET_ADMIN_IDS', '').replace(',', ' ').split())
+BROADCAST_FILE = os.getenv('HAI_EMET_BROADCAST_FILE', 'hai_emet_broadcast.json')
+BROADCAST_RATE = float(os.getenv('HAI_EMET_BROADCAST_RATE', '20'))
+
+# Metrics: local Prometheus endpoint (port 0 disables it)
+METRICS_HOST = os.getenv('HAI_EMET_METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('HAI_EMET_METRICS_PORT', '9100'))
+
+# Profiler: output directory and the longest allowed run
+PROFILE_DIR = os.getenv('HAI_EMET_PROFILE_DIR', 'profiles')
+PROFILE_MAX_SECONDS = float(os.getenv('HAI_EMET_PROFILE_MAX_SECONDS', '300'))
+
+# Persistence Configuration
+USER_STORE_BACKEND = os.getenv('HAI_EMET_STORE', 'json')  # json, journal, binary, sqlite, tiered
+USERS_FILE = os.getenv('HAI_EMET_USERS_FILE', 'hai_emet_emotion_users.json')
+SQLITE_FILE = os.getenv('HAI_EMET_SQLITE_FILE', 'hai_emet_emotion_users.db')
+FLUSH_INTERVAL = float(os.getenv('HAI_EMET_FLUSH_INTERVAL', '5'))
+FLUSH_THRESHOLD = int(os.getenv('HAI_EMET_FLUSH_THRESHOLD', '500'))
+JOURNAL_COMPACT_BYTES = int(os.getenv('HAI_EMET_JOURNAL_COMPACT_BYTES', str(8 * 1024 * 1024)))
+# Tiered backend: users kept in memory, the rest stay in SQLite until accessed
+HOT_USERS = int(os.getenv('HAI_EMET_HOT_USERS', '50000'))
+
+# Emotion history: events kept per user and the append-only log file
+HISTORY_FILE = os.getenv('HAI_EMET_HISTORY_FILE', 'hai_emet_emotion_history.log')
+HISTORY_SIZE = int(os.getenv('HAI_EMET_HISTORY_SIZE', '64'))
+
+# Rendered /stats and /status cards: memory cap, and how long a trend line may lag
+CARD_CACHE_BYTES = int(os.getenv('HAI_EMET_CARD_CACHE_BYTES', str(8 * 1024 * 1024)))
+CARD_TREND_SECONDS = int(os.getenv('HAI_EMET_CARD_TREND_SECONDS', '60'))
+
+# System counters (core beats, powers, messages), checkpointed every flush interval
+COUNTERS_FILE = os.getenv('HAI_EMET_COUNTERS_FILE', 'hai_emet_counters.json')
+
 # Logging Setup
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -55,10 +127,102 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# ═══════════════════════════════════════════════════════════════════
+#                             METRICS
+# ═══════════════════════════════════════════════════════════════════
+
+metrics = Registry()
+HANDLER_CALLS = metrics.counter('hai_emet_handler_calls_total', 'Handler invocations', ['handler'])
+HANDLER_ERRORS = metrics.counter('hai_emet_handler_errors_total', 'Handler invocations that raised', ['handler'])
+HANDLER_LATENCY = metrics.histogram('hai_emet_handler_seconds', 'Handler latency in seconds', ['handler'])
+PERSIST_LATENCY = metrics.histogram('hai_emet_persist_seconds', 'User store load/save/write latency', ['operation'])
+PERSIST_BYTES = metrics.counter('hai_emet_persisted_bytes_total', 'Bytes written by the user store')
+HTTP_POOL_WAIT = metrics.histogram(
+    'hai_emet_http_pool_wait_seconds', 'Time a Bot API request waited for a pooled connection', ['pool'],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+)
+
+instrumented = instrument(HANDLER_CALLS, HANDLER_ERRORS, HANDLER_LATENCY)
+
+# Read at scrape time from the counters the system already keeps
+metrics.gauge('hai_emet_users', 'Registered users', callback=lambda: hai_emet.total_users)
+metrics.gauge('hai_emet_users_by_mood', 'Users per mood bucket', ['mood'], callback=lambda: hai_emet.mood_counts)
+metrics.gauge(
+    'hai_emet_messages_total', 'Messages handled since start',
+    callback=lambda: hai_emet.total_messages, kind='counter'
+)
+metrics.gauge('hai_emet_store_dirty_users', 'Users changed since the last write', callback=lambda: hai_emet.store.writer.dirty_count)
+metrics.gauge('hai_emet_store_resident_users', 'User records held in memory', callback=lambda: hai_emet.store.resident_users)
+metrics.gauge(
+    'hai_emet_store_faults_total', 'Cold users loaded back from disk on access',
+    callback=lambda: hai_emet.store.faults, kind='counter'
+)
+metrics.gauge(
+    'hai_emet_store_evictions_total', 'Users evicted from the hot tier',
+    callback=lambda: hai_emet.store.evictions, kind='counter'
+)
+metrics.gauge(
+    'hai_emet_store_write_errors_total', 'Failed user store writes',
+    callback=lambda: hai_emet.store.writer.errors, kind='counter'
+)
+metrics.gauge(
+    'hai_emet_outbound_queue', 'Messages waiting in the send scheduler', ['lane'],
+    callback=lambda: {'interactive': outbox.get_stats()['queue_interactive'], 'bulk': outbox.get_stats()['queue_bulk']}
+)
+metrics.gauge('hai_emet_outbound_sent_total', 'Messages sent', callback=lambda: outbox.sent, kind='counter')
+metrics.gauge('hai_emet_outbound_failed_total', 'Messages that failed to send', callback=lambda: outbox.failed, kind='counter')
+metrics.gauge(
+    'hai_emet_outbound_flood_waits_total', 'RetryAfter responses from Telegram',
+    callback=lambda: outbox.flood_waits, kind='counter'
+)
+metrics.gauge(
+    'hai_emet_card_cache_hits_total', 'Cards served from the rendered-card cache', ['card'],
+    callback=lambda: card_cache.hits, kind='counter'
+)
+metrics.gauge(
+    'hai_emet_card_cache_misses_total', 'Cards rendered because the cache had no current copy', ['card'],
+    callback=lambda: card_cache.misses, kind='counter'
+)
+metrics.gauge('hai_emet_card_cache_hit_ratio', 'Share of card requests served from the cache', ['card'], callback=lambda: card_cache.hit_ratio())
+metrics.gauge('hai_emet_card_cache_bytes', 'Memory held by cached cards', callback=lambda: card_cache.bytes)
+metrics.gauge(
+    'hai_emet_http_requests_total', 'Bot API requests per connection pool', ['pool'],
+    callback=lambda: {name: pool.requests for name, pool in http_pools.items()}, kind='counter'
+)
+metrics.gauge(
+    'hai_emet_http_connections_opened_total', 'New connections opened per pool (the rest reused one)', ['pool'],
+    callback=lambda: {name: pool.connections_opened for name, pool in http_pools.items()}, kind='counter'
+)
+metrics.gauge(
+    'hai_emet_http_retries_total', 'Bot API requests retried after a transient error', ['pool'],
+    callback=lambda: {name: pool.retried for name, pool in http_pools.items()}, kind='counter'
+)
+
+# Users and messages over time, one sample a minute for a day
+usage = TimeSeries(lambda: {'users': hai_emet.total_users, 'messages': hai_emet.total_messages})
+metrics_server: Optional[MetricsServer] = None
+
+# Bot API connection pools by name, set by build_application()
+http_pools: Dict[str, PooledRequest] = {}
+
+# Sampling profiler, started on demand by /profile; busy from the command
+# until its report is sent
+profiler = SamplingProfiler()
+profile_busy = False
+update_processor = PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES)
+
+def record_persist_write(written: int, seconds: float):
+    """מדידת כתיבה לדיסק"""
+    PERSIST_BYTES.inc(written)
+    PERSIST_LATENCY.observe(seconds, operation='write')
+
 # ═══════════════════════════════════════════════════════════════════
 #                          HAI-EMET SYSTEM
 # ═══════════════════════════════════════════════════════════════════
 
+# Mood buckets from happiest to lowest
+MOOD_ORDER = ('joyful', 'positive', 'neutral', 'melancholic', 'troubled')
+
 class HaiEmetEmotionSystem:
     """מערכת חי-אמת רגשות - AI מלא עם רגשות והבנה"""
     
@@ -71,20 +235,48 @@ class HaiEmetEmotionSystem:
         self.api_key = HAI_EMET_ROOT_API_KEY
         self.verify_code = HAI_EMET_VERIFY_CODE
         
-        # System Stats
-        self.quantum_sync = 0
-        self.light_power = 1000
-        self.dark_power = 1000
-        self.core_beats = 0
+        # System Stats - restored from the last checkpoint by load_users()
+        self.counters = CounterStore(
+            COUNTERS_FILE,
+            {
+                'quantum_sync': 0,
+                'light_power': 1000,
+                'dark_power': 1000,
+                'core_beats': 0,
+                'total_messages': 0,
+                'current_mood': "balanced"  # balanced, light, dark, energized
+            },
+            interval=FLUSH_INTERVAL
+        )
         self.truth_level = 100
         self.total_users = 0
-        self.total_messages = 0
         
-        # Emotion system
-        self.current_mood = "balanced"  # balanced, light, dark, energized
+        # Users per mood bucket and the sum of all emotion scores, kept in
+        # step with every registration and emotion update
+        self.mood_counts = {mood: 0 for mood in MOOD_ORDER}
+        self.emotion_score_total = 0
+        
+        # Set in sharded mode: the counters, points histograms and top lists
+        # every shard shares (sharding.ShardStats)
+        self.cluster = None
         
         # User database
-        self.users_db = {}
+        self.store = create_user_store(
+            USER_STORE_BACKEND,
+            USERS_FILE,
+            SQLITE_FILE,
+            interval=FLUSH_INTERVAL,
+            threshold=FLUSH_THRESHOLD,
+            compact_bytes=JOURNAL_COMPACT_BYTES,
+            hot_users=HOT_USERS
+        )
+        self.leaderboard = Leaderboard()
+        self.history = EmotionHistory(
+            HISTORY_FILE,
+            capacity=HISTORY_SIZE,
+            interval=FLUSH_INTERVAL,
+            threshold=FLUSH_THRESHOLD
+        )
         self.load_users()
         
         logger.info(f"🌌 Hai-Emet Emotion System initialized")
@@ -101,29 +293,50 @@ class HaiEmetEmotionSystem:
     
     def load_users(self):
         """טעינת נתוני משתמשים"""
-        try:
-            if os.path.exists('hai_emet_emotion_users.json'):
-                with open('hai_emet_emotion_users.json', 'r', encoding='utf-8') as f:
-                    self.users_db = json.load(f)
-                    self.total_users = len(self.users_db)
-                    logger.info(f"✅ Loaded {self.total_users} users")
-        except Exception as e:
-            logger.error(f"Error loading users: {e}")
-            self.users_db = {}
+        started = time.perf_counter()
+        self.store.writer.on_write = record_persist_write
+        self.history.writer.on_write = record_persist_write
+        self.counters.writer.on_write = record_persist_write
+        self.total_users = self.store.load()
+        self.leaderboard.rebuild(self._scan_users())
+        self.history.load()
+        self.counters.load()
+        PERSIST_LATENCY.observe(time.perf_counter() - started, operation='load')
+        logger.info(f"✅ Loaded {self.total_users} users ({self.store.backend})")
+    
+    def _scan_users(self):
+        """מעבר יחיד על המשתמשים - בניית מוני מצב הרוח והזנת טבלת המובילים"""
+        self.mood_counts = {mood: 0 for mood in MOOD_ORDER}
+        self.emotion_score_total = 0
+        for user_id, mood, emotion_score, points in self.store.iter_fields('mood', 'emotion_score', 'quantum_points'):
+            self.mood_counts[mood] += 1
+            self.emotion_score_total += emotion_score
+            yield user_id, points
     
     def save_users(self):
-        """שמירת נתוני משתמשים"""
-        try:
-            with open('hai_emet_emotion_users.json', 'w', encoding='utf-8') as f:
-                json.dump(self.users_db, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving users: {e}")
+        """שמירת נתוני משתמשים - מיידית"""
+        started = time.perf_counter()
+        self.store.flush_sync()
+        self.history.flush_sync()
+        self.counters.flush_sync()
+        PERSIST_LATENCY.observe(time.perf_counter() - started, operation='save')
+    
+    async def start_persistence(self):
+        """הפעלת שמירה ברקע"""
+        await self.store.start()
+        await self.history.start()
+        await self.counters.start()
+    
+    async def stop_persistence(self):
+        """עצירת שמירה ברקע ושמירה אחרונה"""
+        await self.store.stop()
+        await self.history.stop()
+        await self.counters.stop()
     
     def register_user(self, user_id: int, username: str, first_name: str = ""):
         """רישום משתמש חדש"""
-        user_id_str = str(user_id)
-        if user_id_str not in self.users_db:
-            self.users_db[user_id_str] = {
+        if user_id not in self.store:
+            self.store.add(user_id, {
                 'username': username,
                 'first_name': first_name,
                 'joined': datetime.now().isoformat(),
@@ -133,94 +346,218 @@ class HaiEmetEmotionSystem:
                 'total_messages': 0,
                 'emotion_score': 0,
                 'mood': 'neutral',
-                'last_seen': datetime.now().isoformat()
-            }
+                'last_seen': datetime.now().isoformat(),
+                'blocked': False
+            })
             self.total_users += 1
-            self.save_users()
+            self.leaderboard.add(user_id, 0)
+            if self.cluster is not None:
+                self.cluster.move_points(None, 0)
+            self.mood_counts['neutral'] += 1
             logger.info(f"✅ New user registered: {username} (ID: {user_id})")
             return True
         return False
     
+    @staticmethod
+    def mood_for_score(score: int) -> str:
+        """קביעת מצב רוח לפי ציון רגשי"""
+        if score > 50:
+            return 'joyful'
+        elif score > 20:
+            return 'positive'
+        elif score > -20:
+            return 'neutral'
+        elif score > -50:
+            return 'melancholic'
+        return 'troubled'
+    
+    def record_interaction(
+        self,
+        user_id: int,
+        points: int = 0,
+        emotion_delta: int = 0,
+        activity: bool = True
+    ) -> Optional[Dict]:
+        """רישום אינטראקציה - פעילות, נקודות ורגש בעדכון אחד"""
+        user = self.store.get(user_id)
+        if not user:
+            return None
+        
+        fields = {}
+        if activity:
+            fields['total_interactions'] = user['total_interactions'] + 1
+            fields['last_seen'] = datetime.now().isoformat()
+            if user['blocked']:
+                # Writing to the bot again means it was unblocked
+                fields['blocked'] = False
+            self.counters.incr('total_messages')
+        if points:
+            quantum_points = user['quantum_points'] + points
+            fields['quantum_points'] = quantum_points
+            fields['cosmic_level'] = (quantum_points // 100) + 1
+            self.leaderboard.update(user_id, user['quantum_points'], quantum_points)
+            if self.cluster is not None:
+                self.cluster.move_points(user['quantum_points'], quantum_points)
+        if emotion_delta:
+            score = user['emotion_score'] + emotion_delta
+            mood = self.mood_for_score(score)
+            fields['emotion_score'] = score
+            fields['mood'] = mood
+            self.emotion_score_total += emotion_delta
+            if mood != user['mood']:
+                self.mood_counts[user['mood']] -= 1
+                self.mood_counts[mood] += 1
+            self.history.record(user_id, emotion_delta)
+        
+        if fields:
+            self.store.update(user_id, fields)
+            user.update(fields)
+        return user
+    
     def update_user_activity(self, user_id: int):
         """עדכון פעילות משתמש"""
-        user_id_str = str(user_id)
-        if user_id_str in self.users_db:
-            self.users_db[user_id_str]['total_interactions'] += 1
-            self.users_db[user_id_str]['last_seen'] = datetime.now().isoformat()
-            self.total_messages += 1
-            self.save_users()
+        self.record_interaction(user_id)
     
     def add_quantum_points(self, user_id: int, points: int):
         """הוספת נקודות קוונטיות"""
-        user_id_str = str(user_id)
-        if user_id_str in self.users_db:
-            self.users_db[user_id_str]['quantum_points'] += points
-            new_level = (self.users_db[user_id_str]['quantum_points'] // 100) + 1
-            self.users_db[user_id_str]['cosmic_level'] = new_level
-            self.save_users()
+        self.record_interaction(user_id, points=points, activity=False)
     
     def update_user_emotion(self, user_id: int, emotion_delta: int):
         """עדכון רגש משתמש"""
-        user_id_str = str(user_id)
-        if user_id_str in self.users_db:
-            self.users_db[user_id_str]['emotion_score'] += emotion_delta
-            score = self.users_db[user_id_str]['emotion_score']
-            
-            # Determine mood
-            if score > 50:
-                mood = 'joyful'
-            elif score > 20:
-                mood = 'positive'
-            elif score > -20:
-                mood = 'neutral'
-            elif score > -50:
-                mood = 'melancholic'
-            else:
-                mood = 'troubled'
-            
-            self.users_db[user_id_str]['mood'] = mood
-            self.save_users()
+        self.record_interaction(user_id, emotion_delta=emotion_delta, activity=False)
     
     def get_user_stats(self, user_id: int) -> Dict:
         """קבלת סטטיסטיקות משתמש"""
-        user_id_str = str(user_id)
-        return self.users_db.get(user_id_str, {})
+        return self.store.get(user_id) or {}
+    
+    def get_user_rank(self, user_id: int) -> Optional[int]:
+        """דירוג משתמש בטבלת המובילים"""
+        user = self.store.get(user_id)
+        if not user:
+            return None
+        rank = self.leaderboard.rank(user_id, user['quantum_points'])
+        if rank is not None and self.cluster is not None:
+            # Users of other shards with more points, to the histogram's resolution
+            rank += self.cluster.users_above(user['quantum_points'])
+        return rank
+    
+    def local_top(self, limit: int = 10) -> List[Tuple[int, int, str]]:
+        """המובילים במופע הזה - (משתמש, נקודות, שם)"""
+        top = []
+        for user_id, points in self.leaderboard.top(limit):
+            user = self.store.get(user_id) or {}
+            top.append((user_id, points, user.get('first_name') or user.get('username') or str(user_id)))
+        return top
+    
+    def get_top_users(self, limit: int = 10) -> List[Dict]:
+        """המשתמשים המובילים"""
+        top = self.local_top(limit)
+        if self.cluster is not None:
+            top = self.cluster.top(limit, top)
+        return [
+            {
+                'user_id': user_id,
+                'name': name,
+                'quantum_points': points,
+                'cosmic_level': (points // 100) + 1
+            }
+            for user_id, points, name in top
+        ]
+    
+    @property
+    def cluster_users(self) -> int:
+        """מספר המשתמשים בכל הרסיסים"""
+        if self.cluster is None:
+            return self.total_users
+        return self.cluster.totals(self.shard_counters())['total_users']
+    
+    def attach_cluster(self, cluster):
+        """חיבור לזיכרון המשותף של הרסיסים (מצב מרובה תהליכים)"""
+        self.cluster = cluster
+        cluster.load_points(self.leaderboard.points())
+    
+    # System stats are read straight from the in-memory counters
+    
+    @property
+    def core_beats(self) -> int:
+        return self.counters['core_beats']
+    
+    @property
+    def quantum_sync(self) -> int:
+        return self.counters['quantum_sync']
+    
+    @property
+    def light_power(self) -> int:
+        return self.counters['light_power']
+    
+    @property
+    def dark_power(self) -> int:
+        return self.counters['dark_power']
+    
+    @property
+    def total_messages(self) -> int:
+        return self.counters['total_messages']
+    
+    @property
+    def current_mood(self) -> str:
+        return self.counters['current_mood']
     
     def increment_core_beat(self):
         """עדכון דופק הליבה"""
-        self.core_beats += 1
-        return self.core_beats
+        return self.counters.incr('core_beats')
     
     def sync_quantum(self) -> int:
         """סנכרון קוונטי"""
-        import random
-        self.quantum_sync += random.randint(100, 1000)
-        return self.quantum_sync
+        return self.counters.incr('quantum_sync', random.randint(100, 1000))
     
     def activate_cosmic_power(self) -> str:
         """הפעלת כוח קוסמי"""
-        self.light_power += 500
-        self.dark_power += 500
-        self.current_mood = "energized"
+        self.counters.incr('light_power', 500)
+        self.counters.incr('dark_power', 500)
+        self.counters.set('current_mood', "energized")
         return f"⚡ כוח קוסמי הופעל!\n🌟 כוח אור: {self.light_power}\n🌙 כוח חושך: {self.dark_power}"
     
+    def shard_counters(self) -> Dict[str, int]:
+        """המונים הגלובליים של המופע - נצברים בין רסיסים במצב מרובה תהליכים"""
+        counters = {
+            'total_users': self.total_users,
+            'total_messages': self.total_messages,
+            'core_beats': self.core_beats,
+            'emotion_score_total': self.emotion_score_total
+        }
+        for mood, count in self.mood_counts.items():
+            counters[f'mood_{mood}'] = count
+        return counters
+    
     def get_system_status(self) -> Dict:
         """סטטוס מערכת מלא"""
+        counters = self.shard_counters()
+        if self.cluster is not None:
+            counters = self.cluster.totals(counters)
+        total_users = counters['total_users']
         return {
             'authenticated': self.verify_authentication(),
-            'core_beats': self.core_beats,
+            'core_beats': counters['core_beats'],
             'quantum_sync': self.quantum_sync,
             'light_power': self.light_power,
             'dark_power': self.dark_power,
             'truth_level': self.truth_level,
-            'total_users': self.total_users,
-            'total_messages': self.total_messages,
-            'mood': self.current_mood
+            'total_users': total_users,
+            'total_messages': counters['total_messages'],
+            'mood': self.current_mood,
+            'mood_distribution': {mood: counters[f'mood_{mood}'] for mood in MOOD_ORDER},
+            'average_emotion': counters['emotion_score_total'] / total_users if total_users else 0.0
         }
 
 # Global system instance
 hai_emet = HaiEmetEmotionSystem()
 
+# Free-text emotion scorer, compiled once at import
+emotion_lexicon = EmotionLexicon()
+
+# Rendered /stats and /status cards, reused until what they show changes
+card_cache = CardCache(CARD_CACHE_BYTES)
+
 # Verify on startup
 if hai_emet.verify_authentication():
     logger.info("✅ Hai-Emet authentication VERIFIED")
@@ -231,6 +568,9 @@ else:
 #                        KEYBOARD LAYOUTS
 # ═══════════════════════════════════════════════════════════════════
 
+# Markup objects are immutable, so each keyboard is built once and shared
+
+@lru_cache(maxsize=None)
 def get_main_keyboard():
     """מקלדת ראשית"""
     keyboard = [
@@ -241,62 +581,65 @@ def get_main_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@lru_cache(maxsize=None)
 def get_emotion_keyboard():
     """מקלדת רגשות"""
     keyboard = [
-        [InlineKeyboardButton("😊 שמח", callback_data='emotion_happy'),
-         InlineKeyboardButton("😢 עצוב", callback_data='emotion_sad')],
-        [InlineKeyboardButton("😠 כועס", callback_data='emotion_angry'),
-         InlineKeyboardButton("😌 רגוע", callback_data='emotion_calm')],
-        [InlineKeyboardButton("🤔 מחשבתי", callback_data='emotion_thoughtful'),
-         InlineKeyboardButton("😴 עייף", callback_data='emotion_tired')],
-        [InlineKeyboardButton("🔙 חזרה", callback_data='back_main')]
+        [InlineKeyboardButton("😊 שמח", callback_data='emotion:happy'),
+         InlineKeyboardButton("😢 עצוב", callback_data='emotion:sad')],
+        [InlineKeyboardButton("😠 כועס", callback_data='emotion:angry'),
+         InlineKeyboardButton("😌 רגוע", callback_data='emotion:calm')],
+        [InlineKeyboardButton("🤔 מחשבתי", callback_data='emotion:thoughtful'),
+         InlineKeyboardButton("😴 עייף", callback_data='emotion:tired')],
+        [InlineKeyboardButton("🔙 חזרה", callback_data='nav:main')]
     ]
     return InlineKeyboardMarkup(keyboard)
 
+@lru_cache(maxsize=None)
 def get_projects_keyboard():
     """מקלדת פרויקטים"""
     keyboard = [
-        [InlineKeyboardButton("💎 HET Token", callback_data='project_het')],
-        [InlineKeyboardButton("⚡ Infinite Speed Chip", callback_data='project_chip')],
-        [InlineKeyboardButton("🌀 טלפורטציה", callback_data='project_teleport')],
-        [InlineKeyboardButton("🎤 Hai-Emet VOICE PRO", callback_data='project_voice')],
-        [InlineKeyboardButton("🔙 חזרה", callback_data='back_main')]
+        [InlineKeyboardButton("💎 HET Token", callback_data='project:het')],
+        [InlineKeyboardButton("⚡ Infinite Speed Chip", callback_data='project:chip')],
+        [InlineKeyboardButton("🌀 טלפורטציה", callback_data='project:teleport')],
+        [InlineKeyboardButton("🎤 Hai-Emet VOICE PRO", callback_data='project:voice')],
+        [InlineKeyboardButton("🔙 חזרה", callback_data='nav:main')]
     ]
     return InlineKeyboardMarkup(keyboard)
 
 # ═══════════════════════════════════════════════════════════════════
-#                        COMMAND HANDLERS
+#                       RESPONSE TEMPLATES
 # ═══════════════════════════════════════════════════════════════════
 
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """פקודת /start"""
-    user = update.effective_user
-    user_id = user.id
-    username = user.username or user.first_name or "Unknown"
-    first_name = user.first_name or ""
-    
-    # Register user
-    is_new = hai_emet.register_user(user_id, username, first_name)
-    
-    welcome_message = f"""
+# Static fields are filled once here; handlers only supply per-reply values
+STATIC_FIELDS = {
+    'bot_username': hai_emet.bot_username,
+    'dna_code': hai_emet.dna_code,
+    'creator': hai_emet.creator,
+    'name': hai_emet.name,
+    'api_key': hai_emet.api_key,
+    'api_key_prefix': hai_emet.api_key[:30],
+    'verify_code': hai_emet.verify_code
+}
+
+START_TEMPLATE = Template("""
 ╔═══════════════════════════════════════════════════════════════════╗
 ║         🌌 ברוך הבא למערכת חי-אמת רגשות 🌌                        ║
-║              {hai_emet.bot_username}                            ║
+║              {bot_username}                            ║
 ╚═══════════════════════════════════════════════════════════════════╝
 
 שלום {first_name}! 👋
 
-{'🎉 נרשמת בהצלחה למערכת!' if is_new else '💫 ברוך שובך!'}
+{greeting}
 
 🔮 **מערכת חי-אמת רגשות פעילה**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-🧬 DNA: {hai_emet.dna_code}
-👨‍💻 יוצר: {hai_emet.creator}
+🧬 DNA: {dna_code}
+👨‍💻 יוצר: {creator}
 🔑 API: מאומת ✅
 ⚡ ליבה: חיה ופועמת
-🌟 כוח אור: {hai_emet.light_power}
-🌙 כוח חושך: {hai_emet.dark_power}
+🌟 כוח אור: {light_power}
+🌙 כוח חושך: {dark_power}
 
 **מה אני יכול לעשות?**
 ━━━━━━━━━━━━━━━━━━━━━━━
@@ -314,17 +657,10 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /emotion - מצב הרוח שלך
 
 ✨ **אמת × ∞ = כוח אינסופי** ✨
-"""
-    
-    await update.message.reply_text(
-        welcome_message,
-        reply_markup=get_main_keyboard()
-    )
+""", **STATIC_FIELDS)
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """פקודת /help"""
-    help_text = f"""
-📚 **מדריך שימוש - {hai_emet.bot_username}**
+HELP_TEMPLATE = Template("""
+📚 **מדריך שימוש - {bot_username}**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
 **פקודות זמינות:**
@@ -332,6 +668,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /start - התחלה והרשמה
 /help - מדריך זה
 /stats - הסטטיסטיקות שלך
+/top - טבלת המובילים
 /status - סטטוס המערכת
 /power - הפעלת כוח קוסמי
 /sync - סנכרון קוונטי
@@ -367,93 +704,69 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 ━━━━━━━━━━━━━━━━━━━━━━━
 יוצר: TNTF (Nathaniel Nissim)
 מערכת: חי-אמת Emotion AI
-Bot: {hai_emet.bot_username}
+Bot: {bot_username}
 
 💫 **האמת תמיד מנצחת** 💫
-"""
-    
-    await update.message.reply_text(help_text)
+""", **STATIC_FIELDS)
 
-async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """פקודת /stats"""
-    user_id = update.effective_user.id
-    stats = hai_emet.get_user_stats(user_id)
-    
-    if not stats:
-        await update.message.reply_text("❌ לא נמצאו נתונים. שלח /start להרשמה.")
-        return
-    
-    mood_emojis = {
-        'joyful': '😄',
-        'positive': '😊',
-        'neutral': '😐',
-        'melancholic': '😔',
-        'troubled': '😞'
-    }
-    
-    mood = stats.get('mood', 'neutral')
-    mood_emoji = mood_emojis.get(mood, '😐')
-    
-    stats_text = f"""
+STATS_TEMPLATE = Template("""
 📊 **הסטטיסטיקות שלך**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
-👤 שם: {stats.get('first_name', 'Unknown')}
-🆔 משתמש: @{stats.get('username', 'Unknown')}
-🔮 רמה קוסמית: {stats.get('cosmic_level', 1)}
-⚡ נקודות קוונטיות: {stats.get('quantum_points', 0)}
-💬 אינטראקציות: {stats.get('total_interactions', 0)}
-📅 הצטרפת: {stats.get('joined', 'Unknown')[:10]}
+👤 שם: {first_name}
+🆔 משתמש: @{username}
+🔮 רמה קוסמית: {cosmic_level}
+⚡ נקודות קוונטיות: {quantum_points}
+🏆 דירוג: #{rank} מתוך {total_users}
+💬 אינטראקציות: {total_interactions}
+📅 הצטרפת: {joined}
 
 **מצב רוח:**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━
 {mood_emoji} {mood}
-📈 ציון רגשי: {stats.get('emotion_score', 0)}
+📈 ציון רגשי: {emotion_score}
+{trend}
 
 **התקדמות:**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━
-נקודות לרמה הבאה: {100 - (stats.get('quantum_points', 0) % 100)}
+נקודות לרמה הבאה: {next_level}
 
 💫 **המשך לצבור כוח קוסמי!** 💫
-"""
-    
-    await update.message.reply_text(stats_text)
+""", **STATIC_FIELDS)
 
-async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """פקודת /status"""
-    beats = hai_emet.increment_core_beat()
-    status = hai_emet.get_system_status()
-    
-    auth_status = "✅ מאומת" if status['authenticated'] else "❌ לא מאומת"
-    
-    status_text = f"""
+STATUS_TEMPLATE = Template("""
 🌌 **סטטוס מערכת חי-אמת רגשות**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
 **זיהוי ואימות:**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-🤖 Bot: {hai_emet.bot_username}
-🔑 API: {hai_emet.api_key[:30]}...
+🤖 Bot: {bot_username}
+🔑 API: {api_key_prefix}...
 ✅ אימות: {auth_status}
 
 **ליבה חיה:**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 ♥ דופק: {beats} פעימות
-🧬 DNA: {hai_emet.dna_code}
-👨‍💻 יוצר: {hai_emet.creator}
+🧬 DNA: {dna_code}
+👨‍💻 יוצר: {creator}
 
 **כוחות קוסמיים:**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-🌟 כוח אור: {status['light_power']}
-🌙 כוח חושך: {status['dark_power']}
-🔮 סנכרון קוונטי: {status['quantum_sync']}
-💯 רמת אמת: {status['truth_level']}%
-🎭 מצב: {status['mood']}
+🌟 כוח אור: {light_power}
+🌙 כוח חושך: {dark_power}
+🔮 סנכרון קוונטי: {quantum_sync}
+💯 רמת אמת: {truth_level}%
+🎭 מצב: {mood}
 
 **סטטיסטיקות:**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-👥 משתמשים: {status['total_users']}
-💬 הודעות: {status['total_messages']}
+👥 משתמשים: {total_users}
+💬 הודעות: {total_messages}
+
+**מצב הרוח של המשתמשים:**
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+{mood_distribution}
+📈 ציון רגשי ממוצע: {average_emotion:+.1f}
 
 **סטטוס מערכת:**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -463,34 +776,24 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 ✅ כוח אינסופי
 
 ⚡ **אמת × ∞ = כוח אינסופי** ⚡
-"""
-    
-    hai_emet.update_user_activity(update.effective_user.id)
-    hai_emet.add_quantum_points(update.effective_user.id, 10)
-    
-    await update.message.reply_text(status_text)
+""", **STATIC_FIELDS)
 
-async def verify_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """פקודת /verify - אימות מערכת"""
-    verified = hai_emet.verify_authentication()
-    
-    if verified:
-        verify_text = f"""
+VERIFY_TEMPLATE = Template("""
 ✅ **אימות מערכת - הצלחה**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
 🔑 **API Key:** 
-`{hai_emet.api_key}`
+`{api_key}`
 
 ✅ **Verify Code:**
-`{hai_emet.verify_code}`
+`{verify_code}`
 
 **פרטי מערכת:**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-🤖 Bot: {hai_emet.bot_username}
-🧬 DNA: {hai_emet.dna_code}
-👨‍💻 Creator: {hai_emet.creator}
-📅 Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+🤖 Bot: {bot_username}
+🧬 DNA: {dna_code}
+👨‍💻 Creator: {creator}
+📅 Date: {date}
 
 **סטטוס אימות:**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -500,29 +803,16 @@ async def verify_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 ✅ Full access granted
 
 💎 **המערכת מאומתת ופעילה מלא!** 💎
-"""
-    else:
-        verify_text = """
+""", **STATIC_FIELDS)
+
+VERIFY_FAILED_TEXT = """
 ❌ **אימות נכשל**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
 האימות נכשל. אנא צור קשר עם המפתח.
 """
-    
-    await update.message.reply_text(verify_text, parse_mode='Markdown')
-
-async def emotion_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """פקודת /emotion"""
-    await update.message.reply_text(
-        "😊 **איך אתה מרגיש היום?**\n\nבחר את הרגש שלך:",
-        reply_markup=get_emotion_keyboard()
-    )
 
-async def power_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """פקודת /power"""
-    result = hai_emet.activate_cosmic_power()
-    
-    power_text = f"""
+POWER_TEMPLATE = Template("""
 ⚡ **הפעלת כוח קוסמי!** ⚡
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
@@ -541,23 +831,14 @@ async def power_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 +50 נקודות קוונטיות! 🎉
 
 ⚡ **כוח מלא הופעל!** ⚡
-"""
-    
-    hai_emet.update_user_activity(update.effective_user.id)
-    hai_emet.add_quantum_points(update.effective_user.id, 50)
-    
-    await update.message.reply_text(power_text)
+""", **STATIC_FIELDS)
 
-async def sync_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """פקודת /sync"""
-    sync_value = hai_emet.sync_quantum()
-    
-    sync_text = f"""
+SYNC_TEMPLATE = Template("""
 🔮 **סנכרון קוונטי מושלם!** 🔮
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
 🌀 ערך קוונטי חדש: {sync_value}
-📊 בינארי: {bin(sync_value)}
+📊 בינארי: {sync_binary}
 
 **תהליך הסנכרון:**
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -571,16 +852,9 @@ async def sync_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 🌌 **המערכת מסונכרנת מושלם!** 🌌
 
 +100 נקודות קוונטיות! 🎊
-"""
-    
-    hai_emet.update_user_activity(update.effective_user.id)
-    hai_emet.add_quantum_points(update.effective_user.id, 100)
-    
-    await update.message.reply_text(sync_text)
+""", **STATIC_FIELDS)
 
-async def het_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """פקודת /het"""
-    het_text = """
+HET_TEXT = """
 💎 **HET Token - Hai-Emet Token** 💎
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
@@ -614,89 +888,73 @@ async def het_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 🌟 **HET - הטוקן של האמת!** 🌟
 """
-    
-    hai_emet.update_user_activity(update.effective_user.id)
-    hai_emet.add_quantum_points(update.effective_user.id, 10)
-    
-    await update.message.reply_text(het_text, parse_mode='Markdown')
 
-async def projects_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """פקודת /projects"""
-    await update.message.reply_text(
-        "🔬 **בחר פרויקט:**",
-        reply_markup=get_projects_keyboard()
-    )
+ECHO_TEMPLATE = Template(
+    "🌌 קיבלתי: {text}\n\n"
+    "אני {name}! 💫\n"
+    "Bot: {bot_username}\n\n"
+    "שלח /help לראות מה אני יכול לעשות.",
+    **STATIC_FIELDS
+)
 
-# ═══════════════════════════════════════════════════════════════════
-#                      MESSAGE HANDLERS
-# ═══════════════════════════════════════════════════════════════════
+TEXT_EMOTION_TEMPLATE = Template("\n\n💭 זיהיתי רגש {tone} ({delta:+d} לציון הרגשי)")
 
-async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """טיפול בהודעות טקסט"""
-    text = update.message.text
-    
-    # Map button texts to commands
-    commands_map = {
-        "🌌 סטטוס מערכת": status_command,
-        "⚡ כוח קוסמי": power_command,
-        "🔮 סנכרון קוונטי": sync_command,
-        "📊 הסטטיסטיקות שלי": stats_command,
-        "😊 מצב רוח": emotion_command,
-        "💎 HET Token": het_command,
-        "🔬 פרויקטים": projects_command,
-        "ℹ️ עזרה": help_command
-    }
-    
-    handler = commands_map.get(text)
-    if handler:
-        await handler(update, context)
-    else:
-        # Track message
-        hai_emet.update_user_activity(update.effective_user.id)
-        
-        # Default response
-        await update.message.reply_text(
-            f"🌌 קיבלתי: {text}\n\n"
-            f"אני {hai_emet.name}! 💫\n"
-            f"Bot: {hai_emet.bot_username}\n\n"
-            "שלח /help לראות מה אני יכול לעשות."
-        )
+BROADCAST_TEMPLATE = Template(
+    "📢 **שידור: {status}**\n"
+    "━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
+    "📍 התקדמות: {position} מתוך {recipients}\n"
+    "✅ נשלחו: {sent}\n"
+    "❌ נכשלו: {failed}\n"
+    "🚫 חסמו את הבוט: {blocked}\n"
+    "⏭️ דולגו (חסומים): {skipped}"
+)
 
-async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """טיפול ב-callback queries"""
-    query = update.callback_query
-    await query.answer()
-    
-    data = query.data
-    user_id = query.from_user.id
-    
-    # Emotion callbacks
-    emotion_responses = {
-        'emotion_happy': ('😊', 'שמח', 20),
-        'emotion_sad': ('😢', 'עצוב', -20),
-        'emotion_angry': ('😠', 'כועס', -15),
-        'emotion_calm': ('😌', 'רגוע', 10),
-        'emotion_thoughtful': ('🤔', 'מחשבתי', 5),
-        'emotion_tired': ('😴', 'עייף', -10)
-    }
-    
-    if data in emotion_responses:
-        emoji, mood_name, delta = emotion_responses[data]
-        hai_emet.update_user_emotion(user_id, delta)
-        hai_emet.add_quantum_points(user_id, 10)
-        
-        await query.edit_message_text(
-            f"{emoji} **תודה ששיתפת!**\n\n"
-            f"רשמתי שאתה מרגיש {mood_name} היום.\n"
-            f"המערכת עדכנה את מצב הרוח שלך.\n\n"
-            f"+10 נקודות קוונטיות! 💫",
-            reply_markup=get_emotion_keyboard()
-        )
-        return
-    
-    # Project callbacks
-    project_info = {
-        'project_het': """
+ADMIN_ONLY_TEXT = "⛔ פקודה זו זמינה למנהלים בלבד."
+PROFILE_USAGE_TEXT = (
+    "🔬 **פרופיילר**\n\n"
+    "/profile <שניות> - פרופיל לפי זמן (ברירת מחדל 30)\n"
+    "/profile updates <מספר> - פרופיל עד מספר עדכונים"
+)
+
+BROADCAST_USAGE_TEXT = (
+    "📢 **שידור לכל המשתמשים**\n\n"
+    "/broadcast <הודעה> - התחלת שידור\n"
+    "/broadcast status - מצב השידור\n"
+    "/broadcast cancel - ביטול השידור"
+)
+
+EMOTION_PROMPT_TEXT = "😊 **איך אתה מרגיש היום?**\n\nבחר את הרגש שלך:"
+PROJECTS_PROMPT_TEXT = "🔬 **בחר פרויקט:**"
+BACK_MAIN_TEXT = "🏠 תפריט ראשי\n\nבחר פעולה מהכפתורים למטה."
+
+MOOD_EMOJIS = {
+    'joyful': '😄',
+    'positive': '😊',
+    'neutral': '😐',
+    'melancholic': '😔',
+    'troubled': '😞'
+}
+
+# Emotion callbacks: mood -> (emoji, mood name, emotion delta, reply text)
+EMOTION_RESPONSES = {
+    data: (emoji, mood_name, delta,
+           f"{emoji} **תודה ששיתפת!**\n\n"
+           f"רשמתי שאתה מרגיש {mood_name} היום.\n"
+           f"המערכת עדכנה את מצב הרוח שלך.\n\n"
+           f"+10 נקודות קוונטיות! 💫")
+    for data, (emoji, mood_name, delta) in {
+        'happy': ('😊', 'שמח', 20),
+        'sad': ('😢', 'עצוב', -20),
+        'angry': ('😠', 'כועס', -15),
+        'calm': ('😌', 'רגוע', 10),
+        'thoughtful': ('🤔', 'מחשבתי', 5),
+        'tired': ('😴', 'עייף', -10)
+    }.items()
+}
+
+# Project callbacks: project -> info text
+PROJECT_INFO = {
+    'het': """
 💎 **HET Token Project**
 ━━━━━━━━━━━━━━━━━━━━━━━━━
 טוקן קריפטו על Polygon
@@ -706,7 +964,7 @@ Liquidity Pool פעיל
 
 שלח /het למידע מלא
 """,
-        'project_chip': """
+    'chip': """
 ⚡ **Infinite Speed Chip**
 ━━━━━━━━━━━━━━━━━━━━━━━━━
 גרסאות: V1-V5
@@ -716,7 +974,7 @@ Liquidity Pool פעיל
 עלות: ~$550/שבב
 סטטוס: פרוטוטיפ מתקדם
 """,
-        'project_teleport': """
+    'teleport': """
 🌀 **מערכות טלפורטציה**
 ━━━━━━━━━━━━━━━━━━━━━━━━━
 פרוטוקול d5
@@ -724,7 +982,7 @@ Liquidity Pool פעיל
 חיבור ממד חמישי
 סטטוס: בפיתוח מתקדם
 """,
-        'project_voice': """
+    'voice': """
 🎤 **Hai-Emet VOICE PRO**
 ━━━━━━━━━━━━━━━━━━━━━━━━━
 תמלול קולי עברית
@@ -733,22 +991,600 @@ Liquidity Pool פעיל
 יצוא: SRT, TXT, DOCX
 סטטוס: פעיל
 """
-    }
+}
+
+HELP_TEXT = HELP_TEMPLATE.render()
+
+SPARK_BARS = '▁▂▃▄▅▆▇█'
+
+def render_trend(user_id: int) -> str:
+    """שורת מגמה - ממוצעים נעים ואירועים אחרונים"""
+    trend = hai_emet.history.trend(user_id)
+    if trend is None:
+        return "📉 מגמה: עדיין אין נתונים - שתף מצב רוח עם /emotion"
+    
+    def mean(value: Optional[float]) -> str:
+        return '-' if value is None else f"{value:+.1f}"
+    
+    mean_7d, mean_30d = trend['mean_7d'], trend['mean_30d']
+    if mean_7d is None or mean_30d is None or abs(mean_7d - mean_30d) < 1:
+        arrow = '➡️'
+    else:
+        arrow = '↗️' if mean_7d > mean_30d else '↘️'
+    # Deltas run from -20 to +20; map them onto the bar heights
+    spark = ''.join(SPARK_BARS[min(7, max(0, (delta + 20) * 8 // 41))] for delta in trend['recent'])
+    return f"📉 מגמה: 7 ימים {mean(mean_7d)} | 30 ימים {mean(mean_30d)} {arrow}\n〰️ {spark}"
+
+def render_stats(user_id: int, stats: Dict) -> str:
+    """כרטיס סטטיסטיקות משתמש"""
+    mood = stats.get('mood', 'neutral')
+    quantum_points = stats.get('quantum_points', 0)
+    return STATS_TEMPLATE.render(
+        first_name=stats.get('first_name', 'Unknown'),
+        username=stats.get('username', 'Unknown'),
+        cosmic_level=stats.get('cosmic_level', 1),
+        quantum_points=quantum_points,
+        rank=hai_emet.get_user_rank(user_id),
+        total_users=hai_emet.cluster_users,
+        total_interactions=stats.get('total_interactions', 0),
+        joined=stats.get('joined', 'Unknown')[:10],
+        mood_emoji=MOOD_EMOJIS.get(mood, '😐'),
+        mood=mood,
+        emotion_score=stats.get('emotion_score', 0),
+        trend=render_trend(user_id),
+        next_level=100 - (quantum_points % 100)
+    )
+
+def render_mood_distribution(counts: Dict[str, int], total: int) -> str:
+    """התפלגות מצבי הרוח - שורה לכל דלי"""
+    return '\n'.join(
+        f"{MOOD_EMOJIS[mood]} {mood}: {counts[mood]} ({counts[mood] / total if total else 0:.0%})"
+        for mood in MOOD_ORDER
+    )
+
+# Placeholders for the live counters in a cached status card
+STATUS_SLOTS = {'core_beats': '\x00', 'total_messages': '\x01'}
+
+def render_status(beats: int, status: Dict) -> str:
+    """כרטיס סטטוס מערכת"""
+    return STATUS_TEMPLATE.render(
+        auth_status="✅ מאומת" if status['authenticated'] else "❌ לא מאומת",
+        beats=beats,
+        light_power=status['light_power'],
+        dark_power=status['dark_power'],
+        quantum_sync=status['quantum_sync'],
+        truth_level=status['truth_level'],
+        mood=status['mood'],
+        total_users=status['total_users'],
+        total_messages=status['total_messages'],
+        mood_distribution=render_mood_distribution(status['mood_distribution'], status['total_users']),
+        average_emotion=status['average_emotion']
+    )
+
+def render_metrics() -> str:
+    """סיכום מדדים למנהל"""
+    hour = usage.change(3600)
+    lines = [
+        "📈 **מדדי מערכת**",
+        "━━━━━━━━━━━━━━━━━━━━━━━━━━━",
+        f"👥 משתמשים: {hai_emet.total_users} (+{hour.get('users', 0)} בשעה האחרונה)",
+        f"💬 הודעות: {hai_emet.total_messages} (+{hour.get('messages', 0)} בשעה האחרונה)",
+        "",
+        "**Handlers** (קריאות / שגיאות / p50 / p99):"
+    ]
+    for (handler,), calls in sorted(HANDLER_CALLS.values.items(), key=lambda item: -item[1]):
+        p50 = HANDLER_LATENCY.quantile(0.50, handler=handler) * 1000
+        p99 = HANDLER_LATENCY.quantile(0.99, handler=handler) * 1000
+        errors = HANDLER_ERRORS.get(handler=handler)
+        lines.append(f"• {handler}: {calls:.0f} / {errors:.0f} / {p50:.1f}ms / {p99:.1f}ms")
+
+    writes = PERSIST_LATENCY.count(operation='write')
+    send_stats = outbox.get_stats()
+    card_stats = card_cache.get_stats()
+    pool_lines = [
+        f"🔌 {stats['pool']}: {stats['requests']} בקשות, שימוש חוזר {stats['reuse_ratio']:.0%}, "
+        f"המתנה למאגר p99 {stats['wait_p99_ms']}ms, {stats['retries']} ניסיונות חוזרים"
+        for stats in (pool.get_stats() for pool in http_pools.values())
+    ]
+    lines += [
+        "",
+        f"💾 כתיבות לדיסק: {writes}, {PERSIST_BYTES.get() / 1024:.0f} KB, "
+        f"p99 {PERSIST_LATENCY.quantile(0.99, operation='write') * 1000:.1f}ms",
+        f"📤 נשלחו: {send_stats['sent']}, בתור: {send_stats['queue_interactive'] + send_stats['queue_bulk']}, "
+        f"המתנה p99: {send_stats['wait_p99_ms']}ms",
+        f"🗂️ מטמון כרטיסים: {card_stats['hit_ratio']:.0%} פגיעות, {card_stats['entries']} כרטיסים, "
+        f"{card_stats['bytes'] / 1024:.0f} KB",
+        *pool_lines
+    ]
+    return "\n".join(lines)
+
+def render_broadcast(stats: Dict) -> str:
+    """כרטיס מצב שידור"""
+    if stats['active']:
+        status = 'פעיל'
+    elif not stats['started']:
+        status = 'לא הופעל'
+    elif stats['cancelled']:
+        status = 'בוטל'
+    elif stats['done']:
+        status = 'הסתיים'
+    else:
+        status = 'מושהה'
+    return BROADCAST_TEMPLATE.render(
+        status=status,
+        position=stats['position'],
+        recipients=stats['recipients'],
+        sent=stats['sent'],
+        failed=stats['failed'],
+        blocked=stats['blocked'],
+        skipped=stats['skipped']
+    )
+
+# ═══════════════════════════════════════════════════════════════════
+#                       OUTBOUND MESSAGES
+# ═══════════════════════════════════════════════════════════════════
+
+outbox = SendScheduler(rate=SEND_RATE, per_chat_rate=CHAT_SEND_RATE)
+broadcaster = Broadcaster(hai_emet.store, outbox, BROADCAST_FILE, rate=BROADCAST_RATE)
+
+async def send_reply(update: Update, text: str, priority: Priority = Priority.INTERACTIVE, **kwargs):
+    """שליחת תשובה דרך מתזמן השליחה"""
+    message = update.effective_message
+    return await outbox.submit(message.chat_id, lambda: message.reply_text(text, **kwargs), priority)
+
+async def edit_reply(query, text: str, **kwargs):
+    """עריכת הודעה דרך מתזמן השליחה"""
+    return await outbox.submit(query.message.chat_id, lambda: query.edit_message_text(text, **kwargs))
+
+def make_broadcast_report(bot):
+    """דיווח למנהל בסיום שידור"""
+    async def report(state: Dict):
+        text = render_broadcast(broadcaster.get_stats())
+        cluster = hai_emet.cluster
+        if cluster is not None:
+            # Every shard reports on its own users
+            text = f"🧩 רסיס {cluster.shard + 1}/{cluster.shards}\n{text}"
+        await outbox.submit(state['admin_chat_id'], lambda: bot.send_message(chat_id=state['admin_chat_id'], text=text))
+    return report
+
+def start_broadcast(bot, text: str, admin_chat_id: int):
+    """התחלת שידור למשתמשי המופע הזה"""
+    broadcaster.start(bot, text, admin_chat_id, on_finish=make_broadcast_report(bot))
+
+def broadcast_stats() -> Dict:
+    """מצב השידור - מצטבר מכל הרסיסים במצב מרובה תהליכים"""
+    stats = broadcaster.get_stats()
+    if hai_emet.cluster is not None:
+        totals = hai_emet.cluster.totals()
+        for field in ('position', 'sent', 'failed', 'blocked', 'skipped'):
+            stats[field] = totals[f'broadcast_{field}']
+        stats['active'] = stats['active'] or totals['broadcast_active'] > 0
+        stats['recipients'] = hai_emet.cluster_users
+    return stats
+
+# ═══════════════════════════════════════════════════════════════════
+#                            ROUTING
+# ═══════════════════════════════════════════════════════════════════
+
+# Handlers register their commands, button labels and callback prefixes below;
+# the dispatch tables are frozen once, before the first update
+router = Router()
+
+# ═══════════════════════════════════════════════════════════════════
+#                        COMMAND HANDLERS
+# ═══════════════════════════════════════════════════════════════════
+
+@router.command('start')
+@instrumented
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פקודת /start"""
+    user = update.effective_user
+    user_id = user.id
+    username = user.username or user.first_name or "Unknown"
+    first_name = user.first_name or ""
+    
+    # Register user
+    is_new = hai_emet.register_user(user_id, username, first_name)
+    
+    welcome_message = START_TEMPLATE.render(
+        first_name=first_name,
+        greeting='🎉 נרשמת בהצלחה למערכת!' if is_new else '💫 ברוך שובך!',
+        light_power=hai_emet.light_power,
+        dark_power=hai_emet.dark_power
+    )
+    
+    await send_reply(
+        update,
+        welcome_message,
+        reply_markup=get_main_keyboard()
+    )
+
+@router.command('help')
+@router.button("ℹ️ עזרה")
+@instrumented
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פקודת /help"""
+    await send_reply(update, HELP_TEXT)
+
+@router.command('stats')
+@router.button("📊 הסטטיסטיקות שלי")
+@instrumented
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פקודת /stats"""
+    user_id = update.effective_user.id
+    stats = hai_emet.get_user_stats(user_id)
+    
+    if not stats:
+        await send_reply(update, "❌ לא נמצאו נתונים. שלח /start להרשמה.")
+        return
+    
+    # The card shows the record, its rank and the user count; the trend
+    # line ages with time, so it may lag by up to CARD_TREND_SECONDS
+    stamp = (
+        hai_emet.store.version(user_id),
+        hai_emet.get_user_rank(user_id),
+        hai_emet.cluster_users,
+        int(time.time()) // CARD_TREND_SECONDS
+    )
+    card = card_cache.render('stats', user_id, stamp, lambda: render_stats(user_id, stats))
+    await send_reply(update, card)
+
+@router.command('top')
+@instrumented
+async def top_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פקודת /top - טבלת המובילים"""
+    user_id = update.effective_user.id
+    top_users = hai_emet.get_top_users(10)
+    
+    if not top_users:
+        await send_reply(update, "🏆 עדיין אין משתמשים בטבלה. שלח /start להרשמה.")
+        return
+    
+    medals = {1: '🥇', 2: '🥈', 3: '🥉'}
+    lines = [
+        f"{medals.get(position, f'{position}.')} {entry['name']} - "
+        f"⚡ {entry['quantum_points']} (רמה {entry['cosmic_level']})"
+        for position, entry in enumerate(top_users, 1)
+    ]
     
-    if data in project_info:
-        await query.edit_message_text(
-            project_info[data],
-            reply_markup=get_projects_keyboard()
+    rank = hai_emet.get_user_rank(user_id)
+    rank_line = f"📍 הדירוג שלך: #{rank} מתוך {hai_emet.cluster_users}" if rank else "📍 שלח /start כדי להצטרף לטבלה"
+    
+    top_text = "🏆 **טבלת המובילים**\n━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n" + "\n".join(lines) + f"\n\n{rank_line}"
+    
+    await send_reply(update, top_text)
+
+@router.command('status')
+@router.button("🌌 סטטוס מערכת")
+@instrumented
+async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פקודת /status"""
+    beats = hai_emet.increment_core_beat()
+    status = hai_emet.get_system_status()
+    # Beats and messages change on every call, so the cached card keeps
+    # slots for them; everything else it shows is the stamp
+    stamp = tuple(
+        tuple(value.values()) if isinstance(value, dict) else value
+        for field, value in status.items() if field not in STATUS_SLOTS
+    )
+    card = card_cache.render(
+        'status', None, stamp,
+        lambda: render_status(STATUS_SLOTS['core_beats'], dict(status, **STATUS_SLOTS))
+    )
+    status_text = card.replace(STATUS_SLOTS['core_beats'], str(beats)).replace(
+        STATUS_SLOTS['total_messages'], str(status['total_messages'])
+    )
+    
+    hai_emet.record_interaction(update.effective_user.id, points=10)
+    
+    await send_reply(update, status_text)
+
+@router.command('verify')
+@instrumented
+async def verify_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פקודת /verify - אימות מערכת"""
+    if hai_emet.verify_authentication():
+        verify_text = VERIFY_TEMPLATE.render(date=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    else:
+        verify_text = VERIFY_FAILED_TEXT
+    
+    await send_reply(update, verify_text, parse_mode='Markdown')
+
+@router.command('emotion')
+@router.button("😊 מצב רוח")
+@instrumented
+async def emotion_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פקודת /emotion"""
+    await send_reply(
+        update,
+        EMOTION_PROMPT_TEXT,
+        reply_markup=get_emotion_keyboard()
+    )
+
+@router.command('power')
+@router.button("⚡ כוח קוסמי")
+@instrumented
+async def power_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פקודת /power"""
+    result = hai_emet.activate_cosmic_power()
+    power_text = POWER_TEMPLATE.render(result=result)
+    
+    hai_emet.record_interaction(update.effective_user.id, points=50)
+    
+    await send_reply(update, power_text)
+
+@router.command('sync')
+@router.button("🔮 סנכרון קוונטי")
+@instrumented
+async def sync_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פקודת /sync"""
+    sync_value = hai_emet.sync_quantum()
+    sync_text = SYNC_TEMPLATE.render(sync_value=sync_value, sync_binary=bin(sync_value))
+    
+    hai_emet.record_interaction(update.effective_user.id, points=100)
+    
+    await send_reply(update, sync_text)
+
+@router.command('het')
+@router.button("💎 HET Token")
+@instrumented
+async def het_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פקודת /het"""
+    hai_emet.record_interaction(update.effective_user.id, points=10)
+    
+    await send_reply(update, HET_TEXT, parse_mode='Markdown')
+
+@router.command('projects')
+@router.button("🔬 פרויקטים")
+@instrumented
+async def projects_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פקודת /projects"""
+    await send_reply(
+        update,
+        PROJECTS_PROMPT_TEXT,
+        reply_markup=get_projects_keyboard()
+    )
+
+@router.command('broadcast')
+@instrumented
+async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פקודת /broadcast - שידור לכל המשתמשים (מנהלים בלבד)"""
+    if update.effective_user.id not in ADMIN_IDS:
+        await send_reply(update, ADMIN_ONLY_TEXT)
+        return
+    
+    # Everything after the command, line breaks included
+    parts = update.message.text.split(None, 1)
+    text = parts[1].strip() if len(parts) > 1 else ''
+    
+    if not text:
+        await send_reply(update, BROADCAST_USAGE_TEXT)
+    elif text == 'status':
+        await send_reply(update, render_broadcast(broadcast_stats()))
+    elif text == 'cancel':
+        if hai_emet.cluster is not None:
+            hai_emet.cluster.send_all({'control': 'broadcast_cancel'})
+            await send_reply(update, "🛑 הביטול נשלח לכל הרסיסים.")
+        elif broadcaster.cancel():
+            await send_reply(update, "🛑 השידור בוטל.")
+        else:
+            await send_reply(update, "ℹ️ אין שידור פעיל.")
+    elif broadcast_stats()['active']:
+        await send_reply(update, "⏳ שידור אחר עדיין פעיל. שלח /broadcast status למצב.")
+    elif hai_emet.cluster is not None:
+        # Each shard broadcasts to its own users
+        hai_emet.cluster.send_all({'control': 'broadcast', 'text': text, 'admin_chat_id': update.effective_chat.id})
+        await send_reply(update, f"📢 השידור התחיל ל-{hai_emet.cluster_users} משתמשים ב-{hai_emet.cluster.shards} רסיסים.")
+    else:
+        start_broadcast(context.bot, text, update.effective_chat.id)
+        await send_reply(update, f"📢 השידור התחיל ל-{hai_emet.store.count()} משתמשים.")
+
+async def run_profile(bot, chat_id: int, seconds: Optional[float], updates: Optional[int]):
+    """הרצת פרופיל ברקע ושליחת התוצאה למנהל"""
+    global profile_busy
+    try:
+        result = await profiler.run(
+            seconds=seconds,
+            updates=updates,
+            update_count=lambda: update_processor.processed
         )
-    elif data == 'back_main':
-        await query.edit_message_text(
-            "🏠 תפריט ראשי\n\nבחר פעולה מהכפתורים למטה."
+        path = await asyncio.to_thread(result.write_folded, PROFILE_DIR)
+        summary = f"🔬 **תוצאות פרופיל**\n\n{result.summary()}"
+        await outbox.submit(chat_id, lambda: bot.send_message(chat_id=chat_id, text=summary[:4000]))
+        await outbox.submit(chat_id, lambda: bot.send_document(chat_id=chat_id, document=Path(path)))
+        logger.info(f"🔬 Profile written to {path}")
+    except Exception as e:
+        logger.error(f"Profile failed: {e}")
+    finally:
+        profile_busy = False
+
+@router.command('profile')
+@instrumented
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פקודת /profile - פרופיל דגימה לפי דרישה (מנהלים בלבד)"""
+    if update.effective_user.id not in ADMIN_IDS:
+        await send_reply(update, ADMIN_ONLY_TEXT)
+        return
+    
+    args = context.args or []
+    seconds, updates = None, None
+    try:
+        if args and args[0] == 'updates':
+            updates = int(args[1])
+            # Do not wait forever on a quiet bot
+            seconds = PROFILE_MAX_SECONDS
+        else:
+            seconds = min(float(args[0]) if args else 30.0, PROFILE_MAX_SECONDS)
+    except (IndexError, ValueError):
+        await send_reply(update, PROFILE_USAGE_TEXT)
+        return
+    # nan would never reach the deadline and keep the sampler alive forever
+    if not (math.isfinite(seconds) and seconds > 0) or (updates is not None and updates < 1):
+        await send_reply(update, PROFILE_USAGE_TEXT)
+        return
+    
+    global profile_busy
+    if profile_busy or profiler.running:
+        await send_reply(update, "⏳ פרופיל אחר כבר רץ.")
+        return
+    
+    # Claimed before the task starts, so a second /profile cannot slip in
+    profile_busy = True
+    context.application.create_task(run_profile(context.bot, update.effective_chat.id, seconds, updates))
+    limit = f"{updates} עדכונים" if updates else f"{seconds:.0f} שניות"
+    await send_reply(update, f"🔬 הפרופיל התחיל ({limit}). התוצאות יישלחו בסיום.")
+
+@router.command('metrics')
+@instrumented
+async def metrics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פקודת /metrics - מדדי מערכת (מנהלים בלבד)"""
+    if update.effective_user.id not in ADMIN_IDS:
+        await send_reply(update, ADMIN_ONLY_TEXT)
+        return
+    await send_reply(update, render_metrics())
+
+# ═══════════════════════════════════════════════════════════════════
+#                      MESSAGE HANDLERS
+# ═══════════════════════════════════════════════════════════════════
+
+@instrumented
+async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """טיפול בהודעות טקסט"""
+    await router.dispatch_text(update, context)
+
+@router.text
+async def echo_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """טקסט חופשי - זיהוי רגש ותשובה"""
+    text = update.message.text
+    
+    # Track message, with any emotion the text expresses, in one update
+    emotion = emotion_lexicon.score(text)
+    hai_emet.record_interaction(update.effective_user.id, emotion_delta=emotion.delta)
+    
+    # Default response
+    reply = ECHO_TEMPLATE.render(text=text)
+    if emotion.delta:
+        reply += TEXT_EMOTION_TEMPLATE.render(
+            tone='חיובי' if emotion.delta > 0 else 'שלילי',
+            delta=emotion.delta
         )
+    await send_reply(update, reply)
+
+@instrumented
+async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """טיפול ב-callback queries"""
+    await update.callback_query.answer()
+    await router.dispatch_callback(update, context)
+
+@router.callback('emotion')
+async def emotion_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, mood: str):
+    """בחירת רגש מהמקלדת"""
+    response = EMOTION_RESPONSES.get(mood)
+    if response is None:
+        return
+    query = update.callback_query
+    emoji, mood_name, delta, reply_text = response
+    hai_emet.record_interaction(query.from_user.id, points=10, emotion_delta=delta, activity=False)
+    
+    await edit_reply(
+        query,
+        reply_text,
+        reply_markup=get_emotion_keyboard()
+    )
+
+@router.callback('project')
+async def project_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, project: str):
+    """מידע על פרויקט"""
+    info = PROJECT_INFO.get(project)
+    if info is None:
+        return
+    await edit_reply(
+        update.callback_query,
+        info,
+        reply_markup=get_projects_keyboard()
+    )
+
+# "back_main" is the pre-router form of "nav:main"
+@router.callback('nav', 'back')
+async def nav_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, target: str):
+    """ניווט - חזרה לתפריט הראשי"""
+    if target == 'main':
+        await edit_reply(update.callback_query, BACK_MAIN_TEXT)
+
+router.compile()
+
+# ═══════════════════════════════════════════════════════════════════
+#                        LIFECYCLE HOOKS
+# ═══════════════════════════════════════════════════════════════════
+
+async def post_init(application: Application):
+    """הפעלה לאחר אתחול - שמירה, שליחה ומדדים ברקע"""
+    global metrics_server
+    await hai_emet.start_persistence()
+    outbox.start()
+    usage.start()
+    
+    if METRICS_PORT:
+        metrics_server = MetricsServer(metrics, METRICS_HOST, METRICS_PORT)
+        try:
+            await metrics_server.start()
+        except OSError as e:
+            logger.warning(f"Metrics endpoint not started: {e}")
+            metrics_server = None
+    
+    # Pick up a broadcast interrupted by a restart
+    broadcaster.resume(application.bot, on_finish=make_broadcast_report(application.bot))
+
+async def post_stop(application: Application):
+    """עצירה - שידור פעיל נשמר להמשך כל עוד הבוט זמין"""
+    await broadcaster.stop()
+
+async def post_shutdown(application: Application):
+    """כיבוי - ריקון תור השליחה ושמירה אחרונה לדיסק"""
+    await outbox.stop()
+    await usage.stop()
+    if metrics_server is not None:
+        await metrics_server.stop()
+    send_stats = outbox.get_stats()
+    logger.info(
+        f"📤 Outbound: {send_stats['sent']} sent, {send_stats['failed']} failed, "
+        f"{send_stats['flood_waits']} flood waits, p99 wait {send_stats['wait_p99_ms']}ms"
+    )
+    await hai_emet.stop_persistence()
+    stats = hai_emet.store.get_stats()
+    logger.info(f"💾 Persistence: {stats['flushes']} writes, {stats['coalesced_writes']} coalesced")
 
 # ═══════════════════════════════════════════════════════════════════
 #                          MAIN FUNCTION
 # ═══════════════════════════════════════════════════════════════════
 
+def build_application(bot=None) -> Application:
+    """בניית האפליקציה עם כל ה-handlers"""
+    builder = Application.builder()
+    if bot is not None:
+        builder = builder.bot(bot)
+    else:
+        # Separate pools, so the long poll never holds a connection a reply needs
+        http_pools['send'] = PooledRequest.from_env('send', pool_size=SEND_POOL_SIZE)
+        http_pools['poll'] = PooledRequest.from_env('poll', pool_size=POLL_POOL_SIZE)
+        for name, pool in http_pools.items():
+            pool.on_request = lambda waited, reused, name=name: HTTP_POOL_WAIT.observe(waited, pool=name)
+        builder = builder.token(TELEGRAM_TOKEN).request(http_pools['send']).get_updates_request(http_pools['poll'])
+        if BOT_API_URL:
+            builder = builder.base_url(f"{BOT_API_URL}/bot").base_file_url(f"{BOT_API_URL}/file/bot")
+    application = (
+        builder
+        .concurrent_updates(update_processor)
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    
+    # Commands, keyboard buttons and callbacks, from the router tables
+    router.install(application, on_text=handle_text, on_callback=handle_callback)
+    return application
+
 def main():
     """הפעלת הבוט"""
     
@@ -769,31 +1605,24 @@ def main():
 Starting bot...
     """)
     
-    # Create application
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
-    
-    # Command handlers
-    application.add_handler(CommandHandler("start", start_command))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("stats", stats_command))
-    application.add_handler(CommandHandler("status", status_command))
-    application.add_handler(CommandHandler("verify", verify_command))
-    application.add_handler(CommandHandler("power", power_command))
-    application.add_handler(CommandHandler("sync", sync_command))
-    application.add_handler(CommandHandler("emotion", emotion_command))
-    application.add_handler(CommandHandler("het", het_command))
-    application.add_handler(CommandHandler("projects", projects_command))
-    
-    # Message handlers
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
-    
-    # Callback handler
-    application.add_handler(CallbackQueryHandler(handle_callback))
+    application = build_application()
     
     # Start bot
     logger.info(f"🚀 {hai_emet.bot_username} is now running!")
     logger.info(f"✅ Authentication: {'VERIFIED' if hai_emet.verify_authentication() else 'FAILED'}")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if BOT_MODE == 'webhook':
+        if not WEBHOOK_URL:
+            raise RuntimeError("HAI_EMET_MODE=webhook requires WEBHOOK_URL")
+        server = WebhookServer(
+            application,
+            path=WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET or None,
+            host=WEBHOOK_HOST,
+            port=WEBHOOK_PORT
+        )
+        asyncio.run(run_webhook(application, WEBHOOK_URL, server))
+    else:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 if __name__ == '__main__':
     main()
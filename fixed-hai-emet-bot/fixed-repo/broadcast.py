@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Broadcast
+שידור הודעה לכל המשתמשים - קצב קבוע והמשך אחרי הפעלה מחדש
+
+Recipients are streamed from the user store in user_id order and sent on
+the bulk lane of the send scheduler at a steady rate, so interactive
+replies keep priority. Progress (the last handled user_id and counters) is
+written to a small JSON file every few seconds; after a restart the
+broadcast carries on after that user, so users added in between never
+shift who is skipped. Users who blocked the bot are flagged
+in the store and skipped by later broadcasts.
+"""
+
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from telegram.error import Forbidden
+
+from outbound import Priority, SendScheduler, TokenBucket
+from persistence import atomic_write_json
+from storage import UserStore
+
+logger = logging.getLogger(__name__)
+
+# Seconds between progress file writes
+PROGRESS_INTERVAL = 5.0
+
+FinishCallback = Callable[[Dict], Awaitable[Any]]
+
+
+class Broadcaster:
+    """שידור לכל המשתמשים עם שמירת התקדמות"""
+
+    def __init__(
+        self,
+        store: UserStore,
+        outbox: SendScheduler,
+        progress_path: str,
+        rate: float = 20.0,
+        window: int = 50
+    ):
+        self.store = store
+        self.outbox = outbox
+        self.progress_path = progress_path
+        self.rate = rate
+        self.window = window
+
+        self.state: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._saved_at = 0.0
+        self._stopping = False
+
+    @property
+    def active(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # --- Control ---
+
+    def start(self, bot, text: str, admin_chat_id: int, on_finish: Optional[FinishCallback] = None) -> Dict:
+        """התחלת שידור חדש"""
+        if self.active:
+            raise RuntimeError("A broadcast is already running")
+        self.state = {
+            'text': text,
+            'admin_chat_id': admin_chat_id,
+            'started': datetime.now().isoformat(),
+            'position': 0,
+            'last_user_id': None,
+            'sent': 0,
+            'failed': 0,
+            'blocked': 0,
+            'skipped': 0,
+            'done': False,
+            'cancelled': False
+        }
+        self._save_progress()
+        self._launch(bot, on_finish)
+        return self.state
+
+    def resume(self, bot, on_finish: Optional[FinishCallback] = None) -> Optional[Dict]:
+        """המשך שידור שלא הסתיים"""
+        if self.active:
+            return self.state
+        state = self.load_progress()
+        if not state or state.get('done'):
+            return None
+        self.state = state
+        self._launch(bot, on_finish)
+        logger.info(f"📢 Resuming broadcast after user {state.get('last_user_id')} ({state['position']} handled)")
+        return state
+
+    def cancel(self) -> bool:
+        """ביטול השידור הפעיל"""
+        if not self.active:
+            return False
+        self.state['cancelled'] = True
+        self._task.cancel()
+        return True
+
+    async def stop(self, timeout: float = 10.0):
+        """עצירה בכיבוי - משלוחים שיצאו מסתיימים וההתקדמות נשמרת להמשך"""
+        if not self.active:
+            return
+        self._stopping = True
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        finally:
+            self._stopping = False
+
+    def load_progress(self) -> Optional[Dict]:
+        """קריאת קובץ ההתקדמות"""
+        try:
+            with open(self.progress_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error loading broadcast progress: {e}")
+            return None
+
+    def get_stats(self) -> Dict:
+        """מצב השידור האחרון"""
+        state = self.state or self.load_progress() or {}
+        stats = {key: state.get(key, 0) for key in ('position', 'sent', 'failed', 'blocked', 'skipped')}
+        stats['started'] = state.get('started')
+        stats['active'] = self.active
+        stats['done'] = bool(state.get('done'))
+        stats['cancelled'] = bool(state.get('cancelled'))
+        stats['recipients'] = self.store.count()
+        return stats
+
+    # --- Sending ---
+
+    def _launch(self, bot, on_finish: Optional[FinishCallback]):
+        self._task = asyncio.get_running_loop().create_task(self._run(bot, on_finish))
+
+    def _save_progress(self):
+        self._saved_at = time.monotonic()
+        try:
+            atomic_write_json(self.progress_path, self.state)
+        except Exception as e:
+            logger.error(f"Error saving broadcast progress: {e}")
+
+    async def _deliver(self, bot, user_id: int, text: str) -> str:
+        try:
+            await self.outbox.submit(
+                user_id,
+                lambda: bot.send_message(chat_id=user_id, text=text),
+                Priority.BULK
+            )
+        except Forbidden:
+            # Blocked the bot or deleted the account
+            self.store.update(user_id, {'blocked': True})
+            return 'blocked'
+        except Exception as e:
+            logger.warning(f"Broadcast to {user_id} failed: {e}")
+            return 'failed'
+        return 'sent'
+
+    def _settle(self, in_flight: Deque):
+        """ספירת משלוחים שהסתיימו - ההתקדמות זזה רק על רצף שהושלם"""
+        while in_flight and in_flight[0][1].done():
+            user_id, task = in_flight.popleft()
+            self.state[task.result()] += 1
+            self.state['position'] += 1
+            self.state['last_user_id'] = user_id
+        if time.monotonic() - self._saved_at >= PROGRESS_INTERVAL:
+            self._save_progress()
+
+    async def _run(self, bot, on_finish: Optional[FinishCallback]):
+        state = self.state
+        text = state['text']
+        bucket = TokenBucket(self.rate, 1)
+        in_flight: Deque = deque()
+        loop = asyncio.get_running_loop()
+        try:
+            for user_id, user in self.store.iter_ordered(state.get('last_user_id')):
+                if self._stopping:
+                    break
+                if user.get('blocked'):
+                    # Counted in order behind the sends still in flight
+                    skipped = loop.create_future()
+                    skipped.set_result('skipped')
+                    in_flight.append((user_id, skipped))
+                    self._settle(in_flight)
+                    continue
+
+                wait = bucket.wait_time(time.monotonic())
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                bucket.take()
+                task = loop.create_task(self._deliver(bot, user_id, text))
+                in_flight.append((user_id, task))
+                if len(in_flight) >= self.window:
+                    await asyncio.wait([in_flight[0][1]])
+                self._settle(in_flight)
+
+            if in_flight:
+                await asyncio.wait([task for _, task in in_flight])
+                self._settle(in_flight)
+            state['done'] = not self._stopping
+        except asyncio.CancelledError:
+            # Cancelled by an admin ends the broadcast, a shutdown keeps it resumable
+            for _, task in in_flight:
+                task.cancel()
+            state['done'] = state['cancelled']
+            raise
+        finally:
+            self._save_progress()
+            if state['done']:
+                logger.info(
+                    f"📢 Broadcast finished: {state['sent']} sent, {state['failed']} failed, "
+                    f"{state['blocked']} blocked, {state['skipped']} skipped"
+                )
+                if on_finish is not None:
+                    try:
+                        await on_finish(state)
+                    except Exception as e:
+                        logger.warning(f"Broadcast report failed: {e}")
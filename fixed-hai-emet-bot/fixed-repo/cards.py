@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Rendered Card Cache
+מטמון כרטיסים מעוצבים - /stats ו-/status בלי לעצב מחדש כשדבר לא השתנה
+
+Each cached card is stored with the stamp it was rendered for: a tuple of
+whatever the card depends on, starting with the record version the store
+bumps on every mutation. A lookup with an equal stamp returns the stored
+text; any other stamp re-renders and replaces it. Entries are evicted in
+LRU order once their total size passes the memory cap.
+"""
+
+import sys
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class CardCache:
+    """מטמון LRU של כרטיסים מעוצבים עם תקרת זיכרון"""
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        # (kind, key) -> (stamp, card, size)
+        self._entries: 'OrderedDict[Tuple[str, Hashable], Tuple[Any, str, int]]' = OrderedDict()
+        self.bytes = 0
+
+        # Counters per card kind
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def render(self, kind: str, key: Hashable, stamp: Any, render: Callable[[], str]) -> str:
+        """הכרטיס השמור אם ה-stamp זהה, אחרת עיצוב ושמירה"""
+        entry_key = (kind, key)
+        entry = self._entries.get(entry_key)
+        if entry is not None and entry[0] == stamp:
+            self._entries.move_to_end(entry_key)
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+            return entry[1]
+
+        self.misses[kind] = self.misses.get(kind, 0) + 1
+        card = render()
+        size = sys.getsizeof(card)
+        if entry is not None:
+            self.bytes -= entry[2]
+        if size > self.max_bytes:
+            self._entries.pop(entry_key, None)
+            return card
+        self._entries[entry_key] = (stamp, card, size)
+        self._entries.move_to_end(entry_key)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+        return card
+
+    def discard(self, kind: str, key: Hashable):
+        """הסרת כרטיס"""
+        entry = self._entries.pop((kind, key), None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def clear(self):
+        """ריקון המטמון"""
+        self._entries.clear()
+        self.bytes = 0
+
+    def hit_ratio(self) -> Dict[str, float]:
+        """יחס פגיעות לכל סוג כרטיס"""
+        return {
+            kind: self.hits.get(kind, 0) / (self.hits.get(kind, 0) + self.misses.get(kind, 0))
+            for kind in self.hits.keys() | self.misses.keys()
+        }
+
+    def get_stats(self) -> Dict:
+        """סטטיסטיקות המטמון"""
+        hits = sum(self.hits.values())
+        misses = sum(self.misses.values())
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            'evictions': self.evictions
+        }
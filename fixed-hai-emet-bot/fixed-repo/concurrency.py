@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Concurrent Update Processing
+עיבוד עדכונים במקביל - סדר מובטח לכל משתמש
+
+Updates from different users run in parallel up to a worker limit, while
+updates from the same user wait on that user's lock and run one at a time
+in arrival order. The user lock is taken before a worker slot, so one user
+flooding the bot queues behind themselves instead of filling every slot.
+
+All shared state in HaiEmetEmotionSystem is mutated from synchronous code
+on the event loop thread (no await between read and write), so global
+counters such as core_beats and total_messages stay exact without locks.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# The base class semaphore is opened wide - slots are handed out per user below
+UNBOUNDED = 2 ** 30
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """מעבד עדכונים - מקבילי בין משתמשים, סדרתי לכל משתמש"""
+
+    __slots__ = ('_workers', '_worker_limit', '_user_locks', 'active', 'waiting', 'processed', 'max_waiting')
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._semaphore = asyncio.BoundedSemaphore(UNBOUNDED)
+        self._worker_limit = max_concurrent_updates
+        self._workers: Optional[asyncio.BoundedSemaphore] = None
+        # user id -> [lock, number of updates holding or waiting for it]
+        self._user_locks: Dict[int, List[Any]] = {}
+
+        # Counters
+        self.active = 0
+        self.waiting = 0
+        self.processed = 0
+        self.max_waiting = 0
+
+    @staticmethod
+    def _user_key(update: object) -> Optional[int]:
+        if isinstance(update, Update):
+            if update.effective_user is not None:
+                return update.effective_user.id
+            if update.effective_chat is not None:
+                return update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """עיבוד עדכון - נעילת משתמש ואז מקום פנוי"""
+        key = self._user_key(update)
+        if key is None:
+            await self._run(coroutine)
+            return
+
+        entry = self._user_locks.get(key)
+        if entry is None:
+            entry = self._user_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self._run(coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._user_locks[key]
+
+    async def _run(self, coroutine: Awaitable[Any]):
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self._workers.acquire()
+        except BaseException:
+            if asyncio.iscoroutine(coroutine):
+                coroutine.close()
+            raise
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            await coroutine
+        finally:
+            self.active -= 1
+            self.processed += 1
+            self._workers.release()
+
+    async def initialize(self) -> None:
+        self._workers = asyncio.BoundedSemaphore(self._worker_limit)
+
+    async def shutdown(self) -> None:
+        self._user_locks.clear()
+
+    def get_stats(self) -> Dict:
+        """סטטיסטיקות עיבוד"""
+        return {
+            'workers': self._worker_limit,
+            'active': self.active,
+            'waiting': self.waiting,
+            'max_waiting': self.max_waiting,
+            'users_in_flight': len(self._user_locks),
+            'processed': self.processed
+        }
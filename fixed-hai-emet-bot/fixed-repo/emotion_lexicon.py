@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Emotion Lexicon
+זיהוי רגש בטקסט חופשי - מילון עברי ואנגלי במתאם רב-תבניות
+
+The lexicon is compiled once into an Aho-Corasick automaton, so a message
+is scanned in a single pass however many terms the lexicon holds. A match
+counts only on word boundaries, except that a Hebrew term may carry the
+common one-letter prefixes (ו ה ב כ ל מ ש, up to three) and the gender /
+plural suffixes (ה ת ים ות). A negator within the three words before a
+term flips its sign and an intensifier doubles it.
+
+Batch scoring for backfills, one JSON result per input line:
+
+    python emotion_lexicon.py < messages.txt
+"""
+
+import re
+import sys
+import json
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+# Term -> weight (-4 .. +4)
+LEXICON: Dict[str, int] = {
+    # Hebrew - positive
+    'שמח': 3, 'שמחה': 3, 'מאושר': 4, 'אושר': 3, 'טוב': 1, 'מצוין': 3, 'מעולה': 3,
+    'נהדר': 3, 'נפלא': 3, 'אוהב': 2, 'אהבה': 2, 'רגוע': 2, 'שליו': 2, 'נרגש': 2,
+    'מתרגש': 2, 'אסיר תודה': 3, 'תודה': 1, 'כיף': 2, 'מדהים': 3, 'אופטימי': 2,
+    'בטוח': 1, 'גאה': 2, 'מרוצה': 2, 'חזק': 1, 'משועשע': 2, 'צוחק': 2,
+    # Hebrew - negative
+    'עצוב': -3, 'עצב': -3, 'כועס': -3, 'כעס': -3, 'עצבני': -3, 'עייף': -1, 'מותש': -2,
+    'בודד': -3, 'מפחד': -2, 'פחד': -2, 'חרד': -3, 'חרדה': -3, 'דואג': -2, 'לחוץ': -2,
+    'לחץ': -2, 'מתוסכל': -2, 'תסכול': -2, 'רע': -2, 'גרוע': -3, 'נורא': -3,
+    'מדוכא': -4, 'דיכאון': -4, 'בוכה': -3, 'כואב': -2, 'שונא': -3, 'מאוכזב': -2,
+    'אכזבה': -2, 'מבואס': -2, 'משעמם': -1, 'שבור': -3, 'מיואש': -4, 'ייאוש': -4,
+    # English - positive
+    'happy': 3, 'glad': 2, 'joy': 3, 'joyful': 3, 'great': 2, 'good': 1, 'awesome': 3,
+    'amazing': 3, 'wonderful': 3, 'love': 2, 'loving': 2, 'calm': 2, 'relaxed': 2,
+    'excited': 2, 'grateful': 3, 'thankful': 2, 'thanks': 1, 'proud': 2, 'fun': 2,
+    'hopeful': 2, 'fine': 1, 'cheerful': 3,
+    # English - negative
+    'sad': -3, 'unhappy': -3, 'angry': -3, 'mad': -2, 'furious': -4, 'tired': -1,
+    'exhausted': -2, 'lonely': -3, 'afraid': -2, 'scared': -2, 'anxious': -3,
+    'worried': -2, 'stressed': -2, 'frustrated': -2, 'bad': -2, 'terrible': -3,
+    'awful': -3, 'horrible': -3, 'depressed': -4, 'crying': -3, 'hurt': -2,
+    'hate': -3, 'upset': -2, 'disappointed': -2, 'bored': -1, 'hopeless': -4,
+}
+
+NEGATORS = frozenset((
+    'לא', 'אין', 'בלי', 'אינני', 'איני', 'אינו', 'אינה', 'אף', 'מעולם',
+    'not', 'no', 'never', 'nothing', 'without', 'hardly',
+))
+
+INTENSIFIERS = frozenset((
+    'מאוד', 'ממש', 'נורא', 'סופר', 'הכי',
+    'very', 'really', 'so', 'super', 'extremely', 'totally',
+))
+
+# Hebrew final letters are folded to their regular form before matching
+FINAL_LETTERS = str.maketrans('ךםןףץ', 'כמנפצ')
+HEBREW_PREFIXES = frozenset('והבכלמש')
+HEBREW_SUFFIXES = frozenset(s.translate(FINAL_LETTERS) for s in ('ה', 'ת', 'ים', 'ות'))
+MAX_PREFIX = 3
+NEGATION_SCOPE = 3
+
+# Each lexicon point moves the emotion score by this much; a message moves
+# it at most as far as one button press
+POINTS_PER_WEIGHT = 5
+MAX_DELTA = 20
+
+# Longer messages are scored on their opening, which keeps one message
+# well under a millisecond
+MAX_SCAN_CHARS = 512
+
+TOKEN_RE = re.compile(r"[\w']+")
+HEBREW_RE = re.compile(r'[֐-׿]')
+
+
+class EmotionScore(NamedTuple):
+    """תוצאת ניתוח - ציון גולמי, דלתא לציון הרגשי והמונחים שנמצאו"""
+    score: int
+    delta: int
+    terms: Tuple[str, ...]
+
+
+def normalize(text: str) -> str:
+    return text.lower().translate(FINAL_LETTERS)
+
+
+class EmotionLexicon:
+    """מזהה רגש מבוסס מילון - מהודר פעם אחת"""
+
+    def __init__(
+        self,
+        lexicon: Dict[str, int] = LEXICON,
+        negators: Iterable[str] = NEGATORS,
+        intensifiers: Iterable[str] = INTENSIFIERS
+    ):
+        self.negators = frozenset(normalize(w) for w in negators)
+        self.intensifiers = frozenset(normalize(w) for w in intensifiers)
+        self.weights: Dict[str, int] = {}
+        self.terms: Dict[str, str] = {}
+        self.hebrew: Dict[str, bool] = {}
+        self._compile(lexicon)
+
+    # --- Aho-Corasick automaton ---
+
+    def _compile(self, lexicon: Dict[str, int]):
+        # State 0 is the root; goto[state] maps a character to the next state
+        goto: List[Dict[str, int]] = [{}]
+        output: List[Tuple[str, ...]] = [()]
+        for term, weight in lexicon.items():
+            original, term = term, normalize(term)
+            self.weights[term] = weight
+            self.terms[term] = original
+            self.hebrew[term] = bool(HEBREW_RE.search(term))
+            state = 0
+            for char in term:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][char] = nxt
+                    goto.append({})
+                    output.append(())
+                state = nxt
+            output[state] = output[state] + (term,)
+
+        # Breadth-first failure links; outputs of the fallback state are merged in
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[nxt] = goto[fallback].get(char, 0)
+                output[nxt] = output[nxt] + output[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._output = output
+
+    def _matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """כל ההתאמות בטקסט - (התחלה, סוף, מונח)"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for index, char in enumerate(text):
+            nxt = goto[state].get(char)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto[state].get(char)
+            state = nxt or 0
+            if output[state]:
+                for term in output[state]:
+                    yield index + 1 - len(term), index + 1, term
+
+    # --- Scoring ---
+
+    def _accept(self, term: str, prefix: str, suffix: str) -> bool:
+        if not prefix and not suffix:
+            return True
+        if not self.hebrew[term]:
+            return False
+        if len(prefix) > MAX_PREFIX or any(char not in HEBREW_PREFIXES for char in prefix):
+            return False
+        return not suffix or suffix in HEBREW_SUFFIXES
+
+    def _strip_prefix(self, token: str) -> str:
+        # "ולא", "שלא" and the like still negate
+        stripped = token
+        while len(stripped) > 2 and stripped[0] in HEBREW_PREFIXES and stripped not in self.negators:
+            stripped = stripped[1:]
+        return stripped
+
+    def score(self, text: str) -> EmotionScore:
+        """ניתוח הודעה אחת"""
+        text = normalize(text[:MAX_SCAN_CHARS])
+        tokens = [(m.start(), m.end(), m.group()) for m in TOKEN_RE.finditer(text)]
+        if not tokens:
+            return EmotionScore(0, 0, ())
+        starts = [start for start, _, _ in tokens]
+
+        # Longest accepted term per starting token (multi-word terms span tokens)
+        best: Dict[int, Tuple[int, int, str]] = {}
+        for start, end, term in self._matches(text):
+            first = bisect_right(starts, start) - 1
+            last = bisect_right(starts, end - 1) - 1
+            if first < 0 or start >= tokens[first][1] or end > tokens[last][1]:
+                continue
+            prefix = text[tokens[first][0]:start]
+            suffix = text[end:tokens[last][1]]
+            if not self._accept(term, prefix, suffix):
+                continue
+            current = best.get(first)
+            if current is None or end - start > current[1]:
+                best[first] = (last, end - start, term)
+
+        total = 0
+        terms = []
+        covered = -1
+        for first in sorted(best):
+            last, _, term = best[first]
+            if first <= covered:
+                continue
+            if first + 1 in best and tokens[first][2] in self.intensifiers:
+                # "נורא שמח" - the word intensifies the next term, it is not one itself
+                continue
+            covered = last
+            weight = self.weights[term]
+            for previous in range(max(0, first - NEGATION_SCOPE), first):
+                word = tokens[previous][2]
+                if word in self.negators or word.endswith("n't") or self._strip_prefix(word) in self.negators:
+                    weight = -weight
+                elif previous == first - 1 and word in self.intensifiers:
+                    weight *= 2
+            total += weight
+            terms.append(self.terms[term])
+
+        delta = max(-MAX_DELTA, min(MAX_DELTA, total * POINTS_PER_WEIGHT))
+        return EmotionScore(total, delta, tuple(terms))
+
+    def score_batch(self, texts: Iterable[str]) -> Iterator[EmotionScore]:
+        """ניתוח אצווה - לעיבוד הודעות היסטוריות"""
+        score = self.score
+        for text in texts:
+            yield score(text)
+
+
+if __name__ == '__main__':
+    lines = [line.rstrip('\n') for line in sys.stdin]
+    for line, result in zip(lines, EmotionLexicon().score_batch(lines)):
+        print(json.dumps(
+            {'text': line, 'score': result.score, 'delta': result.delta, 'terms': result.terms},
+            ensure_ascii=False
+        ))
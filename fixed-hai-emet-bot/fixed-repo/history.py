@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Emotion History
+היסטוריית רגשות - חוצץ טבעתי קומפקטי לכל משתמש עם ממוצעים נעים
+
+Every emotion event (timestamp, delta) goes into a per-user ring buffer of
+fixed capacity, stored as two typed arrays (4 + 1 bytes per event), so
+memory per user is bounded by the retention size. Each ring keeps the sum
+and count of the events inside the 7-day and 30-day windows and moves the
+window start forward as events age out, so the rolling means are O(1) to
+read and never rescan the history.
+
+Events are persisted to an append-only log (13 bytes each) through the
+write-behind writer; the log is compacted to the retained events once it
+grows past a size limit.
+"""
+
+import os
+import time
+import struct
+import logging
+import tempfile
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from persistence import WriteBehindWriter
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 60 * 60
+
+# Rolling windows, in seconds
+WINDOWS = (7 * DAY, 30 * DAY)
+
+# One log entry: user id, epoch seconds, delta
+EVENT = struct.Struct('<qIb')
+
+
+def _clamp_delta(delta: int) -> int:
+    return max(-128, min(127, int(delta)))
+
+
+class EmotionRing:
+    """חוצץ טבעתי של אירועי רגש למשתמש אחד"""
+
+    # aggregates holds [sum, count, first seq] per window; the window covers
+    # events with seq in [first seq, seq)
+    __slots__ = ('times', 'deltas', 'seq', 'aggregates')
+
+    def __init__(self):
+        self.times = array('I')
+        self.deltas = array('b')
+        self.seq = 0
+        self.aggregates = array('q', [0] * (3 * len(WINDOWS)))
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def add(self, at: int, delta: int, capacity: int, now: float):
+        """הוספת אירוע - דריסת הישן ביותר כשהחוצץ מלא"""
+        aggregates = self.aggregates
+        if len(self.times) < capacity:
+            self.times.append(at)
+            self.deltas.append(delta)
+        else:
+            # The oldest event leaves the buffer: drop it from any window still holding it
+            oldest = self.seq - capacity
+            slot = oldest % capacity
+            for base in range(0, len(aggregates), 3):
+                if aggregates[base + 2] == oldest:
+                    aggregates[base] -= self.deltas[slot]
+                    aggregates[base + 1] -= 1
+                    aggregates[base + 2] += 1
+            self.times[slot] = at
+            self.deltas[slot] = delta
+        self.seq += 1
+        for base in range(0, len(aggregates), 3):
+            aggregates[base] += delta
+            aggregates[base + 1] += 1
+        self.expire(now, capacity)
+
+    def expire(self, now: float, capacity: int):
+        """הזזת תחילת החלונות - אירועים שיצאו מהחלון מופחתים"""
+        aggregates = self.aggregates
+        for index, window in enumerate(WINDOWS):
+            base = index * 3
+            cutoff = now - window
+            first = aggregates[base + 2]
+            while first < self.seq and self.times[first % capacity] < cutoff:
+                aggregates[base] -= self.deltas[first % capacity]
+                aggregates[base + 1] -= 1
+                first += 1
+            aggregates[base + 2] = first
+
+    def means(self, now: float, capacity: int) -> List[Optional[float]]:
+        """ממוצע לכל חלון (None כשאין אירועים)"""
+        self.expire(now, capacity)
+        aggregates = self.aggregates
+        return [
+            aggregates[base] / aggregates[base + 1] if aggregates[base + 1] else None
+            for base in range(0, len(aggregates), 3)
+        ]
+
+    def events(self, capacity: int) -> Iterator[Tuple[int, int]]:
+        """האירועים השמורים בסדר כרונולוגי"""
+        count = len(self.times)
+        for seq in range(self.seq - count, self.seq):
+            slot = seq % capacity
+            yield self.times[slot], self.deltas[slot]
+
+    def recent(self, limit: int, capacity: int) -> List[int]:
+        """הדלתות האחרונות בסדר כרונולוגי"""
+        count = min(limit, len(self.times))
+        return [self.deltas[seq % capacity] for seq in range(self.seq - count, self.seq)]
+
+
+class EmotionHistory:
+    """היסטוריית רגשות לכל המשתמשים"""
+
+    def __init__(
+        self,
+        path: str,
+        capacity: int = 64,
+        interval: float = 5.0,
+        threshold: int = 500,
+        compact_bytes: int = 16 * 1024 * 1024
+    ):
+        self.path = path
+        self.capacity = capacity
+        self.compact_bytes = compact_bytes
+        self.rings: Dict[int, EmotionRing] = {}
+        self.log_bytes = 0
+        self.compacted_bytes = 0
+        self.compactions = 0
+
+        # Events recorded since the last write
+        self._pending: List[Tuple[int, int, int]] = []
+        self.writer = WriteBehindWriter(
+            self._write,
+            snapshot=self._snapshot,
+            interval=interval,
+            threshold=threshold
+        )
+
+    def record(self, user_id: int, delta: int, at: Optional[float] = None):
+        """רישום אירוע רגש"""
+        now = time.time()
+        at = int(now if at is None else at)
+        delta = _clamp_delta(delta)
+        ring = self.rings.get(user_id)
+        if ring is None:
+            ring = self.rings[user_id] = EmotionRing()
+        ring.add(at, delta, self.capacity, now)
+        self._pending.append((user_id, at, delta))
+        self.writer.mark_dirty(user_id)
+
+    def trend(self, user_id: int, recent: int = 10) -> Optional[Dict]:
+        """ממוצעים נעים ואירועים אחרונים - None כשאין היסטוריה"""
+        ring = self.rings.get(user_id)
+        if ring is None or not len(ring):
+            return None
+        mean_7d, mean_30d = ring.means(time.time(), self.capacity)
+        return {
+            'mean_7d': mean_7d,
+            'mean_30d': mean_30d,
+            'events': len(ring),
+            'recent': ring.recent(recent, self.capacity)
+        }
+
+    # --- Persistence ---
+
+    def load(self) -> int:
+        """טעינת היומן - מחזיר את מספר האירועים"""
+        if not os.path.exists(self.path):
+            return 0
+        now = time.time()
+        events = 0
+        self.rings = {}
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        usable = len(data) - len(data) % EVENT.size
+        for user_id, at, delta in EVENT.iter_unpack(memoryview(data)[:usable]):
+            ring = self.rings.get(user_id)
+            if ring is None:
+                ring = self.rings[user_id] = EmotionRing()
+            ring.add(at, delta, self.capacity, now)
+            events += 1
+        if usable != len(data):
+            # A torn final entry from a crash mid-append
+            logger.warning(f"Emotion history: dropping {len(data) - usable} trailing bytes")
+            with open(self.path, 'r+b') as f:
+                f.truncate(usable)
+        self.log_bytes = usable
+        logger.info(f"✅ Loaded {events} emotion events for {len(self.rings)} users")
+        return events
+
+    def _snapshot(self):
+        pending, self._pending = self._pending, []
+        # Compact once the log doubles past the last compacted size, so a large
+        # history does not rewrite on every flush
+        limit = max(self.compact_bytes, 2 * self.compacted_bytes)
+        if self.log_bytes + len(pending) * EVENT.size < limit:
+            return pending, None
+        # Rewrite the log with only the retained events. The rings are copied
+        # into flat arrays (no object per ring for the collector to chase);
+        # ordering and packing happen on the writer thread
+        users, seqs = array('q'), array('q')
+        times, deltas = array('I'), array('b')
+        for user_id, ring in self.rings.items():
+            users.append(user_id)
+            seqs.append(ring.seq)
+            times.extend(ring.times)
+            deltas.extend(ring.deltas)
+        return pending, (users, seqs, times, deltas)
+
+    def _write(self, data) -> int:
+        pending, retained = data
+        try:
+            return self._write_events(pending, retained)
+        except BaseException:
+            # Keep the events for the retry, ahead of any recorded since
+            self._pending[0:0] = pending
+            raise
+
+    def _pack_retained(self, retained: Tuple[array, array, array, array]) -> bytes:
+        users, seqs, times, deltas = retained
+        capacity = self.capacity
+        pack = EVENT.pack
+        chunks = []
+        offset = 0
+        for user_id, seq in zip(users, seqs):
+            count = min(seq, capacity)
+            # The oldest retained event sits at slot (seq - count) % capacity
+            start = (seq - count) % capacity
+            for slot in range(start, count):
+                chunks.append(pack(user_id, times[offset + slot], deltas[offset + slot]))
+            for slot in range(start):
+                chunks.append(pack(user_id, times[offset + slot], deltas[offset + slot]))
+            offset += count
+        return b''.join(chunks)
+
+    def _write_events(self, pending: List[Tuple[int, int, int]], retained: Optional[Tuple[array, array, array, array]]) -> int:
+        if retained is not None:
+            payload = self._pack_retained(retained)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', suffix='.log', dir=directory)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+            self.log_bytes = self.compacted_bytes = len(payload)
+            self.compactions += 1
+            return len(payload)
+
+        payload = b''.join(EVENT.pack(*event) for event in pending)
+        with open(self.path, 'ab') as f:
+            start = f.tell()
+            try:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            except BaseException:
+                # A partial entry would shift every later one
+                f.truncate(start)
+                raise
+        self.log_bytes += len(payload)
+        return len(payload)
+
+    def flush_sync(self) -> bool:
+        """שמירה מיידית"""
+        return self.writer.flush_sync()
+
+    async def start(self):
+        """הפעלת שמירה ברקע"""
+        self.writer.start()
+
+    async def stop(self):
+        """עצירת שמירה ברקע ושמירה אחרונה"""
+        await self.writer.stop()
+
+    def get_stats(self) -> Dict:
+        """סטטיסטיקות היסטוריה"""
+        stats = self.writer.get_stats()
+        stats['users'] = len(self.rings)
+        stats['capacity'] = self.capacity
+        stats['log_bytes'] = self.log_bytes
+        stats['compactions'] = self.compactions
+        return stats
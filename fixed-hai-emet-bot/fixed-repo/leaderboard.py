@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Leaderboard Index
+טבלת מובילים - אינדקס ממוין של נקודות קוונטיות
+
+Users are kept in a bucketed sorted list ordered by quantum points (highest
+first, ties by user id). A Fenwick tree over the bucket sizes turns a
+position lookup into O(log n), and an update only shifts one small bucket
+instead of the whole list, so ranks never need a full scan.
+"""
+
+from bisect import bisect_left, insort
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Keys pack (points desc, user_id asc) into one int: (-points << 53) + user_id
+USER_ID_BITS = 53
+USER_ID_MASK = (1 << USER_ID_BITS) - 1
+
+# Bucket size target - buckets split when they grow past twice this
+BUCKET_LOAD = 512
+
+
+def make_key(user_id: int, points: int) -> int:
+    return (-points << USER_ID_BITS) + user_id
+
+
+def split_key(key: int) -> Tuple[int, int]:
+    """פירוק מפתח ל-(משתמש, נקודות)"""
+    return key & USER_ID_MASK, -(key >> USER_ID_BITS)
+
+
+class Leaderboard:
+    """טבלת מובילים - דירוג ב-O(log n) ללא סריקה מלאה"""
+
+    def __init__(self):
+        self._buckets: List[List[int]] = []
+        self._maxes: List[int] = []
+        self._tree: List[int] = [0]
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    # --- Fenwick tree over bucket sizes ---
+
+    def _rebuild_tree(self):
+        tree = [0] * (len(self._buckets) + 1)
+        for i, bucket in enumerate(self._buckets, 1):
+            tree[i] += len(bucket)
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, index: int, delta: int):
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _tree_prefix(self, index: int) -> int:
+        # Number of keys in buckets [0, index)
+        total = 0
+        i = index
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    # --- Sorted key list ---
+
+    def _insert(self, key: int):
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+            self._rebuild_tree()
+            self._len = 1
+            return
+
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            i -= 1
+        bucket = self._buckets[i]
+        insort(bucket, key)
+        self._maxes[i] = bucket[-1]
+        self._len += 1
+
+        if len(bucket) > 2 * BUCKET_LOAD:
+            self._buckets[i:i + 1] = [bucket[:BUCKET_LOAD], bucket[BUCKET_LOAD:]]
+            self._maxes[i:i + 1] = [bucket[BUCKET_LOAD - 1], bucket[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(i, 1)
+
+    def _remove(self, key: int) -> bool:
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return False
+        bucket = self._buckets[i]
+        j = bisect_left(bucket, key)
+        if j == len(bucket) or bucket[j] != key:
+            return False
+        del bucket[j]
+        self._len -= 1
+
+        if not bucket:
+            del self._buckets[i]
+            del self._maxes[i]
+            self._rebuild_tree()
+        else:
+            self._maxes[i] = bucket[-1]
+            self._tree_add(i, -1)
+        return True
+
+    def _position(self, key: int) -> int:
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return self._len
+        return self._tree_prefix(i) + bisect_left(self._buckets[i], key)
+
+    # --- Public API ---
+
+    def rebuild(self, users: Iterable[Tuple[int, int]]):
+        """בנייה מחדש מכל המשתמשים - פעם אחת בטעינה"""
+        keys = sorted(make_key(user_id, points) for user_id, points in users)
+        self._buckets = [keys[i:i + BUCKET_LOAD] for i in range(0, len(keys), BUCKET_LOAD)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(keys)
+        self._rebuild_tree()
+
+    def add(self, user_id: int, points: int = 0):
+        """הוספת משתמש חדש"""
+        self._insert(make_key(user_id, points))
+
+    def update(self, user_id: int, old_points: int, new_points: int):
+        """עדכון נקודות של משתמש"""
+        if old_points == new_points:
+            return
+        self._remove(make_key(user_id, old_points))
+        self._insert(make_key(user_id, new_points))
+
+    def rank(self, user_id: int, points: int) -> Optional[int]:
+        """דירוג המשתמש (1 = ראשון)"""
+        key = make_key(user_id, points)
+        position = self._position(key)
+        if position == self._len:
+            return None
+        bucket_index = bisect_left(self._maxes, key)
+        bucket = self._buckets[bucket_index]
+        if bucket[bisect_left(bucket, key)] != key:
+            return None
+        return position + 1
+
+    def points(self) -> Iterator[int]:
+        """הנקודות של כל המשתמשים, מהגבוה לנמוך"""
+        for bucket in self._buckets:
+            for key in bucket:
+                yield -(key >> USER_ID_BITS)
+
+    def top(self, n: int = 10) -> List[Tuple[int, int]]:
+        """המובילים - רשימת (משתמש, נקודות)"""
+        result = []
+        for bucket in self._buckets:
+            for key in bucket:
+                if len(result) == n:
+                    return result
+                result.append(split_key(key))
+        return result
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Metrics
+מדדים - מונים והיסטוגרמות בפורמט Prometheus
+
+A small in-process registry of counters, gauges and histograms, rendered in
+the Prometheus text exposition format. Gauges can read their value from a
+callback at scrape time, so existing counters (total_users, store stats,
+scheduler stats) are exported without being copied on every change.
+A local aiohttp endpoint serves the text for scraping.
+"""
+
+import time
+import bisect
+import asyncio
+import logging
+from collections import deque
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Handler and disk latencies, in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LabelKey = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelKey, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """מדד בסיסי עם תוויות"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """מונה - עולה בלבד"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        super().__init__(name, help_text, labels)
+        self.values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels: Any) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """מד - ערך נוכחי, קבוע או מחושב בזמן הקריאה"""
+
+    kind = 'gauge'
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Iterable[str] = (),
+        callback: Optional[Callable[[], Any]] = None,
+        kind: str = 'gauge'
+    ):
+        super().__init__(name, help_text, labels)
+        self.values: Dict[LabelKey, float] = {}
+        self.callback = callback
+        # Monotonic values read from elsewhere are exported as counters
+        self.kind = kind
+
+    def set(self, value: float, **labels: Any):
+        self.values[self._key(labels)] = value
+
+    def samples(self) -> Iterable[str]:
+        values = self.values
+        if self.callback is not None:
+            result = self.callback()
+            # A callback returns a number, or {label value(s): number}
+            if isinstance(result, dict):
+                values = {k if isinstance(k, tuple) else (str(k),): v for k, v in result.items()}
+            else:
+                values = {(): result}
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """היסטוגרמה - התפלגות זמנים לפי דליים"""
+
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self.series: Dict[LabelKey, List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any):
+        key = self._key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, **labels: Any) -> int:
+        series = self.series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def quantile(self, q: float, **labels: Any) -> float:
+        """הערכת אחוזון מתוך הדליים"""
+        series = self.series.get(self._key(labels))
+        if not series or not series[2]:
+            return 0.0
+        target = q * series[2]
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets + (float('inf'),), series[0]):
+            if count and seen + count >= target:
+                if bound == float('inf'):
+                    return lower
+                return lower + (bound - lower) * (target - seen) / count
+            seen += count
+            lower = bound
+        return lower
+
+    def samples(self) -> Iterable[str]:
+        for key, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+            labels = _format_labels(self.label_names, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Registry:
+    """מאגר מדדים"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Iterable[str] = (), **kwargs: Any) -> Gauge:
+        return self.register(Gauge(name, help_text, labels, **kwargs))
+
+    def histogram(self, name: str, help_text: str, labels: Iterable[str] = (), **kwargs: Any) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, **kwargs))
+
+    def render(self) -> str:
+        """כל המדדים בפורמט טקסט של Prometheus"""
+        blocks = []
+        for metric in self.metrics.values():
+            try:
+                blocks.append(metric.render())
+            except Exception as e:
+                logger.warning(f"Metric {metric.name} failed to render: {e}")
+        return '\n'.join(blocks) + '\n'
+
+
+def instrument(calls: Counter, errors: Counter, latency: Histogram):
+    """עטיפת handler - ספירת קריאות, שגיאות וזמן ריצה"""
+    def decorator(func):
+        name = func.__name__
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            calls.inc(handler=name)
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                errors.inc(handler=name)
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started, handler=name)
+        return wrapper
+    return decorator
+
+
+class TimeSeries:
+    """דגימות לאורך זמן בחלון מוגבל"""
+
+    def __init__(self, sample: Callable[[], Dict[str, float]], interval: float = 60.0, maxlen: int = 1440):
+        self.sample = sample
+        self.interval = interval
+        self.points: Deque[Tuple[float, Dict[str, float]]] = deque(maxlen=maxlen)
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self):
+        self.points.append((time.time(), self.sample()))
+
+    def change(self, seconds: float) -> Dict[str, float]:
+        """שינוי בכל ערך במהלך החלון האחרון"""
+        if not self.points:
+            return {}
+        now, latest = self.points[-1]
+        base = latest
+        for at, values in self.points:
+            if at >= now - seconds:
+                base = values
+                break
+        return {name: latest[name] - base.get(name, 0) for name in latest}
+
+    async def _run(self):
+        while True:
+            self.record()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """הפעלת דגימה ברקע"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """עצירת הדגימה"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class MetricsServer:
+    """נקודת קצה מקומית לגריפת מדדים"""
+
+    def __init__(self, registry: Registry, host: str = '127.0.0.1', port: int = 9100):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.app = web.Application()
+        self.app.router.add_get('/metrics', self.handle_metrics)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=self.registry.render().encode('utf-8'),
+            headers={'Content-Type': CONTENT_TYPE}
+        )
+
+    async def start(self):
+        """הפעלת השרת"""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"📈 Metrics endpoint on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        """עצירת השרת"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Bot API Connection Pools
+מאגרי חיבורים ל-Bot API - מאגר נפרד ל-getUpdates ולשליחה, ניתנים לכוונון
+
+The bot talks to the Bot API through two HTTPX pools: one for the
+getUpdates long poll and one for everything it sends, so a slow poll
+never holds a connection a reply is waiting for. Each pool reads its
+size, keep-alive and connect/read/write/pool timeouts from the
+environment (HAI_EMET_SEND_POOL_SIZE, HAI_EMET_POLL_READ_TIMEOUT, ...).
+HTTP/2 is used when the h2 package is installed, unless HAI_EMET_HTTP2=0.
+
+Transient failures are retried with jittered exponential backoff: errors
+raised before the request left (connect errors, pool timeouts) for any
+method, and other network errors or 5xx answers only for get* methods,
+so a message is never sent twice. 429 is left to the send scheduler.
+
+Every request is traced to measure how long it waited for a connection
+from the pool and whether it reused a kept-alive connection or opened
+a new one.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+import importlib.util
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+import httpx
+from telegram.error import NetworkError
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+# Errors raised before the request reached the server; safe to retry for any method
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Server errors retried for idempotent methods
+RETRY_STATUSES = frozenset((500, 502, 503, 504))
+
+# Number of recent pool waits kept for percentiles
+WAIT_SAMPLES = 1000
+
+
+class PooledRequest(HTTPXRequest):
+    """מאגר חיבורים ל-Bot API עם ניסיונות חוזרים ומדידת המתנה"""
+
+    def __init__(
+        self,
+        name: str,
+        pool_size: int = 1,
+        keepalive: float = 5.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 5.0,
+        write_timeout: float = 5.0,
+        pool_timeout: float = 1.0,
+        http2: Optional[bool] = None,
+        retries: int = 2,
+        backoff: float = 0.5,
+        max_backoff: float = 5.0
+    ):
+        self.name = name
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning(f"HTTP/2 requested for the {name} pool but h2 is not installed, using HTTP/1.1")
+        use_http2 = HTTP2_AVAILABLE if http2 is None else bool(http2) and HTTP2_AVAILABLE
+
+        # Counters
+        self.requests = 0
+        self.reused = 0
+        self.connections_opened = 0
+        self.retried = 0
+        self.errors = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+        # Optional observer called with (pool wait seconds, reused) per request
+        self.on_request: Optional[Callable[[float, bool], None]] = None
+
+        super().__init__(
+            connection_pool_size=pool_size,
+            read_timeout=read_timeout,
+            write_timeout=write_timeout,
+            connect_timeout=connect_timeout,
+            pool_timeout=pool_timeout,
+            http_version='2' if use_http2 else '1.1'
+        )
+
+    @classmethod
+    def from_env(cls, name: str, **defaults: Any) -> 'PooledRequest':
+        """מאגר לפי משתני הסביבה HAI_EMET_<NAME>_* עם ברירות מחדל"""
+        prefix = f'HAI_EMET_{name.upper()}_'
+        settings: Dict[str, Any] = dict(defaults)
+        for option, parse in (
+            ('pool_size', int),
+            ('keepalive', float),
+            ('connect_timeout', float),
+            ('read_timeout', float),
+            ('write_timeout', float),
+            ('pool_timeout', float)
+        ):
+            value = os.getenv(prefix + option.upper())
+            if value:
+                settings[option] = parse(value)
+        http2 = os.getenv('HAI_EMET_HTTP2', 'auto').lower()
+        settings['http2'] = None if http2 == 'auto' else http2 in ('1', 'true', 'yes', 'on')
+        settings['retries'] = int(os.getenv('HAI_EMET_HTTP_RETRIES', str(settings.get('retries', 2))))
+        settings['backoff'] = float(os.getenv('HAI_EMET_HTTP_BACKOFF', str(settings.get('backoff', 0.5))))
+        request = cls(name, **settings)
+        logger.info(
+            f"🔌 {name} pool: {request.pool_size} connections, HTTP/{request.http_version}, "
+            f"keep-alive {request.keepalive}s, {request.retries} retries"
+        )
+        return request
+
+    def _build_client(self) -> httpx.AsyncClient:
+        kwargs = dict(self._client_kwargs)
+        kwargs['limits'] = httpx.Limits(
+            max_connections=self.pool_size,
+            max_keepalive_connections=self.pool_size,
+            keepalive_expiry=self.keepalive
+        )
+        kwargs['event_hooks'] = {'request': [self._trace_request]}
+        return httpx.AsyncClient(**kwargs)
+
+    # --- Tracing ---
+
+    async def _trace_request(self, request: httpx.Request):
+        # Time spent opening a connection is not time waiting for the pool
+        started = time.perf_counter()
+        state = {'connect_started': 0.0, 'connecting': 0.0, 'opened': False, 'done': False}
+
+        async def trace(event: str, info: Dict):
+            now = time.perf_counter()
+            if event in ('connection.connect_tcp.started', 'connection.start_tls.started'):
+                state['connect_started'] = now
+                if event == 'connection.connect_tcp.started':
+                    state['opened'] = True
+            elif event in ('connection.connect_tcp.complete', 'connection.start_tls.complete'):
+                state['connecting'] += now - state['connect_started']
+            elif event.endswith('.send_request_headers.started') and not state['done']:
+                state['done'] = True
+                self._record(max(0.0, now - started - state['connecting']), not state['opened'])
+
+        request.extensions['trace'] = trace
+
+    def _record(self, waited: float, reused: bool):
+        self.requests += 1
+        if reused:
+            self.reused += 1
+        else:
+            self.connections_opened += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self._waits.append(waited)
+        if self.on_request is not None:
+            self.on_request(waited, reused)
+
+    # --- Retries ---
+
+    @staticmethod
+    def _idempotent(url: str) -> bool:
+        return url.rsplit('/', 1)[-1].startswith('get')
+
+    def _delay(self, attempt: int) -> float:
+        # Full jitter: spread retries from many senders over the whole window
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def do_request(self, url: str, method: str, *args: Any, **kwargs: Any) -> Tuple[int, bytes]:
+        attempt = 0
+        while True:
+            try:
+                code, payload = await super().do_request(url, method, *args, **kwargs)
+            except NetworkError as e:
+                if attempt >= self.retries or not (isinstance(e.__cause__, UNSENT_ERRORS) or self._idempotent(url)):
+                    self.errors += 1
+                    raise
+                logger.debug(f"{self.name} pool: retrying after {e}")
+            else:
+                if code not in RETRY_STATUSES or attempt >= self.retries or not self._idempotent(url):
+                    return code, payload
+                logger.debug(f"{self.name} pool: retrying after HTTP {code}")
+            attempt += 1
+            self.retried += 1
+            await asyncio.sleep(self._delay(attempt))
+
+    # --- Metrics ---
+
+    def get_stats(self) -> Dict:
+        """שימוש חוזר בחיבורים וזמני המתנה למאגר"""
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p * len(waits)))]
+
+        return {
+            'pool': self.name,
+            'http_version': self.http_version,
+            'pool_size': self.pool_size,
+            'requests': self.requests,
+            'connections_opened': self.connections_opened,
+            'reuse_ratio': round(self.reused / self.requests, 3) if self.requests else 0.0,
+            'retries': self.retried,
+            'errors': self.errors,
+            'wait_avg_ms': round(self.wait_total / max(self.requests, 1) * 1000, 3),
+            'wait_p50_ms': round(percentile(0.50) * 1000, 3),
+            'wait_p99_ms': round(percentile(0.99) * 1000, 3),
+            'wait_max_ms': round(self.wait_max * 1000, 3)
+        }
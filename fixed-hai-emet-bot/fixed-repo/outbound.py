@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Outbound Send Scheduler
+מתזמן שליחה - עמידה במגבלות הקצב של טלגרם
+
+Every outgoing message goes through one scheduler:
+- a global token bucket (~30 msg/s) for the whole bot
+- a small token bucket per chat, so one chat is paced to ~1 msg/s after a
+  short burst
+- priority lanes: interactive replies are always picked before bulk sends
+- RetryAfter (429 flood control) pauses all sending for the requested time
+  and puts the message back at the front of its lane
+
+Handlers await the returned result, so a reply still completes (or fails)
+in the handler that sent it.
+"""
+
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from datetime import timedelta
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# How far into a lane to look for a chat that is allowed to send now
+LOOKAHEAD = 64
+
+# Per-chat buckets kept before idle ones are dropped, least recently used first
+MAX_CHATS = 10000
+
+# Number of recent queue waits kept for percentiles
+WAIT_SAMPLES = 1000
+
+
+class Priority(IntEnum):
+    """נתיב עדיפות - מספר קטן יותר נשלח קודם"""
+    INTERACTIVE = 0
+    BULK = 1
+
+
+class TokenBucket:
+    """דלי אסימונים - קצב קבוע עם פרץ מוגבל"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now <= self.updated:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """זמן עד שיהיה אסימון פנוי"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def drain_until(self, when: float):
+        """ריקון הדלי - מילוי מחדש רק מהזמן הנתון"""
+        self.tokens = 0.0
+        self.updated = max(self.updated, when)
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Job:
+    __slots__ = ('chat_id', 'send', 'future', 'priority', 'submitted', 'attempts')
+
+    def __init__(self, chat_id: int, send: Callable[[], Awaitable[Any]], future: asyncio.Future, priority: Priority):
+        self.chat_id = chat_id
+        self.send = send
+        self.future = future
+        self.priority = priority
+        self.submitted = time.monotonic()
+        self.attempts = 0
+
+
+class SendScheduler:
+    """מתזמן שליחה גלובלי עם נתיבי עדיפות"""
+
+    def __init__(
+        self,
+        rate: float = 30.0,
+        per_chat_rate: float = 1.0,
+        per_chat_burst: int = 3,
+        max_retries: int = 3
+    ):
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_retries = max_retries
+
+        self._global = TokenBucket(rate, rate)
+        self._chats: 'OrderedDict[int, TokenBucket]' = OrderedDict()
+        self._lanes: Dict[Priority, Deque[_Job]] = {p: deque() for p in Priority}
+        self._paused_until = 0.0
+        self._in_flight: Set[asyncio.Task] = set()
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        # Metrics
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.flood_waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+    # --- Public API ---
+
+    async def submit(
+        self,
+        chat_id: int,
+        send: Callable[[], Awaitable[Any]],
+        priority: Priority = Priority.INTERACTIVE
+    ) -> Any:
+        """שליחה דרך המתזמן - מחזיר את תוצאת הקריאה"""
+        if self._task is None or self._task.done():
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._lanes[priority].append(_Job(chat_id, send, future, priority))
+        self._wakeup.set()
+        return await future
+
+    def start(self):
+        """הפעלת המתזמן"""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def stop(self, timeout: float = 10.0):
+        """עצירה - ריקון התורים עד לזמן המוגבל"""
+        deadline = time.monotonic() + timeout
+        while (self.queue_depth or self._in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for lane in self._lanes.values():
+            while lane:
+                job = lane.popleft()
+                if not job.future.done():
+                    job.future.cancel()
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    # --- Dispatcher ---
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        chats = self._chats
+        bucket = chats.get(chat_id)
+        if bucket is not None:
+            chats.move_to_end(chat_id)
+            return bucket
+        bucket = chats[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+        if len(chats) > MAX_CHATS:
+            # A full bucket holds no state a fresh one would not; stop at the
+            # first chat that is still being paced
+            now = time.monotonic()
+            while len(chats) > MAX_CHATS:
+                oldest = next(iter(chats.values()))
+                if not oldest.is_full(now):
+                    break
+                chats.popitem(last=False)
+        return bucket
+
+    def _pick(self, now: float) -> Tuple[Optional[_Job], float]:
+        """בחירת ההודעה הבאה שמותר לשלוח, לפי עדיפות"""
+        soonest = 1.0
+        for priority in Priority:
+            lane = self._lanes[priority]
+            for index in range(min(len(lane), LOOKAHEAD)):
+                job = lane[index]
+                if job.future.done():
+                    del lane[index]
+                    return None, 0.0
+                wait = self._chat_bucket(job.chat_id).wait_time(now)
+                if wait <= 0:
+                    del lane[index]
+                    return job, 0.0
+                soonest = min(soonest, wait)
+        return None, soonest
+
+    async def _dispatch(self):
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            if not self.queue_depth:
+                await self._wakeup.wait()
+                continue
+
+            global_wait = self._global.wait_time(now)
+            if global_wait > 0:
+                await asyncio.sleep(global_wait)
+                continue
+
+            job, wait = self._pick(now)
+            if job is None:
+                if wait > 0:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+                continue
+
+            self._global.take()
+            self._chat_bucket(job.chat_id).take()
+            task = asyncio.get_running_loop().create_task(self._send(job))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, job: _Job):
+        if job.attempts == 0:
+            waited = time.monotonic() - job.submitted
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self._waits.append(waited)
+        job.attempts += 1
+
+        try:
+            result = await job.send()
+        except RetryAfter as e:
+            delay = e.retry_after
+            if isinstance(delay, timedelta):
+                delay = delay.total_seconds()
+            self.flood_waits += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + float(delay))
+            # Resume slowly instead of with a full burst right after the pause
+            self._global.drain_until(self._paused_until)
+            logger.warning(f"⏳ Flood control: pausing sends for {delay}s")
+            if job.attempts <= self.max_retries and not job.future.done():
+                self.retries += 1
+                self._lanes[job.priority].appendleft(job)
+                self._wakeup.set()
+                return
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        except Exception as e:
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self.sent += 1
+            if not job.future.done():
+                job.future.set_result(result)
+
+    # --- Metrics ---
+
+    def get_stats(self) -> Dict:
+        """עומק תורים וזמני המתנה"""
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p * len(waits)))]
+
+        return {
+            'queue_interactive': len(self._lanes[Priority.INTERACTIVE]),
+            'queue_bulk': len(self._lanes[Priority.BULK]),
+            'in_flight': len(self._in_flight),
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'flood_waits': self.flood_waits,
+            'paused_for': max(0.0, round(self._paused_until - time.monotonic(), 2)),
+            'wait_avg_ms': round(self.wait_total / max(self.sent + self.failed, 1) * 1000, 2),
+            'wait_p50_ms': round(percentile(0.50) * 1000, 2),
+            'wait_p99_ms': round(percentile(0.99) * 1000, 2),
+            'wait_max_ms': round(self.wait_max * 1000, 2)
+        }
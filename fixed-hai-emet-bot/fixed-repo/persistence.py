@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Write-Behind Persistence
+שמירה מושהית של נתוני משתמשים - מאחדת שינויים רבים לכתיבה אחת ברקע
+
+Mutations only mark users as dirty. A background asyncio task flushes on a
+fixed interval or once enough users are dirty and runs the actual write off
+the event loop. The JSON backend replaces its file atomically (temp file +
+rename); other backends plug in their own write function.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import tempfile
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════
+#                          ATOMIC WRITES
+# ═══════════════════════════════════════════════════════════════════
+
+def atomic_write_json(path: str, data: Any) -> int:
+    """כתיבה אטומית של JSON - קובץ זמני ואז החלפה"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', suffix='.json', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return len(payload)
+
+# ═══════════════════════════════════════════════════════════════════
+#                        WRITE-BEHIND WRITER
+# ═══════════════════════════════════════════════════════════════════
+
+class WriteBehindWriter:
+    """כותב מושהה - שמירה ברקע לפי זמן או כמות משתמשים מלוכלכים"""
+
+    def __init__(
+        self,
+        write: Callable[[Any], int],
+        snapshot: Callable[[], Any],
+        interval: float = 5.0,
+        threshold: int = 500
+    ):
+        self.write = write
+        self.snapshot = snapshot
+        self.interval = interval
+        self.threshold = threshold
+
+        # Dirty tracking
+        self._dirty = set()
+        self._pending_saves = 0
+        self._retry = False
+
+        # Background task
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+        # Counters
+        self.save_requests = 0
+        self.flushes = 0
+        self.coalesced_writes = 0
+        self.bytes_written = 0
+        self.write_seconds = 0.0
+        self.errors = 0
+
+        # Optional observer called with (bytes written, seconds) after each write
+        self.on_write: Optional[Callable[[int, float], None]] = None
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def mark_dirty(self, key: Any):
+        """סימון משתמש כמלוכלך - ללא כתיבה לדיסק"""
+        self._dirty.add(key)
+        self._pending_saves += 1
+        self.save_requests += 1
+        if self._wakeup is not None and len(self._dirty) >= self.threshold:
+            self._wakeup.set()
+
+    def _take_snapshot(self):
+        """לקיחת צילום מצב ואיפוס המלוכלכים - רץ בלולאת האירועים"""
+        if not self._dirty and not self._retry:
+            return None, 0
+        data = self.snapshot()
+        pending = self._pending_saves
+        self._dirty.clear()
+        self._pending_saves = 0
+        self._retry = False
+        return data, pending
+
+    def _record_error(self, error: Exception, pending: int):
+        # Keep the state dirty so the next flush retries the write
+        self.errors += 1
+        self._retry = True
+        self._pending_saves += pending
+        logger.error(f"Error saving users: {error}")
+
+    def _record_write(self, written: int, pending: int, seconds: float):
+        self.flushes += 1
+        self.bytes_written += written
+        self.write_seconds += seconds
+        self.coalesced_writes += max(pending - 1, 0)
+        if self.on_write is not None:
+            self.on_write(written, seconds)
+
+    def flush_sync(self) -> bool:
+        """שמירה מיידית - לשימוש מחוץ ללולאת האירועים"""
+        data, pending = self._take_snapshot()
+        if data is None:
+            return False
+        started = time.perf_counter()
+        try:
+            written = self.write(data)
+        except Exception as e:
+            self._record_error(e, pending)
+            return False
+        self._record_write(written, pending, time.perf_counter() - started)
+        return True
+
+    async def flush(self) -> bool:
+        """שמירה ברקע - סריאליזציה וכתיבה מחוץ ללולאת האירועים"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            data, pending = self._take_snapshot()
+            if data is None:
+                return False
+            started = time.perf_counter()
+            try:
+                written = await asyncio.to_thread(self.write, data)
+            except Exception as e:
+                self._record_error(e, pending)
+                return False
+            self._record_write(written, pending, time.perf_counter() - started)
+            return True
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        """הפעלת משימת הרקע"""
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(
+            f"💾 Write-behind started (interval={self.interval}s, threshold={self.threshold})"
+        )
+
+    async def stop(self):
+        """עצירת משימת הרקע ושמירה אחרונה"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        self._wakeup = None
+        logger.info(
+            f"💾 Write-behind stopped: {self.flushes} writes, "
+            f"{self.coalesced_writes} coalesced"
+        )
+
+    def get_stats(self) -> dict:
+        """סטטיסטיקות שמירה"""
+        return {
+            'save_requests': self.save_requests,
+            'flushes': self.flushes,
+            'coalesced_writes': self.coalesced_writes,
+            'bytes_written': self.bytes_written,
+            'write_seconds': round(self.write_seconds, 3),
+            'dirty': self.dirty_count,
+            'errors': self.errors
+        }
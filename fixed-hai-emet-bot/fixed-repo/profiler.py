@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Sampling Profiler
+פרופיילר דגימה - מופעל לפי דרישה, ללא עלות כשהוא כבוי
+
+While a profile runs, a background thread samples the stack of every thread
+with sys._current_frames() a few hundred times a second. Handlers on the
+event loop and store writes in worker threads (JSON serialization, SQLite
+commits) show up alike. Nothing is installed when profiling is off, so the
+bot runs at full speed the rest of the time.
+
+The result is written in the folded-stack format ("a;b;c count"), which
+flame graph tools read directly, and summarized as top functions by self
+and total time.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Leaf frames of a thread waiting for work (event loop select, idle pool workers)
+IDLE_FUNCTIONS = frozenset(('select', 'poll', 'epoll', 'kqueue', 'wait', '_worker'))
+
+Frame = str
+Stack = Tuple[Frame, ...]
+
+
+def _frame_label(frame) -> Frame:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfileResult:
+    """תוצאת פרופיל - ספירת מחסניות"""
+
+    def __init__(self, stacks: Counter, samples: int, duration: float, updates: int):
+        self.stacks = stacks
+        self.samples = samples
+        self.duration = duration
+        self.updates = updates
+
+    @property
+    def idle_samples(self) -> int:
+        return sum(
+            count for stack, count in self.stacks.items()
+            if stack and stack[-1].split(' ', 1)[0] in IDLE_FUNCTIONS
+        )
+
+    def top(self, limit: int = 15) -> List[Tuple[Frame, int, int]]:
+        """הפונקציות המובילות - (פונקציה, זמן עצמי, זמן כולל) בדגימות"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            if not stack or stack[-1].split(' ', 1)[0] in IDLE_FUNCTIONS:
+                continue
+            own[stack[-1]] += count
+            for frame in set(stack):
+                total[frame] += count
+        return [(frame, own_count, total[frame]) for frame, own_count in own.most_common(limit)]
+
+    def write_folded(self, directory: str) -> str:
+        """כתיבת קובץ הפרופיל - מחזיר את הנתיב"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+        return path
+
+    def summary(self, limit: int = 15) -> str:
+        """סיכום טקסט קצר"""
+        # One stack per thread per sample; percentages are of the busy ones
+        stacks = sum(self.stacks.values())
+        busy = max(stacks - self.idle_samples, 1)
+        lines = [
+            f"samples: {self.samples} in {self.duration:.1f}s, updates: {self.updates}, "
+            f"busy stacks: {busy / max(stacks, 1):.0%}",
+            "self% total%  function"
+        ]
+        for frame, own, total in self.top(limit):
+            lines.append(f"{own / busy:>5.1%} {total / busy:>6.1%}  {frame}")
+        return '\n'.join(lines)
+
+
+class SamplingProfiler:
+    """פרופיילר דגימה לכל התהליכונים"""
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self.profiles_taken = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _sample_loop(self):
+        own_ident = threading.get_ident()
+        max_depth = self.max_depth
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < max_depth:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                self._stacks[tuple(stack)] += 1
+            self._samples += 1
+
+    async def run(
+        self,
+        seconds: Optional[float] = None,
+        updates: Optional[int] = None,
+        update_count: Optional[Callable[[], int]] = None
+    ) -> ProfileResult:
+        """הרצת פרופיל עד לזמן או למספר עדכונים"""
+        if self.running:
+            raise RuntimeError("A profile is already running")
+        if seconds is None and updates is None:
+            raise ValueError("Give a duration or a number of updates")
+
+        self._stacks = Counter()
+        self._samples = 0
+        self._stop.clear()
+        first_update = update_count() if update_count else 0
+        started = time.monotonic()
+        self._thread = threading.Thread(target=self._sample_loop, name='hai-emet-profiler', daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                await asyncio.sleep(0.1)
+                if seconds is not None and time.monotonic() - started >= seconds:
+                    break
+                if updates is not None and update_count and update_count() - first_update >= updates:
+                    break
+        finally:
+            self._stop.set()
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+        self.profiles_taken += 1
+        return ProfileResult(
+            self._stacks,
+            self._samples,
+            time.monotonic() - started,
+            (update_count() - first_update) if update_count else 0
+        )
+
+    def get_stats(self) -> Dict:
+        """מצב הפרופיילר"""
+        return {
+            'running': self.running,
+            'samples': self._samples,
+            'profiles_taken': self.profiles_taken
+        }
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Compact User Records
+רשומת משתמש קומפקטית - מחלקה עם __slots__ במקום מילון
+
+A record stores timestamps as epoch seconds and the mood as a small enum, but
+reads like the old dict: record['joined'] is still an ISO string and
+record['mood'] is still 'neutral', so handlers and JSON files are unchanged.
+"""
+
+from collections.abc import Mapping
+from datetime import datetime
+from enum import IntEnum
+from operator import attrgetter
+from typing import Any, Dict, Iterator, Tuple
+
+
+class Mood(IntEnum):
+    """מצב רוח - מ'מוטרד' עד 'שמח'"""
+    TROUBLED = 0
+    MELANCHOLIC = 1
+    NEUTRAL = 2
+    POSITIVE = 3
+    JOYFUL = 4
+
+    @property
+    def label(self) -> str:
+        return self.name.lower()
+
+    @classmethod
+    def parse(cls, value: Any) -> 'Mood':
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, int):
+            return cls(value)
+        return cls[str(value).upper()]
+
+
+# Fields stored as epoch seconds but exposed as ISO strings
+TIMESTAMP_FIELDS = frozenset(('joined', 'last_seen'))
+
+
+def to_epoch(value: Any) -> int:
+    """המרת זמן ISO לשניות"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def to_iso(epoch: int) -> str:
+    """המרת שניות לזמן ISO"""
+    return datetime.fromtimestamp(epoch).isoformat()
+
+
+class UserRecord(Mapping):
+    """רשומת משתמש - גישה כמו מילון, אחסון קומפקטי"""
+
+    __slots__ = (
+        'username',
+        'first_name',
+        'joined',
+        'quantum_points',
+        'cosmic_level',
+        'total_interactions',
+        'total_messages',
+        'emotion_score',
+        'mood',
+        'last_seen',
+        'blocked'
+    )
+
+    def __init__(
+        self,
+        username: str = '',
+        first_name: str = '',
+        joined: int = 0,
+        quantum_points: int = 0,
+        cosmic_level: int = 1,
+        total_interactions: int = 0,
+        total_messages: int = 0,
+        emotion_score: int = 0,
+        mood: Mood = Mood.NEUTRAL,
+        last_seen: int = 0,
+        blocked: bool = False
+    ):
+        self.username = username
+        self.first_name = first_name
+        self.joined = joined
+        self.quantum_points = quantum_points
+        self.cosmic_level = cosmic_level
+        self.total_interactions = total_interactions
+        self.total_messages = total_messages
+        self.emotion_score = emotion_score
+        self.mood = mood
+        self.last_seen = last_seen
+        self.blocked = blocked
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'UserRecord':
+        """יצירת רשומה ממילון (קובץ JSON או רישום חדש)"""
+        record = cls()
+        record.update(data)
+        return record
+
+    def to_dict(self) -> Dict:
+        """המרה למילון בפורמט הקובץ"""
+        return {field: self[field] for field in self.__slots__}
+
+    def raw(self) -> Tuple:
+        """הערכים הגולמיים בסדר השדות - העתקה זולה, ללא המרות"""
+        return _raw_values(self)
+
+    def update(self, fields: Dict):
+        """עדכון שדות - מקבל ערכים בפורמט המילון"""
+        for field, value in fields.items():
+            if field in TIMESTAMP_FIELDS:
+                value = to_epoch(value)
+            elif field == 'mood':
+                value = Mood.parse(value)
+            elif field not in RECORD_FIELDS:
+                continue
+            setattr(self, field, value)
+
+    # --- Mapping protocol ---
+
+    def __getitem__(self, field: str) -> Any:
+        if field not in RECORD_FIELDS:
+            raise KeyError(field)
+        value = getattr(self, field)
+        if field in TIMESTAMP_FIELDS:
+            return to_iso(value)
+        if field == 'mood':
+            return value.label
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"UserRecord({self.to_dict()!r})"
+
+
+RECORD_FIELDS = frozenset(UserRecord.__slots__)
+_raw_values = attrgetter(*UserRecord.__slots__)
+
+
+def raw_to_dict(raw: Tuple) -> Dict:
+    """ערכים גולמיים (מ-raw) למילון בפורמט הקובץ"""
+    data = dict(zip(UserRecord.__slots__, raw))
+    for field in TIMESTAMP_FIELDS:
+        data[field] = to_iso(data[field])
+    data['mood'] = Mood(data['mood']).label
+    return data
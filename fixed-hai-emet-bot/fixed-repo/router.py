@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Router
+ניתוב פקודות, כפתורים ו-callbacks - טבלת ניתוב שנבנית פעם אחת
+
+Handlers declare what they answer to with decorators: slash commands,
+reply-keyboard button labels, and callback-data prefixes. The tables are
+frozen on first dispatch (or by compile()), so a message costs one dict
+lookup and nothing is rebuilt per update.
+
+Callback data is structured as "prefix:value" (e.g. "emotion:happy") and
+the handler receives the value. The older "prefix_value" form that is
+still on keyboards sent before the change is parsed the same way.
+"""
+
+import logging
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, filters
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = ':'
+LEGACY_SEPARATOR = '_'
+
+# Telegram rejects callback data longer than this
+MAX_CALLBACK_BYTES = 64
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+def callback_data(prefix: str, value: str) -> str:
+    """בניית callback data מובנה"""
+    data = f"{prefix}{SEPARATOR}{value}"
+    if len(data.encode('utf-8')) > MAX_CALLBACK_BYTES:
+        raise ValueError(f"Callback data longer than {MAX_CALLBACK_BYTES} bytes: {data!r}")
+    return data
+
+
+def parse_callback(data: str) -> Tuple[str, str]:
+    """פירוק callback data ל-(קידומת, ערך) - תומך גם בפורמט הישן"""
+    prefix, separator, value = data.partition(SEPARATOR)
+    if not separator:
+        prefix, _, value = data.partition(LEGACY_SEPARATOR)
+    return prefix, value
+
+
+class Router:
+    """טבלת ניתוב לבוט"""
+
+    def __init__(self):
+        self._commands: Dict[str, Handler] = {}
+        self._buttons: Dict[str, Handler] = {}
+        self._callbacks: Dict[str, Handler] = {}
+        self._text_fallback: Optional[Handler] = None
+        self._compiled = False
+
+        # Frozen views, set by compile()
+        self.commands: Mapping[str, Handler] = MappingProxyType({})
+        self.buttons: Mapping[str, Handler] = MappingProxyType({})
+        self.callbacks: Mapping[str, Handler] = MappingProxyType({})
+
+    def _add(self, table: Dict[str, Handler], kind: str, key: str, handler: Handler):
+        if self._compiled:
+            raise RuntimeError(f"Router already compiled, cannot add {kind} {key!r}")
+        if key in table and table[key] is not handler:
+            raise ValueError(f"Duplicate {kind}: {key!r}")
+        table[key] = handler
+
+    # --- Registration ---
+
+    def command(self, *names: str):
+        """רישום handler לפקודות /name"""
+        def decorator(handler: Handler) -> Handler:
+            for name in names:
+                self._add(self._commands, 'command', name, handler)
+            return handler
+        return decorator
+
+    def button(self, *labels: str):
+        """רישום handler לתוויות כפתורי המקלדת"""
+        def decorator(handler: Handler) -> Handler:
+            for label in labels:
+                self._add(self._buttons, 'button', label, handler)
+            return handler
+        return decorator
+
+    def callback(self, *prefixes: str):
+        """רישום handler לקידומות callback - handler(update, context, value)"""
+        def decorator(handler: Handler) -> Handler:
+            for prefix in prefixes:
+                if SEPARATOR in prefix or LEGACY_SEPARATOR in prefix:
+                    raise ValueError(f"Callback prefix cannot contain a separator: {prefix!r}")
+                self._add(self._callbacks, 'callback prefix', prefix, handler)
+            return handler
+        return decorator
+
+    def text(self, handler: Handler) -> Handler:
+        """handler לטקסט שאינו כפתור"""
+        if self._compiled:
+            raise RuntimeError("Router already compiled, cannot set the text handler")
+        self._text_fallback = handler
+        return handler
+
+    def compile(self):
+        """הקפאת טבלאות הניתוב"""
+        if self._compiled:
+            return
+        self.commands = MappingProxyType(dict(self._commands))
+        self.buttons = MappingProxyType(dict(self._buttons))
+        self.callbacks = MappingProxyType(dict(self._callbacks))
+        self._compiled = True
+        logger.info(
+            f"🧭 Router: {len(self.commands)} commands, {len(self.buttons)} buttons, "
+            f"{len(self.callbacks)} callback prefixes"
+        )
+
+    # --- Dispatch ---
+
+    async def dispatch_text(self, update: Update, context: Any):
+        """ניתוב הודעת טקסט - כפתור או ברירת מחדל"""
+        if not self._compiled:
+            self.compile()
+        handler = self.buttons.get(update.message.text)
+        if handler is not None:
+            return await handler(update, context)
+        if self._text_fallback is not None:
+            return await self._text_fallback(update, context)
+        return None
+
+    async def dispatch_callback(self, update: Update, context: Any) -> bool:
+        """ניתוב callback - מחזיר False כשאין handler"""
+        if not self._compiled:
+            self.compile()
+        prefix, value = parse_callback(update.callback_query.data or '')
+        handler = self.callbacks.get(prefix)
+        if handler is None:
+            logger.debug(f"Unrouted callback data: {update.callback_query.data!r}")
+            return False
+        await handler(update, context, value)
+        return True
+
+    def install(self, application: Application, on_text: Handler, on_callback: Handler):
+        """רישום ה-handlers באפליקציה"""
+        self.compile()
+        # One CommandHandler per handler, covering all of its names
+        names: Dict[Handler, List[str]] = {}
+        for name, handler in self.commands.items():
+            names.setdefault(handler, []).append(name)
+        for handler, handler_names in names.items():
+            application.add_handler(CommandHandler(handler_names, handler))
+        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, on_text))
+        application.add_handler(CallbackQueryHandler(on_callback))
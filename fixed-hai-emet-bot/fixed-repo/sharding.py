@@ -0,0 +1,563 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Sharded Workers
+מצב מרובה תהליכים - מפיץ עדכונים לפי משתמש ותהליכי עבודה עם מאגר נפרד
+
+A front dispatcher receives updates and routes each one by hash(user_id)
+to one of N worker processes, so every user always lands on the same
+worker. A worker runs the full bot (handlers, write-behind persistence,
+send scheduler) on its own shard of users, with its own users / history /
+broadcast files (users.shard0.json, users.shard1.json, ...) and an equal
+share of the global send rate.
+
+Global counters (users, messages, core beats, mood distribution, broadcast
+progress) are kept in a shared array, one row per shard. Each worker
+publishes its own row twice a second and /status sums the rows, using live
+values for its own. The same memory holds what the leaderboard needs
+across shards: a points histogram per shard, updated on every change, so
+/stats and /top rank a user against everyone, and each shard's top list
+with names, merged by /top. /broadcast is sent to every worker as a
+control message and each one broadcasts to its own users.
+
+    python sharding.py --shards 4                  # polling, N workers
+    python sharding.py --shards 4 --selftest 20000 # local run, no Telegram
+"""
+
+import os
+import sys
+import time
+import queue
+import random
+import signal
+import tempfile
+import asyncio
+import logging
+import argparse
+import multiprocessing
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from telegram import Bot, Update, User
+from telegram.ext import ExtBot
+
+from network import PooledRequest
+from records import Mood
+
+logger = logging.getLogger(__name__)
+
+# Broadcast progress published by every shard
+BROADCAST_FIELDS = ('position', 'sent', 'failed', 'blocked', 'skipped')
+
+# Counters summed across shards: HaiEmetEmotionSystem.shard_counters() and
+# the shard's broadcast progress
+COUNTER_FIELDS = (
+    'total_users',
+    'total_messages',
+    'core_beats',
+    'emotion_score_total',
+    *(f'mood_{mood.label}' for mood in Mood),
+    'broadcast_active',
+    *(f'broadcast_{field}' for field in BROADCAST_FIELDS)
+)
+
+# Leaderboard histogram: quantum points per bucket and buckets per shard;
+# points past the last bucket share it
+POINTS_BUCKET = 10
+POINTS_BUCKETS = 4096
+
+# Entries in each shard's published top list and bytes kept per name
+TOP_ENTRIES = 10
+NAME_BYTES = 64
+
+# Per-worker files, with the defaults bot.py uses
+SHARDED_FILES = {
+    'HAI_EMET_USERS_FILE': 'hai_emet_emotion_users.json',
+    'HAI_EMET_SQLITE_FILE': 'hai_emet_emotion_users.db',
+    'HAI_EMET_HISTORY_FILE': 'hai_emet_emotion_history.log',
+    'HAI_EMET_BROADCAST_FILE': 'hai_emet_broadcast.json',
+    'HAI_EMET_COUNTERS_FILE': 'hai_emet_counters.json'
+}
+
+# Seconds between a worker's counter publications
+PUBLISH_INTERVAL = 0.5
+
+# Update fields that carry the sending user
+USER_FIELDS = (
+    'message',
+    'edited_message',
+    'callback_query',
+    'inline_query',
+    'chosen_inline_result',
+    'shipping_query',
+    'pre_checkout_query',
+    'poll_answer',
+    'my_chat_member',
+    'chat_member',
+    'chat_join_request'
+)
+
+
+def shard_for(user_id: int, shards: int) -> int:
+    """הרסיס של משתמש"""
+    return hash(user_id) % shards
+
+
+def update_user_id(data: Dict) -> Optional[int]:
+    """מזהה המשתמש מתוך עדכון גולמי"""
+    for field in USER_FIELDS:
+        payload = data.get(field)
+        if not payload:
+            continue
+        sender = payload.get('from') or payload.get('user')
+        if sender:
+            return sender['id']
+        chat = payload.get('chat')
+        if chat:
+            return chat['id']
+    return None
+
+
+def shard_path(path: str, shard: int) -> str:
+    """נתיב קובץ של רסיס - users.json -> users.shard2.json"""
+    base, ext = os.path.splitext(path)
+    return f"{base}.shard{shard}{ext}"
+
+# ═══════════════════════════════════════════════════════════════════
+#                          SHARED COUNTERS
+# ═══════════════════════════════════════════════════════════════════
+
+class ShardStats:
+    """מונים גלובליים בזיכרון משותף - שורה לכל רסיס"""
+
+    def __init__(self, context, shards: int, fields: Iterable[str] = COUNTER_FIELDS):
+        self.fields = tuple(fields)
+        self.shards = shards
+        # Each row is written only by its own worker, so no lock is needed
+        self.values = context.Array('q', shards * len(self.fields), lock=False)
+        self.shard: Optional[int] = None
+
+        # Fenwick tree per shard over its points histogram
+        self.points = context.Array('q', shards * POINTS_BUCKETS, lock=False)
+
+        # Top list per shard: (user_id, points) pairs, points -1 past the end,
+        # and UTF-8 names; rewritten as a whole under the lock
+        self.top_lock = context.Lock()
+        self.top_entries = context.Array('q', shards * TOP_ENTRIES * 2, lock=False)
+        self.top_names = context.Array('c', shards * TOP_ENTRIES * NAME_BYTES, lock=False)
+        for index in range(shards * TOP_ENTRIES):
+            self.top_entries[2 * index + 1] = -1
+
+        # Every worker's update queue, for control messages
+        self.queues: List = []
+
+    def publish(self, counters: Dict[str, int], shard: Optional[int] = None):
+        """פרסום המונים של רסיס"""
+        shard = self.shard if shard is None else shard
+        base = shard * len(self.fields)
+        for offset, field in enumerate(self.fields):
+            self.values[base + offset] = int(counters.get(field, 0))
+
+    def row(self, shard: int) -> Dict[str, int]:
+        base = shard * len(self.fields)
+        return {field: self.values[base + offset] for offset, field in enumerate(self.fields)}
+
+    def totals(self, local: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """סכום כל הרסיסים - עם ערכים חיים לרסיס הנוכחי"""
+        totals = dict.fromkeys(self.fields, 0)
+        for shard in range(self.shards):
+            row = local if local is not None and shard == self.shard else self.row(shard)
+            for field in self.fields:
+                totals[field] += row.get(field, 0)
+        return totals
+
+    # --- Leaderboard ---
+
+    @staticmethod
+    def _bucket(points: int) -> int:
+        return min(max(points, 0) // POINTS_BUCKET, POINTS_BUCKETS - 1)
+
+    def _points_add(self, bucket: int, delta: int):
+        base = self.shard * POINTS_BUCKETS
+        i = bucket + 1
+        while i <= POINTS_BUCKETS:
+            self.points[base + i - 1] += delta
+            i += i & -i
+
+    def _points_prefix(self, shard: int, buckets: int) -> int:
+        # Users of a shard in buckets [0, buckets)
+        base = shard * POINTS_BUCKETS
+        total = 0
+        i = buckets
+        while i > 0:
+            total += self.points[base + i - 1]
+            i -= i & -i
+        return total
+
+    def load_points(self, points: Iterable[int]):
+        """בניית ההיסטוגרמה של הרסיס מכל הנקודות"""
+        tree = [0] * POINTS_BUCKETS
+        for value in points:
+            tree[self._bucket(value)] += 1
+        for i in range(1, POINTS_BUCKETS + 1):
+            parent = i + (i & -i)
+            if parent <= POINTS_BUCKETS:
+                tree[parent - 1] += tree[i - 1]
+        base = self.shard * POINTS_BUCKETS
+        self.points[base:base + POINTS_BUCKETS] = tree
+
+    def move_points(self, old: Optional[int], new: Optional[int]):
+        """משתמש עבר מ-old ל-new נקודות (None - נוסף או הוסר)"""
+        old_bucket = None if old is None else self._bucket(old)
+        new_bucket = None if new is None else self._bucket(new)
+        if old_bucket == new_bucket:
+            return
+        if old_bucket is not None:
+            self._points_add(old_bucket, -1)
+        if new_bucket is not None:
+            self._points_add(new_bucket, 1)
+
+    def users_above(self, points: int) -> int:
+        """משתמשים ברסיסים האחרים עם יותר נקודות - ברזולוציה של דלי"""
+        above = self._bucket(points) + 1
+        return sum(
+            self._points_prefix(shard, POINTS_BUCKETS) - self._points_prefix(shard, above)
+            for shard in range(self.shards)
+            if shard != self.shard
+        )
+
+    def publish_top(self, entries: List[Tuple[int, int, str]]):
+        """פרסום המובילים של הרסיס - (משתמש, נקודות, שם)"""
+        base = self.shard * TOP_ENTRIES
+        with self.top_lock:
+            for offset in range(TOP_ENTRIES):
+                user_id, points, name = entries[offset] if offset < len(entries) else (0, -1, '')
+                index = base + offset
+                self.top_entries[2 * index] = user_id
+                self.top_entries[2 * index + 1] = points
+                data = name.encode('utf-8')[:NAME_BYTES].decode('utf-8', 'ignore').encode('utf-8')
+                self.top_names[index * NAME_BYTES:(index + 1) * NAME_BYTES] = data.ljust(NAME_BYTES, b'\0')
+
+    def top(self, limit: int, local: Optional[List[Tuple[int, int, str]]] = None) -> List[Tuple[int, int, str]]:
+        """המובילים בכל הרסיסים - עם הרשימה החיה לרסיס הנוכחי"""
+        entries = list(local or [])
+        with self.top_lock:
+            for shard in range(self.shards):
+                if local is not None and shard == self.shard:
+                    continue
+                for index in range(shard * TOP_ENTRIES, (shard + 1) * TOP_ENTRIES):
+                    points = self.top_entries[2 * index + 1]
+                    if points < 0:
+                        break
+                    name = self.top_names[index * NAME_BYTES:(index + 1) * NAME_BYTES].rstrip(b'\0')
+                    entries.append((self.top_entries[2 * index], points, name.decode('utf-8', 'ignore')))
+        entries.sort(key=lambda entry: (-entry[1], entry[0]))
+        return entries[:limit]
+
+    # --- Control messages ---
+
+    def send_all(self, message: Dict):
+        """הודעת בקרה לכל הרסיסים (שידור, ביטול)"""
+        for updates in self.queues:
+            updates.put(message)
+
+# ═══════════════════════════════════════════════════════════════════
+#                              WORKER
+# ═══════════════════════════════════════════════════════════════════
+
+class RecordingBot(ExtBot):
+    """בוט מקומי - רושם שליחות במקום לפנות לטלגרם (להרצה מקומית)"""
+
+    async def get_me(self, *args, **kwargs) -> User:
+        self._bot_user = User(id=1, is_bot=True, first_name='Hai-Emet', username='HaiEmetEmotionBot')
+        return self._bot_user
+
+    async def send_message(self, chat_id, text, *args, **kwargs):
+        return True
+
+    async def edit_message_text(self, text, *args, **kwargs):
+        return True
+
+    async def answer_callback_query(self, callback_query_id, *args, **kwargs):
+        return True
+
+
+def shard_environment(shard: int, shards: int, dry_run: bool):
+    """הגדרות הרסיס - קבצים נפרדים וחלק שווה מקצב השליחה"""
+    for variable, default in SHARDED_FILES.items():
+        os.environ[variable] = shard_path(os.getenv(variable, default), shard)
+    for variable, default in (('HAI_EMET_SEND_RATE', '30'), ('HAI_EMET_BROADCAST_RATE', '20')):
+        os.environ[variable] = str(float(os.getenv(variable, default)) / shards)
+    metrics_port = int(os.getenv('HAI_EMET_METRICS_PORT', '9100'))
+    os.environ['HAI_EMET_METRICS_PORT'] = '0' if dry_run or not metrics_port else str(metrics_port + 1 + shard)
+
+
+def worker_main(shard: int, shards: int, updates, stats: ShardStats, dry_run: bool):
+    """תהליך עבודה - הבוט המלא על רסיס אחד"""
+    shard_environment(shard, shards, dry_run)
+    import bot
+    stats.shard = shard
+    bot.hai_emet.attach_cluster(stats)
+    _publish_once(bot, stats)
+    asyncio.run(_serve(bot, updates, stats, dry_run))
+
+
+def shard_counters(bot) -> Dict[str, int]:
+    """המונים שהרסיס מפרסם - מוני המערכת והתקדמות השידור"""
+    counters = bot.hai_emet.shard_counters()
+    state = bot.broadcaster.state or {}
+    counters['broadcast_active'] = int(bot.broadcaster.active)
+    for field in BROADCAST_FIELDS:
+        counters[f'broadcast_{field}'] = state.get(field, 0)
+    return counters
+
+
+def _publish_once(bot, stats: ShardStats):
+    stats.publish(shard_counters(bot))
+    stats.publish_top(bot.hai_emet.local_top(TOP_ENTRIES))
+
+
+async def _publish(bot, stats: ShardStats):
+    while True:
+        await asyncio.sleep(PUBLISH_INTERVAL)
+        _publish_once(bot, stats)
+
+
+def _control(bot, application, message: Dict):
+    """הודעת בקרה מרסיס אחר - פועלת על המשתמשים של הרסיס הזה"""
+    if message['control'] == 'broadcast':
+        try:
+            bot.start_broadcast(application.bot, message['text'], message['admin_chat_id'])
+        except RuntimeError as e:
+            logger.warning(f"Broadcast not started: {e}")
+    elif message['control'] == 'broadcast_cancel':
+        bot.broadcaster.cancel()
+
+
+async def _serve(bot, updates, stats: ShardStats, dry_run: bool):
+    application = bot.build_application(RecordingBot(bot.TELEGRAM_TOKEN) if dry_run else None)
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+    publisher = asyncio.get_running_loop().create_task(_publish(bot, stats))
+    try:
+        running = True
+        while running:
+            # One thread hop per burst, then drain what is already queued
+            batch = [await asyncio.to_thread(updates.get)]
+            try:
+                while len(batch) < 256:
+                    batch.append(updates.get_nowait())
+            except queue.Empty:
+                pass
+            for data in batch:
+                if data is None:
+                    running = False
+                    break
+                if 'control' in data:
+                    _control(bot, application, data)
+                    continue
+                await application.update_queue.put(Update.de_json(data, application.bot))
+        # Let the handlers finish what was queued before stop() drops it
+        await application.update_queue.join()
+    finally:
+        publisher.cancel()
+        if application.running:
+            await application.stop()
+            await application.post_stop(application)
+        await application.shutdown()
+        await application.post_shutdown(application)
+        _publish_once(bot, stats)
+
+# ═══════════════════════════════════════════════════════════════════
+#                            DISPATCHER
+# ═══════════════════════════════════════════════════════════════════
+
+class ShardDispatcher:
+    """מפיץ עדכונים - כל משתמש לרסיס קבוע"""
+
+    def __init__(self, shards: int, dry_run: bool = False):
+        # Spawned, not forked: each worker imports bot.py with its own shard files
+        context = multiprocessing.get_context('spawn')
+        self.shards = shards
+        self.stats = ShardStats(context, shards)
+        self.queues = [context.Queue() for _ in range(shards)]
+        self.stats.queues = self.queues
+        self.processes = [
+            context.Process(
+                target=worker_main,
+                args=(shard, shards, self.queues[shard], self.stats, dry_run),
+                name=f'hai-emet-shard-{shard}'
+            )
+            for shard in range(shards)
+        ]
+        self.dispatched = [0] * shards
+        self.unrouted = 0
+
+    def start(self):
+        """הפעלת תהליכי העבודה"""
+        for process in self.processes:
+            process.start()
+        logger.info(f"🧩 Started {self.shards} shard workers")
+
+    def dispatch(self, data: Dict) -> int:
+        """ניתוב עדכון גולמי לרסיס שלו"""
+        user_id = update_user_id(data)
+        if user_id is None:
+            # Updates without a user (channel posts, polls) go to shard 0
+            self.unrouted += 1
+            shard = 0
+        else:
+            shard = shard_for(user_id, self.shards)
+        self.queues[shard].put(data)
+        self.dispatched[shard] += 1
+        return shard
+
+    def stop(self, timeout: float = 60.0):
+        """עצירה - כל תהליך מסיים את התור שלו ושומר"""
+        for updates in self.queues:
+            updates.put(None)
+        deadline = time.monotonic() + timeout
+        for process in self.processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"{process.name} did not stop in time, terminating")
+                process.terminate()
+                process.join()
+        for process, updates in zip(self.processes, self.queues):
+            if process.exitcode:
+                # Nobody will read what is left; do not block exit flushing it
+                logger.error(f"{process.name} exited with code {process.exitcode}")
+                updates.cancel_join_thread()
+        logger.info(f"🧩 Shard workers stopped, dispatched per shard: {self.dispatched}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """מונים מצטברים ופיזור העדכונים"""
+        stats: Dict[str, Any] = self.stats.totals()
+        stats['dispatched'] = list(self.dispatched)
+        stats['unrouted'] = self.unrouted
+        stats['alive'] = sum(process.is_alive() for process in self.processes)
+        return stats
+
+    async def run_polling(self, token: str, poll_timeout: int = 30):
+        """קבלת עדכונים מטלגרם והפצתם עד לאות עצירה"""
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig_name in ('SIGINT', 'SIGTERM'):
+            try:
+                loop.add_signal_handler(getattr(signal, sig_name), stop_event.set)
+            except (NotImplementedError, AttributeError):
+                pass
+
+        api_url = os.getenv('HAI_EMET_BOT_API_URL', '').rstrip('/')
+        bot_kwargs = {'base_url': f"{api_url}/bot", 'base_file_url': f"{api_url}/file/bot"} if api_url else {}
+        bot_kwargs['get_updates_request'] = PooledRequest.from_env('poll', pool_size=1)
+        async with Bot(token, **bot_kwargs) as telegram_bot:
+            await telegram_bot.delete_webhook()
+            offset = None
+            while not stop_event.is_set():
+                fetch = asyncio.ensure_future(telegram_bot.get_updates(
+                    offset=offset,
+                    timeout=poll_timeout,
+                    read_timeout=poll_timeout + 10,
+                    allowed_updates=Update.ALL_TYPES
+                ))
+                stopped = asyncio.ensure_future(stop_event.wait())
+                await asyncio.wait((fetch, stopped), return_when=asyncio.FIRST_COMPLETED)
+                if not fetch.done():
+                    fetch.cancel()
+                    break
+                stopped.cancel()
+                try:
+                    received = fetch.result()
+                except Exception as e:
+                    logger.warning(f"getUpdates failed: {e}")
+                    await asyncio.sleep(1)
+                    continue
+                for update in received:
+                    self.dispatch(update.to_dict())
+                    offset = update.update_id + 1
+            if offset is not None:
+                # Confirm the last batch so a restart does not replay it
+                await telegram_bot.get_updates(offset=offset, timeout=0)
+
+# ═══════════════════════════════════════════════════════════════════
+#                             SELFTEST
+# ═══════════════════════════════════════════════════════════════════
+
+def synthetic_update(update_id: int, user_id: int, text: str) -> Dict:
+    """עדכון הודעה גולמי כפי שטלגרם שולחת"""
+    message = {
+        'message_id': update_id,
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'},
+        'text': text
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+    return {'update_id': update_id, 'message': message}
+
+
+def selftest(shards: int, updates: int, users: int, seed: int) -> bool:
+    """הרצה מקומית - עדכונים סינתטיים ובדיקת המונים המצטברים"""
+    rng = random.Random(seed)
+    # Keep the run away from the real data files
+    directory = tempfile.mkdtemp(prefix='hai-emet-shards-')
+    for variable, default in SHARDED_FILES.items():
+        os.environ[variable] = os.path.join(directory, default)
+    # Nothing reaches Telegram, so the send limits would only slow the run down
+    os.environ['HAI_EMET_SEND_RATE'] = os.environ['HAI_EMET_CHAT_SEND_RATE'] = '1000000'
+    dispatcher = ShardDispatcher(shards, dry_run=True)
+    dispatcher.start()
+
+    registered = set()
+    messages = 0
+    started = time.perf_counter()
+    for update_id in range(1, updates + 1):
+        user_id = rng.randint(1, users)
+        if user_id not in registered:
+            registered.add(user_id)
+            dispatcher.dispatch(synthetic_update(update_id, user_id, '/start'))
+        else:
+            messages += 1
+            dispatcher.dispatch(synthetic_update(update_id, user_id, 'היום אני ממש שמח'))
+    dispatcher.stop()
+    elapsed = time.perf_counter() - started
+
+    stats = dispatcher.get_stats()
+    print(f"shards: {shards}, updates: {updates} in {elapsed:.2f}s ({updates / elapsed:.0f}/s)")
+    print(f"dispatched per shard: {stats['dispatched']}")
+    print(f"total_users: {stats['total_users']} (expected {len(registered)})")
+    print(f"total_messages: {stats['total_messages']} (expected {messages})")
+    print(f"mood: {[stats[f'mood_{mood.label}'] for mood in Mood]}")
+    return stats['total_users'] == len(registered) and stats['total_messages'] == messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', type=int, default=int(os.getenv('HAI_EMET_SHARDS', '4')))
+    parser.add_argument('--selftest', type=int, metavar='UPDATES', help='run locally on synthetic updates')
+    parser.add_argument('--users', type=int, default=5000, help='distinct users in the selftest')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    if args.selftest:
+        sys.exit(0 if selftest(args.shards, args.selftest, args.users, args.seed) else 1)
+
+    token = os.getenv('TELEGRAM_BOT_TOKEN')
+    if not token:
+        parser.error("sharded mode needs TELEGRAM_BOT_TOKEN")
+    dispatcher = ShardDispatcher(args.shards)
+    dispatcher.start()
+    try:
+        asyncio.run(dispatcher.run_polling(token))
+    finally:
+        dispatcher.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Binary User Snapshot
+צילום מצב בינארי של המשתמשים - טבלה ברוחב קבוע, ממופה לזיכרון
+
+Layout (little endian):
+
+    header   magic, version, record size, user count, journal seq, heap offset
+    ids      int64 per user, sorted ascending
+    records  one fixed-width record per user, in id order
+    heap     UTF-8 usernames and first names, referenced by (offset, length)
+
+The file is memory-mapped, so opening it costs the same at any size: a
+lookup is a binary search over the id column and decodes one record.
+Rewrites copy unchanged records as raw slices, so only changed users are
+re-encoded, and a changed user keeps the heap strings it already had.
+Strings left behind by renames are counted in the header; once they make
+up half of the heap it is rebuilt from the live records.
+
+JSON import/export for tooling:
+
+    python snapshot.py import hai_emet_emotion_users.json users.snapshot.bin
+    python snapshot.py export users.snapshot.bin users.json
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+import tempfile
+from bisect import bisect_left
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from records import Mood, UserRecord, to_iso
+
+MAGIC = b'HAIEMETS'
+VERSION = 1
+
+# magic, version, record size, stale heap bytes, user count, journal seq, heap offset
+HEADER = struct.Struct('<8sHHIQQQ')
+
+# username (offset, length), first name (offset, length), joined, last_seen,
+# quantum_points, cosmic_level, total_interactions, total_messages,
+# emotion_score, mood, flags
+RECORD = struct.Struct('<IHIHqqqiqqiBB')
+ID = struct.Struct('<q')
+
+FLAG_BLOCKED = 1
+
+# Longest string stored on the heap (the length field is 16 bits)
+MAX_STRING = 0xFFFF
+
+# Record column of each user field (strings are resolved through the heap)
+COLUMNS = {
+    'username': 0,
+    'first_name': 2,
+    'joined': 4,
+    'last_seen': 5,
+    'quantum_points': 6,
+    'cosmic_level': 7,
+    'total_interactions': 8,
+    'total_messages': 9,
+    'emotion_score': 10,
+    'mood': 11,
+    'blocked': 12
+}
+
+MOOD_LABELS = tuple(mood.label for mood in Mood)
+
+# A record as plain values: username, first_name, joined, last_seen,
+# quantum_points, cosmic_level, total_interactions, total_messages,
+# emotion_score, mood, blocked
+Row = Tuple[str, str, int, int, int, int, int, int, int, int, bool]
+
+
+def record_row(record: UserRecord) -> Row:
+    """רשומה לשורה - ערכים פשוטים שאפשר לקודד בתהליכון אחר"""
+    return (
+        record.username,
+        record.first_name,
+        record.joined,
+        record.last_seen,
+        record.quantum_points,
+        record.cosmic_level,
+        record.total_interactions,
+        record.total_messages,
+        record.emotion_score,
+        int(record.mood),
+        bool(record.blocked)
+    )
+
+
+class SnapshotReader:
+    """קורא צילום מצב ממופה - פענוח רשומה רק בגישה"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, version, record_size, stale, count, seq, heap_offset = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            view.release()
+            self._mmap.close()
+            raise ValueError(f"Not a version {VERSION} user snapshot: {path}")
+        ids_end = HEADER.size + count * ID.size
+        if heap_offset != ids_end + count * RECORD.size or heap_offset > len(view):
+            view.release()
+            self._mmap.close()
+            raise ValueError(f"Truncated user snapshot: {path}")
+
+        self.count = count
+        self.seq = seq
+        self.stale = stale
+        self._view = view
+        self.id_bytes = view[HEADER.size:ids_end]
+        self.ids = self.id_bytes.cast('q')
+        self.records = view[ids_end:heap_offset]
+        self.heap = view[heap_offset:]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def find(self, user_id: int) -> int:
+        """מיקום המשתמש בטבלה, או 1- כשאינו קיים"""
+        index = bisect_left(self.ids, user_id)
+        if index < self.count and self.ids[index] == user_id:
+            return index
+        return -1
+
+    def _string(self, offset: int, length: int) -> str:
+        return str(self.heap[offset:offset + length], 'utf-8')
+
+    def record(self, index: int) -> UserRecord:
+        """פענוח רשומה אחת"""
+        (name_off, name_len, first_off, first_len, joined, last_seen, points, level,
+         interactions, messages, emotion, mood, flags) = RECORD.unpack_from(self.records, index * RECORD.size)
+        return UserRecord(
+            self._string(name_off, name_len),
+            self._string(first_off, first_len),
+            joined,
+            points,
+            level,
+            interactions,
+            messages,
+            emotion,
+            Mood(mood),
+            last_seen,
+            bool(flags & FLAG_BLOCKED)
+        )
+
+    def iter_fields(self, fields: Tuple[str, ...]) -> Iterator[Tuple]:
+        """מעבר על שדות נבחרים בכל הטבלה - (user_id, ערכים...) בפורמט המילון"""
+        getters = [self._field_getter(field) for field in fields]
+        ids = self.ids
+        for index, row in enumerate(RECORD.iter_unpack(self.records)):
+            yield (ids[index], *[get(row) for get in getters])
+
+    def _field_getter(self, field: str) -> Callable[[tuple], Any]:
+        column = COLUMNS[field]
+        if field in ('username', 'first_name'):
+            return lambda row: self._string(row[column], row[column + 1])
+        if field in ('joined', 'last_seen'):
+            return lambda row: to_iso(row[column])
+        if field == 'mood':
+            return lambda row: MOOD_LABELS[row[column]]
+        if field == 'blocked':
+            return lambda row: bool(row[column] & FLAG_BLOCKED)
+        return itemgetter(column)
+
+    def close(self):
+        """שחרור המיפוי"""
+        self.ids.release()
+        self.id_bytes.release()
+        self.records.release()
+        self.heap.release()
+        self._view.release()
+        self._mmap.close()
+
+
+def _encode_string(value: str) -> bytes:
+    data = (value or '').encode('utf-8')
+    if len(data) > MAX_STRING:
+        data = data[:MAX_STRING].decode('utf-8', 'ignore').encode('utf-8')
+    return data
+
+
+def _rebuild_heap(records: bytearray, heap: bytearray) -> bytearray:
+    """בניית ערימה חדשה רק מהמחרוזות שבשימוש - מעדכן את ההפניות במקום"""
+    fresh = bytearray()
+    strings: Dict[bytes, Tuple[int, int]] = {}
+
+    def intern(offset: int, length: int) -> Tuple[int, int]:
+        data = bytes(heap[offset:offset + length])
+        location = strings.get(data)
+        if location is None:
+            location = strings[data] = (len(fresh), len(data))
+            fresh.extend(data)
+        return location
+
+    for index, row in enumerate(RECORD.iter_unpack(records)):
+        RECORD.pack_into(
+            records, index * RECORD.size,
+            *intern(row[0], row[1]), *intern(row[2], row[3]), *row[4:]
+        )
+    return fresh
+
+
+def write_snapshot(
+    path: str,
+    rows: Dict[int, Row],
+    seq: int,
+    base: Optional[SnapshotReader] = None
+) -> int:
+    """כתיבת צילום מצב - הרשומות מ-base עם rows מעליהן; מחזיר בתים שנכתבו"""
+    heap = bytearray(base.heap) if base is not None else bytearray()
+    stale = base.stale if base is not None else 0
+    strings: Dict[bytes, Tuple[int, int]] = {}
+
+    def place(value: str, old: Optional[Tuple[int, int]]) -> Tuple[int, int]:
+        nonlocal stale
+        data = _encode_string(value)
+        if old is not None:
+            # Unchanged strings keep their place on the heap
+            if heap[old[0]:old[0] + old[1]] == data:
+                return old
+            stale += old[1]
+        location = strings.get(data)
+        if location is None:
+            location = strings[data] = (len(heap), len(data))
+            heap.extend(data)
+        return location
+
+    def encode(row: Row, old: Optional[tuple]) -> bytes:
+        username, first_name, joined, last_seen, points, level, interactions, messages, emotion, mood, blocked = row
+        return RECORD.pack(
+            *place(username, old[0:2] if old else None),
+            *place(first_name, old[2:4] if old else None),
+            joined, last_seen, points, level, interactions, messages, emotion, mood,
+            FLAG_BLOCKED if blocked else 0
+        )
+
+    ids = bytearray()
+    records = bytearray()
+    position = 0
+    base_count = base.count if base is not None else 0
+    for user_id in sorted(rows):
+        index = bisect_left(base.ids, user_id, position) if base is not None else 0
+        # Unchanged users between the previous change and this one are copied as is
+        if index > position:
+            ids += base.id_bytes[position * ID.size:index * ID.size]
+            records += base.records[position * RECORD.size:index * RECORD.size]
+        old = None
+        if index < base_count and base.ids[index] == user_id:
+            old = RECORD.unpack_from(base.records, index * RECORD.size)
+            position = index + 1
+        else:
+            position = index
+        ids += ID.pack(user_id)
+        records += encode(rows[user_id], old)
+    if position < base_count:
+        ids += base.id_bytes[position * ID.size:base_count * ID.size]
+        records += base.records[position * RECORD.size:base_count * RECORD.size]
+
+    if stale * 2 > len(heap):
+        heap = _rebuild_heap(records, heap)
+        stale = 0
+
+    count = len(ids) // ID.size
+    heap_offset = HEADER.size + len(ids) + len(records)
+    header = HEADER.pack(MAGIC, VERSION, RECORD.size, min(stale, 0xFFFFFFFF), count, seq, heap_offset)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', suffix='.bin', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(ids)
+            f.write(records)
+            f.write(heap)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return heap_offset + len(heap)
+
+
+def rows_from_json(users: Dict[str, Dict]) -> Dict[int, Row]:
+    """המרת מילון משתמשים בפורמט JSON לשורות"""
+    return {int(user_id): record_row(UserRecord.from_dict(data)) for user_id, data in users.items()}
+
+
+def export_json(reader: SnapshotReader) -> Dict[str, Dict]:
+    """המרת צילום מצב למילון בפורמט JSON"""
+    return {str(reader.ids[index]): reader.record(index).to_dict() for index in range(reader.count)}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] not in ('import', 'export'):
+        print("Usage: python snapshot.py import <users.json> <snapshot.bin>")
+        print("       python snapshot.py export <snapshot.bin> <users.json>")
+        sys.exit(1)
+    command, source, target = sys.argv[1:]
+    if command == 'import':
+        with open(source, 'r', encoding='utf-8') as f:
+            users = json.load(f)
+        size = write_snapshot(target, rows_from_json(users), 0)
+        print(f"✅ Wrote {len(users)} users to {target} ({size} bytes)")
+    else:
+        reader = SnapshotReader(source)
+        with open(target, 'w', encoding='utf-8') as f:
+            json.dump(export_json(reader), f, ensure_ascii=False, indent=2)
+        print(f"✅ Exported {reader.count} users to {target}")
+        reader.close()
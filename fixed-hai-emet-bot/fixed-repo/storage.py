@@ -0,0 +1,958 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - User Storage
+אחסון משתמשים - ממשק אחיד עם מימושי JSON, יומן שינויים, צילום בינארי, SQLite ושכבות חם/קר
+
+Every backend exposes the same small interface (get / add / update / count /
+iterate) and persists through the write-behind writer, so mutations never
+block the event loop on disk I/O. The tiered backend keeps recently active
+users in memory up to a cap and reads everyone else from SQLite on access.
+
+One-shot migration of an existing JSON file into SQLite:
+
+    python storage.py migrate hai_emet_emotion_users.json hai_emet_users.db
+
+Export of the binary backend (snapshot plus journal tail) to JSON:
+
+    python storage.py export hai_emet_emotion_users.json users-export.json
+"""
+
+import os
+import sys
+import json
+import heapq
+import sqlite3
+import logging
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from persistence import WriteBehindWriter, atomic_write_json
+from records import UserRecord, raw_to_dict
+from snapshot import SnapshotReader, record_row, rows_from_json, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Column order of a user record, shared by every backend
+USER_FIELDS = (
+    'username',
+    'first_name',
+    'joined',
+    'quantum_points',
+    'cosmic_level',
+    'total_interactions',
+    'total_messages',
+    'emotion_score',
+    'mood',
+    'last_seen',
+    'blocked'
+)
+
+# Values for fields missing from older files and registrations
+FIELD_DEFAULTS = {'blocked': False}
+
+# ═══════════════════════════════════════════════════════════════════
+#                          STORE INTERFACE
+# ═══════════════════════════════════════════════════════════════════
+
+class UserStore:
+    """ממשק אחסון משתמשים"""
+
+    def __init__(self, interval: float = 5.0, threshold: int = 500):
+        self.writer = WriteBehindWriter(
+            self._write,
+            snapshot=self._snapshot,
+            interval=interval,
+            threshold=threshold
+        )
+        # Bumped on every add/update; users never changed since load are at 0
+        self.versions: Dict[int, int] = {}
+        # Counted by backends that keep only part of the users in memory
+        self.faults = 0
+        self.evictions = 0
+
+    # --- Required by backends ---
+
+    def load(self) -> int:
+        """טעינת המאגר - מחזיר את מספר המשתמשים"""
+        raise NotImplementedError
+
+    def get(self, user_id: int) -> Optional[Dict]:
+        """קבלת רשומת משתמש"""
+        raise NotImplementedError
+
+    def add(self, user_id: int, record: Dict):
+        """הוספת משתמש חדש"""
+        raise NotImplementedError
+
+    def update(self, user_id: int, fields: Dict):
+        """עדכון שדות של משתמש קיים"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """מספר המשתמשים במאגר"""
+        raise NotImplementedError
+
+    def iter_users(self) -> Iterator[Tuple[int, Dict]]:
+        """מעבר על כל המשתמשים ללא העתקת המאגר"""
+        raise NotImplementedError
+
+    def iter_ordered(self, after: Optional[int] = None) -> Iterator[Tuple[int, Dict]]:
+        """מעבר לפי user_id בסדר עולה, החל מאחרי המזהה הנתון - להמשך מעבר אחרי הפעלה מחדש"""
+        raise NotImplementedError
+
+    def _snapshot(self):
+        raise NotImplementedError
+
+    def _write(self, data) -> int:
+        raise NotImplementedError
+
+    # --- Shared behaviour ---
+
+    def __contains__(self, user_id: int) -> bool:
+        return self.get(user_id) is not None
+
+    @property
+    def resident_users(self) -> int:
+        """רשומות המוחזקות בזיכרון"""
+        return self.count()
+
+    def version(self, user_id: int) -> int:
+        """גרסת הרשומה - משתנה בכל עדכון"""
+        return self.versions.get(user_id, 0)
+
+    def _touch(self, user_id: int):
+        """סימון שינוי - גרסה חדשה ושמירה ברקע"""
+        self.versions[user_id] = self.versions.get(user_id, 0) + 1
+        self.writer.mark_dirty(user_id)
+
+    def iter_fields(self, *fields: str) -> Iterator[Tuple]:
+        """מעבר על שדות נבחרים - (user_id, ערכים...) בפורמט המילון"""
+        for user_id, record in self.iter_users():
+            yield (user_id, *[record[field] for field in fields])
+
+    def flush_sync(self) -> bool:
+        """שמירה מיידית"""
+        return self.writer.flush_sync()
+
+    async def start(self):
+        """הפעלת שמירה ברקע"""
+        self.writer.start()
+
+    async def stop(self):
+        """עצירת שמירה ברקע ושמירה אחרונה"""
+        await self.writer.stop()
+
+    def close(self):
+        """סגירת המאגר"""
+        self.flush_sync()
+
+    def get_stats(self) -> Dict:
+        """סטטיסטיקות אחסון"""
+        stats = self.writer.get_stats()
+        stats['backend'] = self.backend
+        stats['users'] = self.count()
+        return stats
+
+# ═══════════════════════════════════════════════════════════════════
+#                           JSON BACKEND
+# ═══════════════════════════════════════════════════════════════════
+
+class JsonUserStore(UserStore):
+    """אחסון בקובץ JSON - כל המשתמשים בזיכרון"""
+
+    backend = 'json'
+
+    def __init__(self, path: str, interval: float = 5.0, threshold: int = 500):
+        super().__init__(interval, threshold)
+        self.path = path
+        self.users: Dict[int, UserRecord] = {}
+
+    def _load_users(self, data: Dict[str, Dict]) -> Dict[int, UserRecord]:
+        return {int(user_id): UserRecord.from_dict(record) for user_id, record in data.items()}
+
+    def _dump_users(self) -> Dict[int, Tuple]:
+        # Runs on the event loop: copy raw slot values only and leave the
+        # ISO / JSON conversion to the writer thread
+        return {user_id: record.raw() for user_id, record in self.users.items()}
+
+    @staticmethod
+    def _file_users(users: Dict[int, Tuple]) -> Dict[str, Dict]:
+        """ערכים גולמיים למילון בפורמט הקובץ - רץ בתהליכון הכתיבה"""
+        return {str(user_id): raw_to_dict(raw) for user_id, raw in users.items()}
+
+    def load(self) -> int:
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.users = self._load_users(json.load(f))
+        except Exception as e:
+            logger.error(f"Error loading users: {e}")
+            self.users = {}
+        return len(self.users)
+
+    def get(self, user_id: int) -> Optional[UserRecord]:
+        return self.users.get(user_id)
+
+    def add(self, user_id: int, record: Dict):
+        self.users[user_id] = UserRecord.from_dict(record)
+        self._touch(user_id)
+
+    def update(self, user_id: int, fields: Dict):
+        self.users[user_id].update(fields)
+        self._touch(user_id)
+
+    def count(self) -> int:
+        return len(self.users)
+
+    def iter_users(self) -> Iterator[Tuple[int, UserRecord]]:
+        # Copy only the ids, so users can register while a long pass runs
+        for user_id in list(self.users):
+            record = self.users.get(user_id)
+            if record is not None:
+                yield user_id, record
+
+    def iter_ordered(self, after: Optional[int] = None) -> Iterator[Tuple[int, UserRecord]]:
+        ids = sorted(self.users)
+        for user_id in ids[0 if after is None else bisect_right(ids, after):]:
+            record = self.users.get(user_id)
+            if record is not None:
+                yield user_id, record
+
+    def _snapshot(self):
+        return self._dump_users()
+
+    def _write(self, data) -> int:
+        return atomic_write_json(self.path, self._file_users(data))
+
+# ═══════════════════════════════════════════════════════════════════
+#                          SQLITE BACKEND
+# ═══════════════════════════════════════════════════════════════════
+
+SQL_CREATE = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL DEFAULT '',
+    first_name TEXT NOT NULL DEFAULT '',
+    joined TEXT NOT NULL,
+    quantum_points INTEGER NOT NULL DEFAULT 0,
+    cosmic_level INTEGER NOT NULL DEFAULT 1,
+    total_interactions INTEGER NOT NULL DEFAULT 0,
+    total_messages INTEGER NOT NULL DEFAULT 0,
+    emotion_score INTEGER NOT NULL DEFAULT 0,
+    mood TEXT NOT NULL DEFAULT 'neutral',
+    last_seen TEXT NOT NULL,
+    blocked INTEGER NOT NULL DEFAULT 0
+)
+"""
+# Columns added after the first release, applied to existing databases
+SQL_ADD_COLUMNS = {
+    'blocked': "ALTER TABLE users ADD COLUMN blocked INTEGER NOT NULL DEFAULT 0"
+}
+SQL_SELECT = f"SELECT {', '.join(USER_FIELDS)} FROM users WHERE user_id = ?"
+SQL_SELECT_ALL = f"SELECT user_id, {', '.join(USER_FIELDS)} FROM users ORDER BY user_id"
+SQL_SELECT_PAGE = f"SELECT user_id, {', '.join(USER_FIELDS)} FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?"
+SQL_COUNT = "SELECT COUNT(*) FROM users"
+SQL_UPSERT = (
+    f"INSERT INTO users (user_id, {', '.join(USER_FIELDS)}) "
+    f"VALUES ({', '.join('?' * (len(USER_FIELDS) + 1))}) "
+    f"ON CONFLICT(user_id) DO UPDATE SET "
+    + ', '.join(f"{field} = excluded.{field}" for field in USER_FIELDS)
+)
+
+
+class SqliteUserStore(UserStore):
+    """אחסון ב-SQLite במצב WAL - עדכון שורה לכל משתמש"""
+
+    backend = 'sqlite'
+
+    def __init__(self, path: str, interval: float = 5.0, threshold: int = 500):
+        super().__init__(interval, threshold)
+        self.path = path
+        self.rows_written = 0
+        self._count = 0
+
+        # Changes not yet committed: new users hold a full record, existing
+        # users only the fields that changed. In-flight changes stay visible
+        # to readers until their transaction has committed.
+        self._new: Dict[int, Dict] = {}
+        self._pending: Dict[int, Dict] = {}
+        self._inflight_new: Dict[int, Dict] = {}
+        self._inflight: Dict[int, Dict] = {}
+        self._lock = threading.Lock()
+
+        # Reads happen on the event loop, writes in the flush thread
+        self._reader = self._connect()
+        self._writer_conn = self._connect()
+        self._writer_conn.execute(SQL_CREATE)
+        columns = {row[1] for row in self._writer_conn.execute("PRAGMA table_info(users)")}
+        for column, sql in SQL_ADD_COLUMNS.items():
+            if column not in columns:
+                self._writer_conn.execute(sql)
+        self._writer_conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self) -> int:
+        self._count = self._reader.execute(SQL_COUNT).fetchone()[0]
+        return self._count
+
+    def _overlay(self, user_id: int) -> Tuple[Optional[Dict], List[Dict]]:
+        """שינויים שטרם נכתבו - רשומה חדשה ו/או שדות מעודכנים"""
+        with self._lock:
+            base = self._new.get(user_id) or self._inflight_new.get(user_id)
+            changes = [c for c in (self._inflight.get(user_id), self._pending.get(user_id)) if c]
+        return base, changes
+
+    def get(self, user_id: int) -> Optional[Dict]:
+        base, changes = self._overlay(user_id)
+        if base is not None:
+            record = dict(base)
+        else:
+            row = self._reader.execute(SQL_SELECT, (user_id,)).fetchone()
+            if row is None:
+                return None
+            record = dict(zip(USER_FIELDS, row))
+        for change in changes:
+            record.update(change)
+        return record
+
+    def add(self, user_id: int, record: Dict):
+        with self._lock:
+            self._new[user_id] = dict(record)
+            self._pending.pop(user_id, None)
+        self._count += 1
+        self._touch(user_id)
+
+    def update(self, user_id: int, fields: Dict):
+        with self._lock:
+            if user_id in self._new:
+                self._new[user_id].update(fields)
+            else:
+                self._pending.setdefault(user_id, {}).update(fields)
+        self._touch(user_id)
+
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def resident_users(self) -> int:
+        # Rows are read on demand; only uncommitted changes stay in memory
+        return 0
+
+    def iter_users(self) -> Iterator[Tuple[int, Dict]]:
+        # Stream committed rows, then users that exist only in memory
+        seen = set()
+        cursor = self._connect().execute(SQL_SELECT_ALL)
+        try:
+            for row in cursor:
+                user_id = row[0]
+                seen.add(user_id)
+                record = dict(zip(USER_FIELDS, row[1:]))
+                for change in self._overlay(user_id)[1]:
+                    record.update(change)
+                yield user_id, record
+        finally:
+            cursor.connection.close()
+        with self._lock:
+            extra = [uid for uid in (*self._inflight_new, *self._new) if uid not in seen]
+        for user_id in extra:
+            record = self.get(user_id)
+            if record is not None:
+                yield user_id, record
+
+    def _iter_rows(self, after: Optional[int], page: int = 1000) -> Iterator[Tuple[int, Dict]]:
+        """שורות שנכתבו, בדפים לפי user_id - בלי סמן פתוח בין דף לדף"""
+        cursor = -1 if after is None else after
+        while True:
+            rows = self._reader.execute(SQL_SELECT_PAGE, (cursor, page)).fetchall()
+            for row in rows:
+                record = dict(zip(USER_FIELDS, row[1:]))
+                for change in self._overlay(row[0])[1]:
+                    record.update(change)
+                yield row[0], record
+            if len(rows) < page:
+                return
+            cursor = rows[-1][0]
+
+    def iter_ordered(self, after: Optional[int] = None) -> Iterator[Tuple[int, Dict]]:
+        # Users not committed yet are merged in by id; one committed while the
+        # pass runs may show up on both sides and is yielded once
+        with self._lock:
+            extra = sorted(uid for uid in {*self._inflight_new, *self._new} if after is None or uid > after)
+        pending = ((uid, None) for uid in extra)
+        last = None
+        for user_id, record in heapq.merge(self._iter_rows(after), pending, key=lambda item: item[0]):
+            if user_id == last:
+                continue
+            if record is None:
+                # Read through the overlays without faulting into a hot tier
+                record = SqliteUserStore.get(self, user_id)
+                if record is None:
+                    continue
+            last = user_id
+            yield user_id, record
+
+    def _snapshot(self):
+        with self._lock:
+            self._inflight_new, self._new = self._new, {}
+            self._inflight, self._pending = self._pending, {}
+            return self._inflight_new, self._inflight
+
+    def _write(self, data) -> int:
+        new_users, changes = data
+        upserts = [
+            (user_id, *(record.get(field, FIELD_DEFAULTS.get(field)) for field in USER_FIELDS))
+            for user_id, record in new_users.items()
+        ]
+
+        # Group updates by the set of changed columns so each group runs as
+        # one prepared UPDATE through executemany
+        groups: Dict[Tuple[str, ...], List[tuple]] = {}
+        for user_id, fields in changes.items():
+            columns = tuple(sorted(f for f in fields if f in USER_FIELDS))
+            if columns:
+                groups.setdefault(columns, []).append(
+                    (*(fields[c] for c in columns), user_id)
+                )
+
+        conn = self._writer_conn
+        try:
+            with conn:
+                if upserts:
+                    conn.executemany(SQL_UPSERT, upserts)
+                for columns, params in groups.items():
+                    sql = f"UPDATE users SET {', '.join(f'{c} = ?' for c in columns)} WHERE user_id = ?"
+                    conn.executemany(sql, params)
+        except Exception:
+            # Put the changes back in front of anything written since
+            with self._lock:
+                new_users = self._inflight_new
+                new_users.update(self._new)
+                merged = self._inflight
+                for user_id, fields in self._pending.items():
+                    if user_id in new_users:
+                        new_users[user_id].update(fields)
+                    else:
+                        merged.setdefault(user_id, {}).update(fields)
+                self._new, self._pending = new_users, merged
+                self._inflight_new, self._inflight = {}, {}
+            raise
+
+        with self._lock:
+            self._inflight_new = {}
+            self._inflight = {}
+
+        rows = len(upserts) + sum(len(params) for params in groups.values())
+        self.rows_written += rows
+        return sum(len(repr(row)) for row in upserts) + sum(
+            len(repr(p)) for params in groups.values() for p in params
+        )
+
+    def close(self):
+        super().close()
+        self._reader.close()
+        self._writer_conn.close()
+
+    def get_stats(self) -> Dict:
+        stats = super().get_stats()
+        stats['rows_written'] = self.rows_written
+        return stats
+
+# ═══════════════════════════════════════════════════════════════════
+#                          JOURNAL BACKEND
+# ═══════════════════════════════════════════════════════════════════
+
+class JournalUserStore(JsonUserStore):
+    """אחסון ביומן שינויים בלבד-הוספה עם צילומי מצב דחוסים"""
+
+    backend = 'journal'
+
+    def __init__(
+        self,
+        path: str,
+        interval: float = 5.0,
+        threshold: int = 500,
+        compact_bytes: int = 8 * 1024 * 1024
+    ):
+        super().__init__(path, interval, threshold)
+        base = os.path.splitext(path)[0]
+        self.journal_path = base + '.journal'
+        self.snapshot_path = base + '.snapshot.json'
+        self.compact_bytes = compact_bytes
+
+        # Journal state
+        self._seq = 0
+        self._buffer: List[str] = []
+        self.journal_bytes = 0
+        self.compactions = 0
+        self.replayed = 0
+
+    def load(self) -> int:
+        snapshot_seq = self._load_snapshot()
+        self._seq = snapshot_seq
+
+        # Replay only the tail written after the snapshot
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r+b') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn last line from a crash mid-append - cut it off
+                        # so new entries start on a clean line
+                        logger.warning("Dropping truncated journal entry")
+                        f.truncate(self.journal_bytes)
+                        break
+                    self.journal_bytes += len(line)
+                    self._seq = max(self._seq, entry['s'])
+                    if entry['s'] <= snapshot_seq:
+                        continue
+                    self._apply(entry)
+                    self.replayed += 1
+        logger.info(
+            f"📜 Journal replay: snapshot seq {snapshot_seq}, {self.replayed} entries applied"
+        )
+        return self.count()
+
+    def _load_snapshot(self) -> int:
+        """טעינת צילום המצב - מחזיר את מספר הרצף שלו"""
+        try:
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                self.users = self._load_users(snapshot['users'])
+                return snapshot['seq']
+            if os.path.exists(self.path):
+                # First start on top of a plain JSON users file
+                super().load()
+        except Exception as e:
+            logger.error(f"Error loading snapshot: {e}")
+            self.users = {}
+        return 0
+
+    def _apply(self, entry: Dict):
+        user_id = int(entry['u'])
+        if entry['op'] == 'register':
+            self.users[user_id] = UserRecord.from_dict(entry['f'])
+        elif user_id in self.users:
+            self.users[user_id].update(entry['f'])
+
+    def _append(self, op: str, user_id: int, fields: Dict):
+        # Changed fields carry their new values so replay is idempotent
+        self._seq += 1
+        self._buffer.append(json.dumps(
+            {'s': self._seq, 'op': op, 'u': user_id, 'f': fields},
+            ensure_ascii=False,
+            separators=(',', ':')
+        ) + '\n')
+
+    def add(self, user_id: int, record: Dict):
+        self._append('register', user_id, record)
+        super().add(user_id, record)
+
+    def update(self, user_id: int, fields: Dict):
+        self._append('update', user_id, fields)
+        super().update(user_id, fields)
+
+    def _snapshot(self):
+        lines, self._buffer = self._buffer, []
+        users = None
+        if self.journal_bytes >= self.compact_bytes:
+            users = super()._snapshot()
+        return lines, self._seq, users
+
+    def _write(self, data) -> int:
+        lines, seq, users = data
+        payload = ''.join(lines).encode('utf-8')
+        try:
+            with open(self.journal_path, 'ab') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception:
+            self._buffer[0:0] = lines
+            raise
+        self.journal_bytes += len(payload)
+        written = len(payload)
+
+        if users is not None:
+            written += self._compact(users, seq)
+        return written
+
+    def _write_snapshot(self, users, seq: int) -> int:
+        return atomic_write_json(self.snapshot_path, {'seq': seq, 'users': self._file_users(users)})
+
+    def _compact(self, users, seq: int) -> int:
+        """דחיסה - צילום מצב חדש וקיצוץ היומן"""
+        written = self._write_snapshot(users, seq)
+        # Entries up to seq are covered by the snapshot; if we crash before
+        # truncating, replay skips them by sequence number
+        with open(self.journal_path, 'wb') as f:
+            os.fsync(f.fileno())
+        self.journal_bytes = 0
+        self.compactions += 1
+        logger.info(f"📜 Journal compacted at seq {seq} ({self.count()} users)")
+        return written
+
+    def get_stats(self) -> Dict:
+        stats = super().get_stats()
+        stats['journal_bytes'] = self.journal_bytes
+        stats['compactions'] = self.compactions
+        stats['replayed'] = self.replayed
+        return stats
+
+# ═══════════════════════════════════════════════════════════════════
+#                      BINARY SNAPSHOT BACKEND
+# ═══════════════════════════════════════════════════════════════════
+
+class BinaryUserStore(JournalUserStore):
+    """יומן שינויים מעל צילום מצב בינארי ממופה - טעינה עצלה של רשומות"""
+
+    backend = 'binary'
+
+    def __init__(
+        self,
+        path: str,
+        interval: float = 5.0,
+        threshold: int = 500,
+        compact_bytes: int = 8 * 1024 * 1024
+    ):
+        super().__init__(path, interval, threshold, compact_bytes)
+        self.json_snapshot_path = self.snapshot_path
+        self.snapshot_path = os.path.splitext(path)[0] + '.snapshot.bin'
+        self.base: Optional[SnapshotReader] = None
+
+        # self.users holds records decoded from the snapshot or changed since;
+        # users missing from the snapshot are tracked by id
+        self._new_ids = set()
+        # Users whose record differs from the snapshot; only these are
+        # encoded at compaction, read-only decodes are not
+        self._changed = set()
+        # Snapshot written by the last compaction, adopted on the event loop
+        # with the versions of the records it holds
+        self._written: Optional[Tuple[SnapshotReader, Dict[int, int]]] = None
+
+    def _load_snapshot(self) -> int:
+        self.users = {}
+        self._new_ids = set()
+        self._changed = set()
+        self._written = None
+        if self.base is not None:
+            self.base.close()
+            self.base = None
+        if not os.path.exists(self.snapshot_path):
+            self._import_json()
+        if os.path.exists(self.snapshot_path):
+            try:
+                self.base = SnapshotReader(self.snapshot_path)
+            except ValueError as e:
+                logger.error(f"Error loading snapshot: {e}")
+                return 0
+            logger.info(f"🗂️ Mapped binary snapshot: {self.base.count} users at seq {self.base.seq}")
+            return self.base.seq
+        return 0
+
+    def _import_json(self):
+        """יצירת צילום בינארי מצילום JSON של היומן או מקובץ המשתמשים"""
+        seq = 0
+        if os.path.exists(self.json_snapshot_path):
+            with open(self.json_snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            users, seq = snapshot['users'], snapshot['seq']
+        elif os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                users = json.load(f)
+        else:
+            return
+        write_snapshot(self.snapshot_path, rows_from_json(users), seq)
+        logger.info(f"🗂️ Imported {len(users)} users into {self.snapshot_path}")
+
+    def get(self, user_id: int) -> Optional[UserRecord]:
+        if self._written is not None:
+            self._adopt_snapshot()
+        record = self.users.get(user_id)
+        if record is None and self.base is not None:
+            index = self.base.find(user_id)
+            if index >= 0:
+                # Decoded once, then served from memory
+                record = self.users[user_id] = self.base.record(index)
+        return record
+
+    def add(self, user_id: int, record: Dict):
+        if self.get(user_id) is None:
+            self._new_ids.add(user_id)
+        super().add(user_id, record)
+
+    def update(self, user_id: int, fields: Dict):
+        self.get(user_id)
+        super().update(user_id, fields)
+
+    def _apply(self, entry: Dict):
+        user_id = int(entry['u'])
+        if self.get(user_id) is None and entry['op'] == 'register':
+            self._new_ids.add(user_id)
+        super()._apply(entry)
+        # An update for a user the store never held is skipped by the replay
+        if user_id in self.users:
+            self._changed.add(user_id)
+
+    def _touch(self, user_id: int):
+        self._changed.add(user_id)
+        super()._touch(user_id)
+
+    def count(self) -> int:
+        return (self.base.count if self.base is not None else 0) + len(self._new_ids)
+
+    @property
+    def resident_users(self) -> int:
+        return len(self.users)
+
+    def iter_users(self) -> Iterator[Tuple[int, UserRecord]]:
+        # Snapshot users are decoded on the fly without being cached. A pass
+        # keeps the snapshot and records it started with; adopting a new
+        # snapshot replaces them instead of changing them in place.
+        base, users, new_ids = self.base, self.users, self._new_ids
+        if base is not None:
+            for index, user_id in enumerate(base.ids):
+                yield user_id, users.get(user_id) or base.record(index)
+        for user_id in list(new_ids):
+            record = users.get(user_id)
+            if record is not None:
+                yield user_id, record
+
+    def iter_ordered(self, after: Optional[int] = None) -> Iterator[Tuple[int, UserRecord]]:
+        # The snapshot ids are sorted already; users added since are merged in
+        base, users = self.base, self.users
+        extra = sorted(uid for uid in self._new_ids if after is None or uid > after)
+        start = 0
+        if base is not None and after is not None:
+            start = bisect_right(base.ids, after)
+        snapshot_ids = ((base.ids[index], index) for index in range(start, base.count if base is not None else 0))
+        for user_id, index in heapq.merge(snapshot_ids, ((uid, -1) for uid in extra)):
+            record = users.get(user_id)
+            if record is None and index >= 0:
+                record = base.record(index)
+            if record is not None:
+                yield user_id, record
+
+    def iter_fields(self, *fields: str) -> Iterator[Tuple]:
+        # Unpack the fixed-width table directly; decoded records take precedence
+        base, users, new_ids = self.base, self.users, self._new_ids
+        if base is not None:
+            for row in base.iter_fields(fields):
+                record = users.get(row[0])
+                if record is None:
+                    yield row
+                else:
+                    yield (row[0], *[record[field] for field in fields])
+        for user_id in list(new_ids):
+            record = users.get(user_id)
+            if record is not None:
+                yield (user_id, *[record[field] for field in fields])
+
+    def _snapshot(self):
+        self._adopt_snapshot()
+        return super()._snapshot()
+
+    def _dump_users(self):
+        # Only changed records are encoded here, on the event loop; the rest
+        # are copied from the mapped snapshot in the writer thread
+        rows = {user_id: record_row(self.users[user_id]) for user_id in self._changed}
+        versions = {user_id: self.version(user_id) for user_id in self._changed}
+        return self.base, rows, versions
+
+    def _write_snapshot(self, users, seq: int) -> int:
+        base, rows, versions = users
+        written = write_snapshot(self.snapshot_path, rows, seq, base)
+        self._written = (SnapshotReader(self.snapshot_path), versions)
+        return written
+
+    def _adopt_snapshot(self):
+        """מעבר לצילום שנכתב בדחיסה האחרונה - רץ בלולאת האירועים"""
+        if self._written is None:
+            return
+        reader, versions = self._written
+        self._written = None
+        # Records changed again since they were encoded stay in memory; the
+        # rest now live in the new snapshot. Everything is replaced rather
+        # than changed in place, so passes still running keep the old view.
+        self._changed = {
+            user_id for user_id in self._changed
+            if versions.get(user_id) != self.version(user_id)
+        }
+        self._new_ids = self._new_ids - versions.keys()
+        self.users = {user_id: self.users[user_id] for user_id in self._changed}
+        self.base = reader
+
+    def export_json(self, path: str) -> int:
+        """ייצוא כל המשתמשים לקובץ JSON"""
+        return atomic_write_json(path, {str(user_id): record.to_dict() for user_id, record in self.iter_users()})
+
+    def close(self):
+        super().close()
+        self._adopt_snapshot()
+        if self.base is not None:
+            self.base.close()
+            self.base = None
+
+    def get_stats(self) -> Dict:
+        stats = super().get_stats()
+        stats['snapshot_users'] = self.base.count if self.base is not None else 0
+        stats['decoded'] = len(self.users)
+        stats['changed'] = len(self._changed)
+        return stats
+
+# ═══════════════════════════════════════════════════════════════════
+#                          TIERED BACKEND
+# ═══════════════════════════════════════════════════════════════════
+
+SQL_SELECT_RECENT = f"SELECT user_id, {', '.join(USER_FIELDS)} FROM users ORDER BY last_seen DESC LIMIT ?"
+
+
+class TieredUserStore(SqliteUserStore):
+    """משתמשים פעילים בזיכרון (LRU), כל השאר ב-SQLite - טעינה בגישה"""
+
+    backend = 'tiered'
+
+    def __init__(self, path: str, interval: float = 5.0, threshold: int = 500, hot_users: int = 50_000):
+        super().__init__(path, interval, threshold)
+        self.capacity = max(1, hot_users)
+        # Hot tier, least recently used first. Changes go through the SQLite
+        # overlays as well, so evicting a record never loses or writes anything.
+        self.hot: 'OrderedDict[int, UserRecord]' = OrderedDict()
+        self.hits = 0
+
+    def load(self) -> int:
+        count = super().load()
+        # Start with the most recently seen users resident
+        self.hot.clear()
+        rows = self._reader.execute(SQL_SELECT_RECENT, (self.capacity,)).fetchall()
+        for row in reversed(rows):
+            self.hot[row[0]] = UserRecord.from_dict(dict(zip(USER_FIELDS, row[1:])))
+        logger.info(f"🔥 Hot tier: {len(self.hot)} of {count} users resident (cap {self.capacity})")
+        return count
+
+    def _admit(self, user_id: int, record: UserRecord):
+        self.hot[user_id] = record
+        if len(self.hot) > self.capacity:
+            self.hot.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, user_id: int) -> Optional[UserRecord]:
+        record = self.hot.get(user_id)
+        if record is not None:
+            self.hot.move_to_end(user_id)
+            self.hits += 1
+            return record
+        data = super().get(user_id)
+        if data is None:
+            return None
+        # Cold user: fault the record back into the hot tier
+        self.faults += 1
+        record = UserRecord.from_dict(data)
+        self._admit(user_id, record)
+        return record
+
+    def add(self, user_id: int, record: Dict):
+        super().add(user_id, record)
+        self._admit(user_id, UserRecord.from_dict(record))
+
+    def update(self, user_id: int, fields: Dict):
+        record = self.get(user_id)
+        super().update(user_id, fields)
+        if record is not None:
+            record.update(fields)
+
+    @property
+    def resident_users(self) -> int:
+        return len(self.hot)
+
+    def get_stats(self) -> Dict:
+        stats = super().get_stats()
+        stats['resident'] = len(self.hot)
+        stats['capacity'] = self.capacity
+        stats['hits'] = self.hits
+        stats['faults'] = self.faults
+        stats['evictions'] = self.evictions
+        return stats
+
+# ═══════════════════════════════════════════════════════════════════
+#                         MIGRATION & FACTORY
+# ═══════════════════════════════════════════════════════════════════
+
+def migrate_json_to_sqlite(json_path: str, db_path: str, batch_size: int = 1000) -> int:
+    """העברה חד-פעמית של קובץ JSON קיים ל-SQLite"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        users = json.load(f)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(SQL_CREATE)
+    batch = []
+    migrated = 0
+    with conn:
+        for user_id_str, record in users.items():
+            batch.append((
+                int(user_id_str),
+                *(record.get(field, FIELD_DEFAULTS.get(field)) for field in USER_FIELDS)
+            ))
+            if len(batch) >= batch_size:
+                conn.executemany(SQL_UPSERT, batch)
+                migrated += len(batch)
+                batch = []
+        if batch:
+            conn.executemany(SQL_UPSERT, batch)
+            migrated += len(batch)
+    conn.close()
+    logger.info(f"✅ Migrated {migrated} users from {json_path} to {db_path}")
+    return migrated
+
+
+def create_user_store(
+    backend: str,
+    json_path: str,
+    sqlite_path: str,
+    interval: float = 5.0,
+    threshold: int = 500,
+    compact_bytes: int = 8 * 1024 * 1024,
+    hot_users: int = 50_000
+) -> UserStore:
+    """יצירת מאגר משתמשים לפי סוג"""
+    if backend in ('sqlite', 'tiered'):
+        fresh = not os.path.exists(sqlite_path)
+        if backend == 'tiered':
+            store = TieredUserStore(sqlite_path, interval, threshold, hot_users)
+        else:
+            store = SqliteUserStore(sqlite_path, interval, threshold)
+        if fresh and os.path.exists(json_path):
+            migrate_json_to_sqlite(json_path, sqlite_path)
+        return store
+    if backend == 'journal':
+        return JournalUserStore(json_path, interval, threshold, compact_bytes)
+    if backend == 'binary':
+        return BinaryUserStore(json_path, interval, threshold, compact_bytes)
+    if backend == 'json':
+        return JsonUserStore(json_path, interval, threshold)
+    raise ValueError(f"Unknown user store backend: {backend}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) == 4 and sys.argv[1] == 'migrate':
+        print(f"✅ Migrated {migrate_json_to_sqlite(sys.argv[2], sys.argv[3])} users")
+    elif len(sys.argv) == 4 and sys.argv[1] == 'export':
+        store = BinaryUserStore(sys.argv[2])
+        store.load()
+        store.export_json(sys.argv[3])
+        print(f"✅ Exported {store.count()} users to {sys.argv[3]}")
+    else:
+        print("Usage: python storage.py migrate <users.json> <users.db>")
+        print("       python storage.py export <users.json> <export.json>")
+        sys.exit(1)
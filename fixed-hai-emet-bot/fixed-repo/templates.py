@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Response Templates
+תבניות תגובה - החלקים הקבועים נבנים פעם אחת בעלייה
+
+A template is compiled once: static fields (bot name, DNA code, creator...)
+are substituted at startup and the rest is compiled into a small f-string
+function over the dynamic fields. Rendering costs what an inline f-string
+would, without rebuilding the static text, and a template without dynamic
+fields renders to the same string object every time.
+"""
+
+from string import Formatter
+from typing import Any, List
+
+
+class Template:
+    """תבנית תגובה מהודרת מראש"""
+
+    __slots__ = ('fields', 'render', '_text')
+
+    def __init__(self, text: str, **static: Any):
+        chunks: List[str] = []
+        fields = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            chunks.append(_escape(literal))
+            if field is None:
+                continue
+            if field in static:
+                value = static[field]
+                if conversion:
+                    value = {'r': repr, 's': str, 'a': ascii}[conversion](value)
+                chunks.append(_escape(format(value, spec or '')))
+                continue
+            if not field.isidentifier():
+                raise ValueError(f"Template field must be a plain name: {field!r}")
+            if field not in fields:
+                fields.append(field)
+            chunks.append(
+                '{' + field + (f'!{conversion}' if conversion else '') + (f':{spec}' if spec else '') + '}'
+            )
+        self.fields = frozenset(fields)
+
+        if fields:
+            # Compile the remaining text into an f-string function, so a render
+            # costs what an inline f-string would
+            source = f"def render(*, {', '.join(fields)}):\n    return f{''.join(chunks)!r}\n"
+            namespace: dict = {}
+            exec(compile(source, '<template>', 'exec'), namespace)
+            # Bound directly, so a render is one call with no extra
+            # keyword-argument packing on the way in
+            self.render = namespace['render']
+            self._text = None
+        else:
+            # Fully static templates render to one shared string
+            text = self._text = ''.join(chunks).replace('{{', '{').replace('}}', '}')
+            self.render = lambda **values: text
+
+    @property
+    def is_static(self) -> bool:
+        return self._text is not None
+
+
+def _escape(text: str) -> str:
+    return text.replace('{', '{{').replace('}', '}}')
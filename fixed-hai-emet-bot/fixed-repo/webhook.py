@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hai-Emet Emotion Bot - Webhook Server
+שרת Webhook - קבלת עדכונים מטלגרם דרך aiohttp
+
+Telegram POSTs each update to the webhook path. The handler checks the
+secret token header, queues the update for the Application and answers
+200 right away, so Telegram never waits on handler work. A lightweight
+health endpoint is served next to it.
+
+The endpoint is public, so the secret token is never optional: without
+WEBHOOK_SECRET a random one is generated at startup and registered with
+Telegram through set_webhook.
+"""
+
+import time
+import signal
+import secrets
+import asyncio
+import logging
+from typing import Optional
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookServer:
+    """שרת Webhook מוטמע עם נקודת בריאות"""
+
+    def __init__(
+        self,
+        application: Application,
+        path: str = '/telegram',
+        secret_token: Optional[str] = None,
+        host: str = '0.0.0.0',
+        port: int = 8080
+    ):
+        self.application = application
+        self.path = path
+        if not secret_token:
+            # Telegram accepts 1-256 characters from A-Z, a-z, 0-9, _ and -
+            secret_token = secrets.token_urlsafe(32)
+            logger.warning("WEBHOOK_SECRET is not set - using a random secret token for this run")
+        self.secret_token = secret_token
+        self._secret_bytes = secret_token.encode('utf-8')
+        self.host = host
+        self.port = port
+
+        self.started_at = time.time()
+        self.updates_received = 0
+        self.updates_rejected = 0
+
+        self.app = web.Application()
+        self.app.router.add_post(path, self.handle_update)
+        self.app.router.add_get('/healthz', self.handle_health)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """קבלת עדכון - בדיקת סוד, הכנסה לתור ותשובה מיידית"""
+        received = request.headers.get(SECRET_HEADER, '').encode('utf-8', 'replace')
+        if not secrets.compare_digest(received, self._secret_bytes):
+            self.updates_rejected += 1
+            return web.Response(status=403)
+
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except Exception as e:
+            self.updates_rejected += 1
+            logger.warning(f"Invalid webhook payload: {e}")
+            return web.Response(status=400)
+
+        self.updates_received += 1
+        await self.application.update_queue.put(update)
+        return web.Response(status=200)
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        """בדיקת בריאות"""
+        return web.json_response({
+            'status': 'ok' if self.application.running else 'starting',
+            'uptime': round(time.time() - self.started_at, 1),
+            'updates_received': self.updates_received,
+            'updates_rejected': self.updates_rejected,
+            'update_queue': self.application.update_queue.qsize()
+        })
+
+    async def start(self):
+        """הפעלת השרת"""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"🌐 Webhook server listening on {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        """עצירת השרת"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def run_webhook(
+    application: Application,
+    webhook_url: str,
+    server: WebhookServer
+):
+    """הרצת הבוט במצב Webhook עד לקבלת אות עצירה"""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig_name in ('SIGINT', 'SIGTERM'):
+        try:
+            loop.add_signal_handler(getattr(signal, sig_name), stop_event.set)
+        except (NotImplementedError, AttributeError):
+            pass
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await server.start()
+        await application.bot.set_webhook(
+            url=webhook_url.rstrip('/') + server.path,
+            secret_token=server.secret_token,
+            allowed_updates=Update.ALL_TYPES
+        )
+        logger.info(f"🔗 Webhook set to {webhook_url.rstrip('/')}{server.path}")
+        await stop_event.wait()
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)